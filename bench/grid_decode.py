@@ -0,0 +1,42 @@
+# Grid decode benchmark: IGridsConn.ascii2pd (regex + pandas.read_fwf) vs grids.decode
+# Run: python bench/grid_decode.py [-n NUMBER]
+import os, sys
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ionoapi.conn import IGridsConn
+from ionoapi import grids
+
+
+def synthetic(ny, nx, seed=0):
+    values = np.random.default_rng(seed).uniform(2, 400, size=(ny, nx)).round(4)
+    lines = ['# Synthetic grid', 'Product: benchmark', f'Rows: {ny} Columns: {nx}']
+    lines += [''.join(f'{v:9.4f}' for v in row) for row in values]
+    return '\n'.join(lines) + '\n', values
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid decode benchmark')
+    parser.add_argument('-n', '--number', type=int, default=200, help='Decodes per timing (default: %(default)s)')
+    args = parser.parse_args()
+
+    for name, ys, xs in (('DIASNC foF2', IGridsConn.YNCCoords, IGridsConn.XNCCoords),
+                         ('TAD2D hmF2', IGridsConn.YTADMCoords, IGridsConn.XTADMCoords)):
+        ascii, values = synthetic(len(ys), len(xs))
+        shape = (len(ys), len(xs))
+
+        legacy = IGridsConn.ascii2pd(ascii).values
+        fast = grids.decode(ascii, shape)
+        assert legacy.shape == fast.shape == shape and np.allclose(legacy, fast) and np.allclose(fast, values)
+
+        tlegacy = timeit.timeit(lambda: IGridsConn.ascii2pd(ascii).values, number=args.number) / args.number
+        tfast = timeit.timeit(lambda: grids.decode(ascii, shape), number=args.number) / args.number
+        print(f'{name} {shape}: ascii2pd {tlegacy * 1e6:9.1f} us | decode {tfast * 1e6:9.1f} us | x{tlegacy / tfast:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# SAO decode benchmark: schemas.SAO per record (pydantic) vs saobatch.decode (columnar Arrow table)
+# Run: python bench/sao_decode.py [-n NUMBER]
+import os, sys
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ionoapi import saobatch
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(n):
+        t = np.datetime64('2024-01-01T00:00') + np.timedelta64(5 * i, 'm')
+        y, mo, d, h, mi = (int(_) for _ in str(t).replace('T', '-').replace(':', '-').split('-'))
+        date = [str(y), f'{(t.astype("datetime64[D]") - np.datetime64(f"{y}-01-01")).astype(int) + 1:03d}', f'{mo:02d}',
+                f'{d:02d}', f'{h:02d}', f'{mi:02d}', '00']
+        if i % 2:
+            sounding = ['FF'] + date + ['000', '000', '0A', '2', '500', '100', '16000', '5', '0', '1', '7', '3', '1F',
+                                        '8', '0', '200', '90', '5', '128', '15', '4', '1', '3', '1', '2', '0', '5', '0']
+        else:
+            sounding = ['FE'] + date + ['0', '1', 'A', 'N', '0', '0', '500', 'C8', '16000', '0', '049', '3', '0', '0',
+                                        '1', '128', '19', '0', '4', '0', '0', '5', '0', '1', '2', '0']
+        m = int(rng.integers(20, 60))
+        records.append(dict(
+            geoConst=[1.2, 65.3, 50.1, 4.6, 120.0],
+            system=dict(sounder='DPS4D', stationid='049', ursicode='DB049', NAME='Dourbes', ARTIST='5.0'),
+            sounding=sounding,
+            scaled=[None if _ < 0.2 else round(float(_ * 10), 3) for _ in rng.random(int(rng.integers(20, 49)))],
+            analysisFlags=rng.integers(0, 9, 6).tolist(),
+            f2layerO=dict(VH=rng.uniform(200, 400, m).round(1).tolist(), TH=rng.uniform(150, 350, m).round(1).tolist(),
+                          AMPL=rng.integers(0, 90, m).tolist(), DN=rng.integers(-7, 7, m).tolist(),
+                          FREQ=rng.uniform(2, 12, m).round(3).tolist()),
+            elayerO=dict(VH=rng.uniform(90, 140, 8).round(1).tolist(), FREQ=rng.uniform(1, 4, 8).round(3).tolist()),
+            trueheightProf=dict(TH=rng.uniform(80, 600, m).round(1).tolist(), FREQ=rng.uniform(1, 12, m).round(3).tolist(),
+                                ELDENS=rng.uniform(1e4, 1e6, m).round(0).tolist()),
+            qualifLTR=['A', 'B'],
+        ))
+    return records
+
+
+def check(table, records):
+    # Same values as the pydantic models (at float32 precision)
+    for i in range(0, len(records), max(1, len(records) // 50)):
+        sao, row = saobatch.validate(records[i]), table.slice(i, 1).to_pylist()[0]
+        assert row['timestamp'] == sao.sounding.timestamp
+        assert row['system.ursicode'] == sao.system.ursicode and row['geoConst.lat'] == sao.geoConst.lat
+        for name, value in sao.scaled.model_dump().items():
+            assert (value is None and row[f'scaled.{name}'] is None) or np.float32(value) == np.float32(row[f'scaled.{name}'])
+        for name, value in sao.sounding.model_dump().items():
+            if name not in ('version', 'timestamp'):
+                if isinstance(value, str):
+                    value = int(value, 16) if value.startswith('0x') else value == 'True' if value in ('True', 'False') else value
+                assert row[f'sounding.{name}'] == value, (name, value, row[f'sounding.{name}'])
+        for group in ('f2layerO', 'elayerO', 'trueheightProf'):
+            for name, values in getattr(sao, group).model_dump().items():
+                decoded = row[f'{group}.{name}']
+                assert (values is None and decoded is None) or np.allclose(np.float32(values), decoded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SAO decode benchmark')
+    parser.add_argument('-n', '--number', type=int, default=20000, help='Records (default: %(default)s)')
+    args = parser.parse_args()
+
+    records = synthetic(args.number)
+
+    started = time.perf_counter()
+    [saobatch.validate(_) for _ in records]
+    tpydantic = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table = saobatch.decode(records)
+    tbatch = time.perf_counter() - started
+
+    check(table, records)
+    print(f'{args.number} SAO records: pydantic {tpydantic:7.3f} s | saobatch {tbatch:7.3f} s | x{tpydantic / tbatch:.1f} '
+          f'| table {table.nbytes / 2 ** 20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
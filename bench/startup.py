@@ -0,0 +1,82 @@
+# CLI startup benchmark: import time of what each iapi.py sub-command loads, measured with `python -X importtime`
+# Run: python bench/startup.py [-n NUMBER] [--budget MS] [--top TOP]
+import os, sys
+import argparse
+import statistics
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported by each sub-command before its first request, and the heavy ones it must not load
+SCENARIOS = {
+    'help': (['iapi'], ['numpy', 'pandas', 'xarray', 'httpx', 'portion', 'tqdm']),
+    'ionos': (['iapi', 'ionoapi.api', 'ionoapi.auth', 'ionoapi.criono', 'ionoapi.writers'],
+              ['xarray', 'tqdm', 'magic', 'ormsgpack', 'sqlalchemy', 'pyproj', 'shapely', 'geoalchemy2', 'geojson']),
+    'igrid': (['iapi', 'ionoapi.api', 'ionoapi.auth', 'ionoapi.crttide', 'ionoapi.grids', 'ionoapi.stations'],
+              ['tqdm', 'magic', 'ormsgpack', 'sqlalchemy', 'pyproj', 'shapely', 'geoalchemy2', 'geojson']),
+    'edens': (['iapi', 'ionoapi.api', 'ionoapi.auth', 'ionoapi.criono', 'ionoapi.profiles', 'ionoapi.writers'],
+              ['xarray', 'tqdm', 'magic', 'ormsgpack', 'sqlalchemy', 'pyproj', 'shapely', 'geoalchemy2', 'geojson']),
+    'serve': (['iapi', 'ionoapi.server'], ['tqdm', 'magic', 'sqlalchemy', 'pyproj', 'shapely', 'geoalchemy2']),
+}
+
+
+def importtime(modules):
+    """(wall seconds, {module: (self us, cumulative us, depth)}) of a fresh interpreter importing `modules`"""
+    code = '; '.join(f'import {_}' for _ in modules)
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(f'Unable to import {", ".join(modules)}: {proc.stderr.strip().splitlines()[-1]}')
+
+    times = dict()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_), int(cumulative), (len(name) - len(name.lstrip())) // 2)
+    return wall, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmark')
+    parser.add_argument('-n', '--number', type=int, default=5, help='Runs per sub-command (default: %(default)s)')
+    parser.add_argument('--budget', type=float, default=None, metavar='MS',
+                        help='Fail when the median import time of a sub-command exceeds %(metavar)s')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest imports listed per sub-command (default: %(default)s)')
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO', help=f'Sub-commands ({", ".join(SCENARIOS)}, default: all)')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'Unknown sub-commands: {", ".join(sorted(unknown))}')
+
+    failed = []
+    for scenario in args.scenarios or SCENARIOS:
+        modules, forbidden = SCENARIOS[scenario]
+        runs = [importtime(modules) for _ in range(args.number)]
+        walls = [wall for wall, _ in runs]
+        imports = [sum(cumulative for name, (_, cumulative, depth) in times.items() if depth == 0 and name in modules) / 1e3
+                   for _, times in runs]
+        ms = statistics.median(imports)
+        print(f'{scenario:6s}: import {ms:7.1f} ms | process {statistics.median(walls) * 1e3:7.1f} ms (median of {args.number})')
+
+        times = runs[walls.index(statistics.median_low(walls))][1]
+        # Third-party packages (which include the packages they import themselves)
+        heaviest = sorted(((cumulative, name) for name, (_, cumulative, depth) in times.items() if depth > 0
+                           and '.' not in name and name not in ('ionoapi', 'iapi')), reverse=True)[:args.top]
+        print('        ' + ', '.join(f'{name} {cumulative / 1e3:.1f}' for cumulative, name in heaviest))
+
+        loaded = sorted({_ for _ in forbidden if _ in times})
+        if loaded:
+            failed.append(f'{scenario} imports {", ".join(loaded)}')
+        if args.budget is not None and ms > args.budget:
+            failed.append(f'{scenario} imports in {ms:.1f} ms, over the {args.budget:.0f} ms budget')
+
+    for _ in failed:
+        print(f'FAIL: {_}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,427 +1,20 @@
-import os,sys, re
-import asyncio
-import json
-from io import StringIO
+import os,sys
 
 import ssl
-import httpx
 
 ssl._create_default_https_context = ssl._create_unverified_context
-from urllib3.exceptions import InsecureRequestWarning
-from urllib3 import disable_warnings
-disable_warnings(InsecureRequestWarning)
 
 sys.path.insert(0, os.path.abspath('.'))
-import logging
-import logging.handlers
 from pathlib import Path
-import yaml
-from furl import furl
 import argparse
 import ciso8601
-from datetime import datetime, timedelta, UTC
-from typing import List, Optional
-import portion as P
-from copy import copy
-import numpy as np
-import pandas as pd
-import xarray as xr
-from tqdm import tqdm
+from datetime import timedelta
 
-from ionoapi import _asyncu
-from ionoapi import api
+# numpy, pandas, xarray, portion and the API clients are imported where they are used, so that each sub-command
+# only loads what it needs, see bench/startup.py
+from ionoapi.config import Configuration, Logger_, Logger, cfg
+from ionoapi.conn import IApiConn, ISAOConn, IGridsConn
 
-def join(loader, node):
-    seq = loader.construct_sequence(node)
-    return ''.join([str(i) for i in seq])
-
-
-yaml.add_constructor('!join', join)
-F = os.path.abspath(__file__)
-
-_BARGS = re.compile(r'^(?P<lower>[(\[])(?P<upper>[)\]])$')
-
-class IApiConn(_asyncu.AsyncCTXClass):
-
-    def stop(self):
-        if self.loop.is_closed() or self._shutdown.is_set():
-            return
-
-        self._shutdown.set()
-
-        try:
-            self.loop.run_until_complete(asyncio.sleep(1))
-        except:
-            try:
-                self._shutdown.clear()
-            except:
-                pass
-        finally:
-            self.disconnect()
-
-    def disconnect(self):
-        try:
-            for iapi in self.apis.values():
-                iapi.close()
-        except:
-            pass
-
-    def connect(self):
-        try:
-            istreamapi = api.APIClientASYNC(uri=cfg['ISTREAMAPI']['BASE_API'], loop=self.loop)
-        except Exception as e:
-            Logger.logger.error(f'Unable to initialize Ionostream API Client: {e}')
-            exit(0)
-
-        try:
-            ttideapi = api.APIClientASYNC(uri=cfg['TECHTIDEAPI']['BASE_API'], loop=self.loop)
-        except Exception as e:
-            Logger.logger.error(f'Unable to initialize TechTIDE API Client: {e}')
-            exit(0)
-
-        self.apis['istreamapi'] = istreamapi
-        self.apis['ttideapi'] = ttideapi
-
-        self._connected = True
-
-    def __init__(self):
-        super().__init__()
-
-        self._shutdown = asyncio.Event()
-        self._connected = False
-        self.apis = dict()
-        self.connect()
-
-    def __del__(self):
-        try:
-            self.stop()
-        except:
-            pass
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.stop()
-
-class ISAOConn(IApiConn):
-    def export(self, data, exppath, columns=None, overwrite=False):
-        if exppath.exists():
-            exppath.unlink(missing_ok=True)
-        data.to_csv(exppath, sep=' ', columns=columns, na_rep='None', header=True, index=False, mode='w')
-
-    async def querySAO_(self, verbose=False):
-        from ionoapi import criono
-        from ionoapi import api
-
-        _ICHARS = ['foF2', 'mufD', 'fminF', 'qf', 'qe', 'phF2lyr', 'foF2p', 'b0IRI', 'b1IRI']
-        try:
-            # Gather REMOTE Ionostream Datasets
-            dfO = await criono.Iono(
-                start=self.start, end=self.end, bounds='[]', stations=self.stations
-            ).df_(
-                self.apis['istreamapi'], characteristics=_ICHARS,
-                order_attrs=['timestamp', 'station'], order_by=['asc', ]
-            )
-            if verbose:
-                Logger.logger.info(f'Retrieved {dfO.shape[0]} remote records')
-        except Exception as e:
-            Logger.logger.error(f'Unable to retrieve remote Ionospheric characteristics query results: {e}')
-            exit(0)
-
-        assert isinstance(dfO, pd.DataFrame), AssertionError('Ionospheric characteristics query results is not a valid type')
-
-        expfile = f'ionchar_{self.start.strftime("%Y%m%dT%H%M")}_{self.end.strftime("%Y%m%dT%H%M")}.csv'
-        exppath_ = self.exppath.joinpath(expfile)
-
-        try:
-            self.export(dfO, exppath_)
-            Logger.logger.info(f'Successfully exported Ionospheric characteristics query results --> {exppath_}')
-        except Exception as e:
-            Logger.logger.error(f'Unable to export Ionospheric characteristics query results: {e}')
-            exit(0)
-
-
-    def querySAO(self, verbose=False):
-        self.loop.run_until_complete(self.querySAO_(verbose=verbose))
-
-    def __init__(self, start: Optional[datetime]=None, end:Optional[datetime]=None, stations: List[str]=None,
-        resolution: str | None = '5m', exppath: str | Path=None, bounds='[]', attributes: List[str] = None,
-        restrict: Optional[timedelta] = None, order_attrs: List[str] = None, order_by: List[str] = None):
-
-        _bmapper = {('lower', '['): 'inclusive', ('upper', ']'): 'inclusive', ('lower', '('): 'exclusive',
-                    ('upper', ')'): 'exclusive'}
-        try:
-            bounds_ = _BARGS.match(bounds).groupdict()
-            bounds_ = {k: _bmapper[(k, v)] for k, v in bounds_.items()}
-        except:
-            raise ValueError(f'Malformed bounds attribute: {bounds}')
-
-        _RESP = re.compile(r'^(?P<freqmul>\d+)(?P<freq>\w+)$')
-        try:
-            resolution_ = _RESP.match(resolution).groupdict()
-            resolution_['freqmul'] = int(resolution_['freqmul'])
-        except:
-            raise ValueError(f'Malformed resolution attribute: {resolution}')
-
-        end = ciso8601.parse_datetime(end) if isinstance(end, str) else (
-            end if end else datetime.now(UTC).replace(tzinfo=None))
-
-        start = ciso8601.parse_datetime(start) if isinstance(start, str) else (
-            start if start else end-timedelta(hours=2))
-
-
-        self.resolution = pd.Timedelta(resolution)
-
-        start = pd.Timestamp(start).floor(self.resolution)
-        end = pd.Timestamp(end).ceil(self.resolution)
-
-        start = start.to_pydatetime()
-        end = end.to_pydatetime()
-
-        if bounds_['lower'] == 'exclusive':
-            start += timedelta(milliseconds=1)
-
-        if bounds_['upper'] == 'exclusive':
-            end = end - timedelta(milliseconds=1)
-
-        if restrict is not None:
-            try:
-                assert end - start <= restrict, AssertionError(f'Cannot request datasets for intervals more than {restrict}')
-            except AssertionError as e:
-                Logger.logger.error(f'{e}')
-                exit(0)
-
-        self.exppath=exppath
-
-        self.start = start
-        self.end = end
-        self.stations = stations
-        self.restrict = restrict
-
-        if order_attrs:
-            order_by = ["asc"] * len(order_attrs) if not order_by else order_by * len(order_attrs) if len(
-                order_by) == 1 else order_by
-        self.order_attrs = order_attrs
-        self.attributes = attributes
-        self.order_by = order_by
-
-        super().__init__()
-
-class IGridsConn(IApiConn):
-    XNCCoords = np.arange(-10, 40 + 1, 1)
-    YNCCoords = np.arange(80, 34 + (-1), -1)
-
-    XTADMCoords = np.arange(-10, 40 + 1, 1)
-    YTADMCoords = np.arange(72, 30 + (-1), -1)
-
-    @staticmethod
-    def ascii2pd(ascii):
-        data_ = re.sub(r'(?m)^(?:[\w#].*)?\n?', '', ascii)
-        df = pd.read_fwf(StringIO(data_), infer_nrows=51, header=None)
-        return df
-
-    def export(self, data, exppath, verbose=False):
-        if exppath.exists():
-            exppath.unlink(missing_ok=True)
-
-        json_ = json.dumps(data, indent=4, default=str)
-        if verbose:
-            print(json_)
-        exppath.write_text(json_)
-
-    async def hmf2ascii2xr(self, hmf2ascii, hmf2nav):
-        hmf2df = IGridsConn.ascii2pd(hmf2ascii)
-
-        hmf2xr = xr.DataArray(hmf2df.values, dims=("y", "x"),
-            coords={"y": IGridsConn.YTADMCoords, "x": IGridsConn.XTADMCoords},
-            attrs={
-                'name': 'hmF2', "long_name": 'hmF2 grid', "units": 'Km', 'timestamp': hmf2nav['timestamp'].isoformat(),
-                "description": 'hmf2 (TAD2D Algorithm)'
-            }
-        )
-        return hmf2xr
-
-    async def fof2ascii2xr(self, fof2ascii, fof2nav):
-        fof2df = IGridsConn.ascii2pd(fof2ascii)
-
-        fof2xr = xr.DataArray(fof2df.values, dims=("y", "x"),
-            coords={"y": IGridsConn.YNCCoords, "x": IGridsConn.XNCCoords},
-            attrs={
-                'name': 'foF2', "long_name": 'foF2 grid', "units": 'MHz', 'timestamp': fof2nav['timestamp'].isoformat(),
-                "description": 'foF2 (DIASNC Algorithm)'
-            }
-        )
-        return fof2xr
-
-    async def queryGrid_(self, verbose=False):
-        from ionoapi import crttide
-        from ionoapi import api
-
-        qobj = crttide.TTIDE(
-            timestamp=self.timestamp, lat=self.lat, lon=self.lon
-        )
-        try:
-            fof2nav = await qobj.nav_(self.apis['ttideapi'], type='fof2')
-            hmf2nav = await qobj.nav_(self.apis['ttideapi'], type='hmf2')
-            assert (fof2nav['uuid'] and hmf2nav['uuid']), AssertionError(f'404 <NODATA> for requested timestamp: {self.timestamp}')
-        except Exception as e:
-            Logger.logger.error(f'Unable to retrieve Modelled Grid Metadata: {e}')
-            exit(0)
-
-        try:
-            fof2ascii = await qobj.data_(self.apis['ttideapi'], fof2nav)
-            hmf2ascii = await qobj.data_(self.apis['ttideapi'], hmf2nav)
-            assert (fof2ascii is not None and hmf2ascii is not None), AssertionError(f'404 <NODATA> for requested timestamp: {self.timestamp}')
-        except Exception as e:
-            Logger.logger.error(f'Unable to retrieve Modelled Grid Datasets: {e}')
-            exit(0)
-
-        try:
-            fof2xrds = await self.fof2ascii2xr(fof2ascii, fof2nav)
-            hmf2xrds = await self.hmf2ascii2xr(hmf2ascii, hmf2nav)
-            fof2ds_ = fof2xrds.sel(y=self.lat, x=self.lon, method='nearest')
-            hmf2ds_ = hmf2xrds.sel(y=self.lat, x=self.lon, method='nearest')
-            resp = dict(
-                req_timestamp=self.timestamp.isoformat() if self.timestamp is not None else 'null',
-                lat=self.lat, lon=self.lon,
-                foF2=fof2ds_.attrs | {'data': float(fof2ds_.data)},
-                hmF2=hmf2ds_.attrs | {'data': float(hmf2ds_.data)}
-            )
-        except Exception as e:
-            Logger.logger.error(f'Unable to process Modelled Grid Datasets: {e}')
-            exit(0)
-
-        expfile = f'grid_{self.timestamp.strftime("%Y%m%dT%H%M") if self.timestamp else "LAST"}_{int(self.lat):02d}_{int(self.lon):02d}.json'
-        exppath_ = self.exppath.joinpath(expfile)
-
-        try:
-            self.export(resp, exppath_, verbose=verbose)
-            Logger.logger.info(f'Successfully exported Modelled Grid Datasets (foF2, hmF2) --> {exppath_}')
-        except Exception as e:
-            Logger.logger.error(f'Unable to export Modelled Grid Datasets (foF2, hmF2): {e}')
-            exit(0)
-
-    def queryGrid(self, verbose=False):
-        self.loop.run_until_complete(self.queryGrid_(verbose=verbose))
-
-    def __init__(self, timestamp: Optional[datetime] = None, lat: float = None, lon: float = None,
-                 resolution: str | None = '5m', exppath: str | Path = None):
-
-        _RESP = re.compile(r'^(?P<freqmul>\d+)(?P<freq>\w+)$')
-        try:
-            resolution_ = _RESP.match(resolution).groupdict()
-            resolution_['freqmul'] = int(resolution_['freqmul'])
-        except:
-            raise ValueError(f'Malformed resolution attribute: {resolution}')
-
-        timestamp = ciso8601.parse_datetime(timestamp) if isinstance(timestamp, str) else timestamp
-
-        self.resolution = pd.Timedelta(resolution)
-
-        self.exppath = exppath
-
-        self.timestamp = timestamp
-        self.lat = lat
-        self.lon = lon
-
-        super().__init__()
-
-class Configuration(object):
-    CFG = dict()
-
-    @classmethod
-    def normpath(cls, extpath, basepath=F):
-        if basepath is None:
-            return None
-        elif os.path.isabs(extpath):
-            return extpath
-        elif os.path.isfile(basepath):
-            return str(os.path.normpath(os.path.join(os.path.dirname(basepath), extpath)))
-        else:
-            return str(os.path.normpath(os.path.join(basepath, extpath)))
-
-    @classmethod
-    def parseCFG(cls):
-        cls.CFG['DATA_PATH'] = cls.normpath(cls.CFG['DATA_PATH'], F)
-        cls.CFG['ETC_PATH'] = cls.normpath(cls.CFG['ETC_PATH'], F)
-        cls.CFG['LOG_PATH'] = cls.normpath(cls.CFG['LOG_PATH'], F)
-
-        for rk in ('STATIONS',):
-            for k, v in cls.CFG[rk].items():
-                cls.CFG[rk][k] = cls.normpath(v, F)
-
-        for api in (['TECHTIDEAPI', 'ISTREAMAPI']):
-            cls.CFG[api]['BASE'] = furl(cls.CFG[api]['BASE'])
-            cls.CFG[api]['BASE_API'] = furl(cls.CFG[api]['BASE_API'])
-
-    def __init__(self):
-        _CFG = self.normpath('./conf.yaml')
-        with open(_CFG) as f:
-            Configuration.CFG = yaml.load(f, Loader=yaml.Loader)
-
-        self.parseCFG()
-
-
-_cfobj = Configuration()
-cfg = _cfobj.CFG
-
-
-class Logger_:
-
-    class __Logger:
-        @property
-        def logger(self):
-            if not self._logger:
-                self.setLogger()
-            return self._logger
-
-        def setLogger(self, ):
-            # create logger
-            logger = logging.getLogger(cfg['App'])
-            logger.setLevel(getattr(logging, cfg['LOGGING'].get('STDOUT','DEBUG')))
-
-            fh = None
-            if self.path:
-                # create file handler which log even debug messages
-                fh = logging.handlers.TimedRotatingFileHandler(self.path, when='midnight', interval=1,
-                                                               backupCount=52 * 5, encoding=None, delay=0)
-                fh.setLevel(getattr(logging, cfg['LOGGING'].get('FILE','INFO')))
-
-            # create RQ handler with a higher log level
-            ch = logging.StreamHandler()
-            ch.setLevel(getattr(logging, cfg['LOGGING'].get('STREAM','DEBUG')))
-
-            # create formatter and add it to the handlers
-            formatter = logging.Formatter(fmt='%(levelname)s: %(message)s - %(asctime)s', datefmt='%H:%M:%S')
-            if self.path:
-                fh.setFormatter(formatter)
-                logger.addHandler(fh)
-
-            ch.setFormatter(formatter)
-            logger.addHandler(ch)
-            self._logger = logger
-
-        def __init__(self, logpath=None):
-            self._logger = None
-            self.path = logpath
-
-        def __str__(self):
-            return repr(self)
-
-    instance = None
-
-    def __init__(self, logpath=None):
-        if (not Logger_.instance) or (logpath and not Logger_.instance.path):
-            Logger_.instance = Logger_.__Logger(logpath=logpath)
-        else:
-            pass
-
-    def __getattr__(self, name):
-        return getattr(self.instance, name)
-
-
-Logger = Logger_()
 _parser = None
 
 
@@ -440,6 +33,8 @@ def create_parser():
         return dict(exppath=exppath)
 
     def ionosoper(args):
+        import pandas as pd
+
         _mainargs = _main(args)
 
         start, end = None, None
@@ -453,38 +48,180 @@ def create_parser():
 
             start, end = period
 
+        window = None
+        if args.window:
+            try:
+                window = pd.Timedelta(args.window).to_pytimedelta()
+                assert window > timedelta(0), AssertionError(f'Window must be positive: {args.window}')
+            except Exception as e:
+                _parser.error(f"Error while parsing argument 'WINDOW' : {e}")
+
+        cachettl = None
+        if args.cache_ttl:
+            try:
+                cachettl = pd.Timedelta(args.cache_ttl).to_pytimedelta()
+            except Exception as e:
+                _parser.error(f"Error while parsing argument 'TTL' : {e}")
+
+        lag = None
+        if args.follow:
+            try:
+                assert end is None, AssertionError(f'END must be null when following')
+                assert args.format in writers.STREAMING, AssertionError(
+                    f'Formats finalized on exit cannot be followed, -f: {", ".join(writers.STREAMING)}')
+                lag = pd.Timedelta(args.lag).to_pytimedelta()
+            except Exception as e:
+                _parser.error(f"Error while parsing arguments for --follow : {e}")
+
+        products = list(dict.fromkeys(args.products))
+        if products != ['sao'] and (args.cache or args.follow):
+            _parser.error(f"--cache and --follow only apply to the sao product, requested: {' '.join(products)}")
+
+        if args.wide and not args.resample:
+            _parser.error('--wide requires --resample')
+        if args.resample and args.follow:
+            _parser.error('--resample does not apply to --follow')
+        try:
+            resolution = pd.Timedelta(args.resolution)
+            assert resolution >= pd.Timedelta(minutes=1) and resolution % pd.Timedelta(minutes=1) == pd.Timedelta(0), \
+                AssertionError(f'Resolution must be a positive number of minutes: {args.resolution}')
+        except Exception as e:
+            _parser.error(f"Error while parsing argument 'RESOLUTION' : {e}")
+
+        if args.coverage and args.follow:
+            _parser.error('--coverage does not apply to --follow')
+
         stations = sorted(set(cfg['ISTREAMAPI']['Enabled'])) if args.stations=='all' else args.stations
 
-        with ISAOConn(start=start, end=end, stations=stations, exppath=_mainargs['exppath'], restrict=timedelta(days=10)) as iapi:
-            iapi.querySAO(verbose=args.verbose)
+        # --coverage downloads no records, the period is not restricted
+        with ISAOConn(start=start, end=end, stations=stations, exppath=_mainargs['exppath'],
+                      restrict=None if args.coverage else timedelta(days=10),
+                      window=window, concurrency=args.concurrency, group=args.group, products=products,
+                      resolution=args.resolution, aggregate=args.resample, wide=args.wide, availability=args.availability,
+                      cache=args.cache, cachettl=cachettl, format=args.format, **(dict(lag=lag) if lag else {})) as iapi:
+            if args.coverage:
+                iapi.coverage(verbose=args.verbose)
+            elif args.follow:
+                iapi.follow(verbose=args.verbose)
+            else:
+                iapi.querySAO(verbose=args.verbose)
 
     def igridoper(args):
+        import pandas as pd
         from ionoapi import stations
 
         _mainargs = _main(args)
 
-        try:
-            timestamp =  None if args.timestamp.lower() == 'null' else ciso8601.parse_datetime(args.timestamp)
-        except Exception as e:
-            _parser.error(f"Error while parsing argument 'TSTAMP:<ISO8601>' : {e}")
+        timestamp, start, end = None, None, None
+        if args.interval:
+            try:
+                start, end = [ciso8601.parse_datetime(v) for v in args.interval]
+                assert start <= end, AssertionError(f'START:{start} is after END:{end}')
+            except Exception as e:
+                _parser.error(f"Error while parsing arguments 'START:<ISO8601>', 'END:<ISO8601>' : {e}")
+        elif args.timestamp:
+            try:
+                timestamp =  None if args.timestamp.lower() == 'null' else ciso8601.parse_datetime(args.timestamp)
+            except Exception as e:
+                _parser.error(f"Error while parsing argument 'TSTAMP:<ISO8601>' : {e}")
+
+        poll = None
+        if args.follow:
+            try:
+                poll = pd.Timedelta(args.poll).to_pytimedelta()
+                assert poll > timedelta(0), AssertionError(f'Poll interval must be positive: {args.poll}')
+            except Exception as e:
+                _parser.error(f"Error while parsing argument 'POLL' : {e}")
+            if args.format != 'json' and args.format not in writers.STREAMING:
+                _parser.error(f"Formats finalized on exit cannot be followed, -f: json, {', '.join(writers.STREAMING)}")
 
+        points = []
         if args.station:
-            stations_ = {_.code:_ for _ in stations.Stations().stations}
+            stations_ = stations.Stations()
             try:
-                _station = stations_[args.station[0]]
-                lat, lon = _station.lat, _station.lon
+                for code in args.station:
+                    points.append((code, stations_[code].lat, stations_[code].lon))
             except Exception as e:
                 _parser.error(f"Error while converting --station argument to coordinates : {e}")
+        elif args.points:
+            from ionoapi import grids
+            try:
+                points = grids.readpoints(args.points)
+                assert points, AssertionError(f'No points found in {args.points}')
+            except Exception as e:
+                _parser.error(f"Error while reading --points file : {e}")
         else:
-            lat, lon = args.coordinates
+            points = [(None, lat, lon) for lat, lon in args.coordinates]
+
+        for _, lat, lon in points:
+            try:
+                assert -10<=lon<=40 and 34<=lat<=72, AssertionError(f'Ensure LAT:{lat}, LON:{lon}, are in-bounds -> LAT:{{34N - 72N}}, LON:{{10W - 40E}}')
+            except Exception as e:
+                _parser.error(str(e))
+
+        with IGridsConn(timestamp=timestamp, points=points, exppath=_mainargs['exppath'], store=not args.no_store,
+                        start=start, end=end, resolution=args.step, concurrency=args.concurrency, format=args.format,
+                        **(dict(poll=poll) if poll else {})) as igapi:
+            if args.follow:
+                igapi.follow(verbose=args.verbose)
+            elif args.interval:
+                igapi.querySeries(verbose=args.verbose)
+            else:
+                igapi.queryGrid(verbose=args.verbose)
 
+    def edensoper(args):
+        import pandas as pd
+
+        _mainargs = _main(args)
+
+        start, end = None, None
         try:
-            assert -10<=lon<=40 and 34<=lat<=72, AssertionError(f'Ensure LAT:{lat}, LON:{lon}, are in-bounds -> LAT:{{34N - 72N}}, LON:{{10W - 40E}}')
+            start, end = [None if v.lower() == 'null' else ciso8601.parse_datetime(v) for v in args.interval]
         except Exception as e:
-            _parser.error(str(e))
+            _parser.error(f"Error while parsing arguments 'START:<ISO8601>', 'END:<ISO8601>' : {e}")
 
-        with IGridsConn(timestamp=timestamp, lat=lat, lon=lon, exppath=_mainargs['exppath']) as igapi:
-            igapi.queryGrid(verbose=args.verbose)
+        window = None
+        if args.window:
+            try:
+                window = pd.Timedelta(args.window).to_pytimedelta()
+                assert window > timedelta(0), AssertionError(f'Window must be positive: {args.window}')
+            except Exception as e:
+                _parser.error(f"Error while parsing argument 'WINDOW' : {e}")
+
+        grid = None
+        if args.grid:
+            import numpy as np
+
+            try:
+                hmin, hmax, step = args.grid
+                assert step > 0 and hmin <= hmax, AssertionError(f'Malformed height grid: {hmin} {hmax} {step}')
+                grid = np.arange(hmin, hmax + step / 2, step)
+            except Exception as e:
+                _parser.error(f"Error while parsing argument --grid : {e}")
+
+        stations = sorted(set(cfg['ISTREAMAPI']['Enabled'])) if args.stations == 'all' else args.stations
+
+        with ISAOConn(start=start, end=end, stations=stations, exppath=_mainargs['exppath'], restrict=timedelta(days=10),
+                      window=window, concurrency=args.concurrency, group=args.group, format=args.format,
+                      availability=args.availability) as iapi:
+            iapi.queryEdens(grid=grid, verbose=args.verbose)
+
+    def serveoper(args):
+        import pandas as pd
+        from ionoapi import server
+
+        try:
+            window = pd.Timedelta(args.window).to_pytimedelta()
+            assert window > timedelta(0), AssertionError(f'Window must be positive: {args.window}')
+            cachesize = server.parsesize(args.cache_size)
+        except Exception as e:
+            _parser.error(f"Error while parsing arguments for serve : {e}")
+
+        with IApiConn() as iapi:
+            server.IServer(iapi, host=args.host, port=args.port, cachesize=cachesize, window=window,
+                           concurrency=args.concurrency, group=args.group, verbose=args.verbose).serve()
+
+    from ionoapi import writers
 
     _parser = argparse.ArgumentParser(prog='IONOAPI_oper', description='IONOAPI Operations')
     _parser.add_argument('--version', action='version', version='1.0.0')
@@ -504,24 +241,134 @@ def create_parser():
              f"DEFAULT: ('START':<null> | 'END':<null>), Max TDelta: 10days, END:<null> == NOW, START:<null> == END - 2hours", required=True)
     ionchar_parser.add_argument('-s', '--stations', nargs='+', type=str, help='Set stations (default: %(default)s)', default='all',
                          choices=sorted(set(cfg['ISTREAMAPI']['Enabled'])) + ['all',], required=False)
+    ionchar_parser.add_argument('-w', '--window', type=str, metavar='WINDOW', default=None,
+        help="Split the period into aligned sub-windows of %(metavar)s (e.g. 1d, 12h) fetched concurrently, "
+             "Max TDelta then applies per sub-window (default: %(default)s)", required=False)
+    ionchar_parser.add_argument('--concurrency', type=int, default=4,
+        help='Max concurrent requests (default: %(default)s)', required=False)
+    ionchar_parser.add_argument('-g', '--group', type=int, metavar='GROUP', default=None,
+        help='Split stations into concurrent requests of at most %(metavar)s stations, 1 == per-station requests, '
+             'failed stations are reported and partial results exported (default: %(default)s)', required=False)
+    ionchar_parser.add_argument('-f', '--format', type=str, default='csv', choices=list(writers.WRITERS),
+        help='Export format (default: %(default)s)', required=False)
+    ionchar_parser.add_argument('-p', '--products', nargs='+', type=str, default=['sao'], choices=['sao', 'obs', 'edens'],
+        help='Products requested concurrently per window and joined on the record id into one export (ionjoin_*), '
+             'edens as the per record profile peak and content (default: %(default)s)', required=False)
+    ionchar_parser.add_argument('-r', '--resolution', type=str, metavar='RESOLUTION', default='5m',
+        help='Period bounds are aligned to %(metavar)s, the bucket size with --resample (default: %(default)s)', required=False)
+    ionchar_parser.add_argument('--resample', type=str, default=None, choices=['mean', 'median', 'last', 'count'],
+        help='Aggregate the records per station into RESOLUTION buckets (default: %(default)s, the raw records)', required=False)
+    ionchar_parser.add_argument('--wide', action='store_true',
+        help='With --resample, export one row per bucket and a <characteristic>_<station> column per station', required=False)
+    ionchar_parser.add_argument('--cache', action='store_true',
+        help='Use the local Parquet cache, only the missing station/time ranges are requested', required=False)
+    ionchar_parser.add_argument('--availability', action='store_true',
+        help='Skip the station/days known to have no products, from the local availability index (idb/istations) '
+             'refreshed with the days not indexed yet', required=False)
+    ionchar_parser.add_argument('--coverage', action='store_true',
+        help='Refresh the availability index and report the days with products and the gaps per station, '
+             'without downloading any record, Max TDelta does not apply', required=False)
+    ionchar_parser.add_argument('--follow', action='store_true',
+        help="Keep running and poll for new records every 5 minutes (aligned), appending them to a single export file, "
+             "END must be null", required=False)
+    ionchar_parser.add_argument('--lag', type=str, metavar='LAG', default='30s',
+        help="Delay of each poll after the 5 minute boundary, with --follow (default: %(default)s)", required=False)
+    ionchar_parser.add_argument('--cache-ttl', type=str, metavar='TTL', default=None,
+        help=f"Cached records within %(metavar)s of their fetch time are re-fetched once %(metavar)s has elapsed "
+             f"(default: {cfg['CACHE']['SAO_TTL']})", required=False)
 
     # ------- IonoGrid Datasets parser -------
     iongrid_parser = subparsers.add_parser('igrid', help='Modelled Grid Datasets operations [application/json {JSON} format]')
     iongrid_parser.set_defaults(func=igridoper)
 
-    iongrid_parser.add_argument('-t', '--timestamp', type=str,
+    iongridtime_parser = iongrid_parser.add_mutually_exclusive_group(required=True)
+
+    iongridtime_parser.add_argument('-t', '--timestamp', type=str,
         metavar=('TSTAMP:<ISO8601>'),
         help=f"<Required> Set query timestamp %(metavar)s, "
-             f"DEFAULT: ('TSTAMP':<null>)", required=True)
+             f"DEFAULT: ('TSTAMP':<null>)", required=False)
+
+    iongridtime_parser.add_argument('-i', '--interval', nargs=2, type=str,
+        action='store', metavar=('START:<ISO8601>', 'END:<ISO8601>'),
+        help=f"Set period %(metavar)s for a per-location time-series every --step", required=False)
+
+    iongridtime_parser.add_argument('--follow', action='store_true',
+        help="Keep running, fetch each new foF2/hmF2 product as soon as it is published and export the location values "
+             "on every update (json: latest values, other formats: appended history)", required=False)
+
+    iongrid_parser.add_argument('--poll', type=str, metavar='POLL', default='1m',
+        help='Interval between product checks, with --follow (default: %(default)s)', required=False)
+
+    iongrid_parser.add_argument('--step', type=str, default='5m',
+        help='Time-series step (default: %(default)s)', required=False)
+
+    iongrid_parser.add_argument('--concurrency', type=int, default=4,
+        help='Max concurrent requests (default: %(default)s)', required=False)
 
     iongridpos_parser = iongrid_parser.add_mutually_exclusive_group(required=True)
 
     iongridpos_parser.add_argument('-s', '--station', type=str,
-        help='Set station', nargs=1, choices=sorted(set(cfg['ISTREAMAPI']['Enabled'])), required=False)
+        help='Set station(s)', nargs='+', choices=sorted(set(cfg['ISTREAMAPI']['Enabled'])), required=False)
 
     iongridpos_parser.add_argument('-c', '--coordinates', nargs=2, type=float,
-        action='store', metavar=('LAT:<float>{34N - 72N}', 'LON:<float>{10W - 40E}'),
-        help=f"<Set coordinates %(metavar)s, ", required=False)
+        action='append', metavar=('LAT:<float>{34N - 72N}', 'LON:<float>{10W - 40E}'),
+        help=f"<Set coordinates %(metavar)s, repeat for several locations", required=False)
+
+    iongridpos_parser.add_argument('-p', '--points', type=Path, metavar='FILE',
+        help='Set locations from a CSV (LAT, LON[, NAME]) or GeoJSON (Point features) %(metavar)s', required=False)
+
+    iongrid_parser.add_argument('-f', '--format', type=str, default='json', choices=['json'] + list(writers.WRITERS),
+        help='Export format, tabular formats hold one row per location and timestamp (default: %(default)s)', required=False)
+
+    iongrid_parser.add_argument('--no-store', action='store_true',
+        help='Do not use the local archive of decoded grids (CACHE:GRIDS)', required=False)
+
+    # ------- Electron density profiles parser -------
+    edens_parser = subparsers.add_parser('edens', help='Electron density profiles operations [ragged {Parquet} format]')
+    edens_parser.set_defaults(func=edensoper)
+
+    edens_parser.add_argument('-i', '--interval', nargs=2, type=str,
+        action='store', metavar=('START:<ISO8601>', 'END:<ISO8601>'),
+        help=f"<Required> Set period %(metavar)s, "
+             f"DEFAULT: ('START':<null> | 'END':<null>), Max TDelta: 10days, END:<null> == NOW, START:<null> == END - 2hours", required=True)
+    edens_parser.add_argument('-s', '--stations', nargs='+', type=str, help='Set stations (default: %(default)s)', default='all',
+                         choices=sorted(set(cfg['ISTREAMAPI']['Enabled'])) + ['all',], required=False)
+    edens_parser.add_argument('-w', '--window', type=str, metavar='WINDOW', default=None,
+        help="Split the period into aligned sub-windows of %(metavar)s (e.g. 1d, 12h) fetched concurrently, "
+             "Max TDelta then applies per sub-window (default: %(default)s)", required=False)
+    edens_parser.add_argument('--concurrency', type=int, default=4,
+        help='Max concurrent requests (default: %(default)s)', required=False)
+    edens_parser.add_argument('-g', '--group', type=int, metavar='GROUP', default=None,
+        help='Split stations into concurrent requests of at most %(metavar)s stations, 1 == per-station requests, '
+             'failed stations are reported and partial results exported (default: %(default)s)', required=False)
+    edens_parser.add_argument('--grid', nargs=3, type=float, metavar=('HMIN', 'HMAX', 'STEP'), default=None,
+        help='Interpolate every profile on the common heights HMIN..HMAX every STEP km (default: the measured heights)',
+        required=False)
+    edens_parser.add_argument('-f', '--format', type=str, default='parquet', choices=['parquet', 'arrow', 'ndjson'],
+        help='Export format, one row per profile with list columns of its heights and densities (default: %(default)s)',
+        required=False)
+    edens_parser.add_argument('--availability', action='store_true',
+        help='Skip the station/days known to have no products, from the local availability index (idb/istations)',
+        required=False)
+
+    # ------- Local HTTP query service parser -------
+    serve_parser = subparsers.add_parser('serve', help='Serve ionos/igrid queries over local HTTP from a single warm process')
+    serve_parser.set_defaults(func=serveoper)
+
+    serve_parser.add_argument('--host', type=str, default=cfg.get('SERVE', {}).get('HOST', '127.0.0.1'),
+        help='Listening address (default: %(default)s)', required=False)
+    serve_parser.add_argument('--port', type=int, default=cfg.get('SERVE', {}).get('PORT', 8080),
+        help='Listening port (default: %(default)s)', required=False)
+    serve_parser.add_argument('--cache-size', type=str, metavar='SIZE', default=cfg.get('SERVE', {}).get('CACHE_SIZE', '256MB'),
+        help='In-memory cache of decoded grids and SAO windows, least recently used entries are evicted beyond '
+             '%(metavar)s (default: %(default)s)', required=False)
+    serve_parser.add_argument('-w', '--window', type=str, metavar='WINDOW', default=cfg.get('SERVE', {}).get('SAO_WINDOW', '1h'),
+        help='SAO records are fetched and cached per station in aligned windows of %(metavar)s (default: %(default)s)',
+        required=False)
+    serve_parser.add_argument('--concurrency', type=int, default=4,
+        help='Max concurrent upstream requests per query (default: %(default)s)', required=False)
+    serve_parser.add_argument('-g', '--group', type=int, metavar='GROUP', default=None,
+        help='Split stations into concurrent requests of at most %(metavar)s stations (default: %(default)s)', required=False)
 
     return _parser
 
@@ -532,6 +379,8 @@ parser = create_parser()
 # (igrid last)  --> python iapi.py -v --exppath ./exports igrid -t null -c 38 29
 # (igrid @)     --> python iapi.py -v --exppath ./exports igrid -t 2025-02-03T12:35:00 -c 45 18
 # (ionos last)  --> python iapi.py -v --exppath ./exports ionos -i null null
+# (edens)       --> python iapi.py -v --exppath ./exports edens -i 2025-02-01T00:00:00 2025-03-01T00:00:00 -w 1d --grid 80 600 5
+# (serve)       --> python iapi.py -v serve --port 8080 && curl 'http://127.0.0.1:8080/igrid?lat=38&lon=29'
 # Help: python iapi.py --help
 def main(argv):
     Logger.logger.info('Remote IONOAPI Operations')
@@ -5,6 +5,9 @@ import contextlib
 import asyncio
 import threading
 
+from .config import Logger
+
+
 class LoopExit(SystemExit):
     code = 1
 
@@ -33,7 +36,6 @@ class Loop(object):
 
     @property
     def loop(self):
-        from iapi import Logger
         if not self._loop:
             try:
                 self._loop = self.eventloop()
@@ -69,7 +71,6 @@ class Loop(object):
         self._shutdown = None
 
     def close(self):
-        from iapi import Logger
         if self._shutdown is None or self._shutdown.is_set() or self.loop.is_closed():
             return
 
@@ -128,7 +129,6 @@ class AsyncCTXClass:
         pass
 
     def close(self):
-        from iapi import Logger
         if (not self.loop_ or not self.loop_.started) or self.loop.is_closed():
             return
 
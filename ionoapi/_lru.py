@@ -0,0 +1,94 @@
+import sys
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+def sizeof(value) -> int:
+    """Approximate memory footprint in bytes of the cached values (DataFrames, DataArrays, arrays, bytes, dicts)"""
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(_) for _ in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache(object):
+    """In-memory LRU cache bounded by the total size (bytes) of its values, with optional per entry TTL
+
+    `get_` single-flights the computation of missing keys: concurrent callers of the same key await one task.
+    """
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, size, expires = entry
+        if expires is not None and time.monotonic() >= expires:
+            self.pop(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None, ttl: Optional[float] = None):
+        size = sizeof(value) if size is None else size
+        self.pop(key)
+        if size > self.maxsize:
+            return value
+        self._entries[key] = (value, size, time.monotonic() + ttl if ttl is not None else None)
+        self.size += size
+        while self.size > self.maxsize:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+        return value
+
+    def pop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+            return entry[0]
+
+    async def get_(self, key: Hashable, factory: Callable[[], Awaitable[Any]], ttl: Optional[float] = None):
+        value = self.get(key, self._missing)
+        if value is not self._missing:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            async def compute_():
+                try:
+                    return self.put(key, await factory(), ttl=ttl)
+                finally:
+                    self._inflight.pop(key, None)
+            task = self._inflight[key] = asyncio.ensure_future(compute_())
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return dict(entries=len(self._entries), size=self.size, maxsize=self.maxsize, hits=self.hits,
+                    misses=self.misses, evictions=self.evictions)
+
+    def __contains__(self, key):
+        return self.get(key, self._missing) is not self._missing
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __init__(self, maxsize: int):
+        self.maxsize = int(maxsize)
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._inflight = dict()
+        self._missing = object()
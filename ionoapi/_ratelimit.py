@@ -0,0 +1,146 @@
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, UTC
+from typing import Dict, Optional, Union
+
+from furl import furl
+
+from .config import Logger
+
+
+def retryafter(headers) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, in delta-seconds or HTTP-date form"""
+    value = headers.get('retry-after') if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0., float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0., (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket(object):
+    """Token bucket of `rate` requests per second with a `burst` capacity
+
+    Tokens are reserved rather than polled: each caller takes its token immediately (the balance may go negative)
+    and waits until the bucket would have refilled it, so waiters are served in arrival order without busy loops.
+    `throttle` (on 429 responses) halves the rate and honours Retry-After, `recover` (on success) raises it back
+    additively up to the configured rate.
+    """
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = max(0., self.paused - now)
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            rate = max(self.floor, self.rate * self.decrease)
+            if rate < self.rate:
+                Logger.logger.warning(f'Rate limited by {self.name}, slowing down to {rate:.2f} req/s')
+            self.rate = rate
+            self.tokens = min(self.tokens, 0.)
+            if retry_after:
+                self.paused = max(self.paused, now + retry_after)
+
+    def recover(self):
+        if self.rate < self.ceiling:
+            with self._lock:
+                self.rate = min(self.ceiling, self.rate + self.increase)
+
+    def __init__(self, rate: float, burst: float = None, name: str = None, floor: float = None,
+                 decrease: float = 0.5, increase: float = None):
+        self.name = name
+        self.rate = self.ceiling = float(rate)
+        self.burst = float(burst if burst else max(1., rate))
+        self.floor = floor if floor else self.ceiling / 100.
+        self.decrease = decrease
+        self.increase = increase if increase else self.ceiling / 50.
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused = 0.
+        self._lock = threading.Lock()
+
+
+class RateLimiter(object):
+    """Request quotas of an API host: a host wide bucket and optional buckets for endpoint path prefixes
+
+    One limiter is kept per host and process, shared by sync and async clients, see `RateLimiter.host`
+    and the RATELIMIT section of the APIs in conf.yaml. Without a RATE the host is not limited, but still
+    backs off on 429 responses.
+    """
+    _hosts = dict()
+
+    @classmethod
+    def host(cls, uri: Union[str, furl], ratelimit: Optional[dict] = None):
+        uri = furl(uri)
+        host = f'{uri.host}:{uri.port}'
+        if host not in cls._hosts:
+            ratelimit = ratelimit or dict()
+            cls._hosts[host] = cls(host, rate=ratelimit.get('RATE'), burst=ratelimit.get('BURST'),
+                                   endpoints=ratelimit.get('ENDPOINTS'))
+        return cls._hosts[host]
+
+    @staticmethod
+    def path(endpoint: str):
+        return str(endpoint).split('?', 1)[0].strip('/')
+
+    def buckets(self, endpoint: str):
+        path = self.path(endpoint)
+        buckets = [self.bucket]
+        for prefix, bucket in self.endpoints.items():
+            if path == prefix or path.startswith(f'{prefix}/'):
+                buckets.append(bucket)
+                break
+        return buckets
+
+    def acquire(self, endpoint: str = ''):
+        for bucket in self.buckets(endpoint):
+            bucket.acquire()
+
+    async def acquire_(self, endpoint: str = ''):
+        for bucket in self.buckets(endpoint):
+            await bucket.acquire_()
+
+    def feedback(self, endpoint: str, status: int, headers=None):
+        buckets = self.buckets(endpoint)
+        if status == 429:
+            retry_after = retryafter(headers)
+            for bucket in buckets:
+                bucket.throttle(retry_after)
+        elif status < 400:
+            for bucket in buckets:
+                bucket.recover()
+
+    def __init__(self, host: str, rate: float = None, burst: float = None, endpoints: Dict[str, dict] = None):
+        self.host = host
+        # Unlimited hosts get a bucket too, so that 429 responses still slow them down
+        self.bucket = TokenBucket(rate if rate else 1000., burst=burst if rate else 1000., name=host,
+                                  floor=None if rate else 1.)
+        self.endpoints = {
+            self.path(k): TokenBucket(v['RATE'], burst=v.get('BURST'), name=f'{host}/{self.path(k)}')
+            for k, v in (endpoints or dict()).items()
+        }
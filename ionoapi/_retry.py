@@ -0,0 +1,244 @@
+import time
+import asyncio
+import threading
+from typing import Optional, Union
+
+import httpx
+from furl import furl
+from tenacity import AsyncRetrying, Retrying, stop_after_attempt, stop_after_delay, wait_random_exponential
+from tenacity import retry_if_exception
+
+from .config import Logger
+
+RETRYABLE_STATUS = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+
+class CircuitOpen(Exception):
+    """Raised without contacting the host while its circuit breaker is open"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f'Circuit open for {host}, retry after {retry_after:.0f}s')
+        self.host = host
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def retryable(e: BaseException):
+    """Transport errors and 408/425/429/5xx responses are worth a retry, other 4xx, parse errors etc. are not"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRYABLE_STATUS
+    return isinstance(e, httpx.TransportError)
+
+
+def hostdown(e: BaseException):
+    # Failures counting towards the circuit breaker, the host answering 4xx/429 is up
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, (httpx.TransportError, TimeoutError))
+
+
+class RetryBudget(object):
+    """Token bucket bounding the retries to a host: each retry takes a token, each successful call returns `ratio`"""
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def __init__(self, capacity: float = 50, ratio: float = 0.2):
+        self.capacity = capacity
+        self.ratio = ratio
+        self.tokens = capacity
+        self._lock = threading.Lock()
+
+
+class CircuitBreaker(object):
+    """Per host circuit breaker
+
+    `threshold` consecutive failures open the circuit and calls fail fast with `CircuitOpen`. After `reset` seconds
+    the circuit is half-open and lets a single probe through, its outcome closes or re-opens the circuit.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() - self.opened >= self.reset:
+            return self.HALF_OPEN
+        return self._state
+
+    @property
+    def retry_after(self):
+        if self._state != self.OPEN:
+            return 0.
+        return max(0., self.reset - (time.monotonic() - self.opened))
+
+    def allow(self):
+        # True when the call is the half-open probe, its outcome (or `release`) lets the next one through
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            raise CircuitOpen(self.host, self.retry_after)
+
+    def release(self):
+        # The probe ended without an outcome (cancelled), the next call probes again
+        with self._lock:
+            self._probing = False
+
+    def success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                Logger.logger.info(f'Circuit closed for {self.host}')
+            self._state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self._state == self.CLOSED and self.failures >= self.threshold):
+                Logger.logger.warning(f'Circuit open for {self.host} after {self.failures} consecutive failures')
+                self._state = self.OPEN
+                self.opened = time.monotonic()
+                self._probing = False
+
+    def asdict(self):
+        return dict(host=self.host, state=self.state, failures=self.failures, retry_after=self.retry_after)
+
+    def __init__(self, host: str, threshold: int = 5, reset: float = 60):
+        self.host = host
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened = None
+        self._state = self.CLOSED
+        self._probing = False
+        self._lock = threading.Lock()
+
+
+class RetryPolicy(object):
+    """Retries of the API calls to a host, bounded by attempts, a per-call deadline and the host retry budget
+
+    One policy (with its budget and circuit breaker) is kept per host and process, see `RetryPolicy.host`
+    and the RETRY section of the APIs in conf.yaml.
+    """
+    _hosts = dict()
+
+    @classmethod
+    def host(cls, uri: Union[str, furl], retry: Optional[dict] = None):
+        uri = furl(uri)
+        host = f'{uri.host}:{uri.port}'
+        if host not in cls._hosts:
+            retry = retry or dict()
+            cls._hosts[host] = cls(
+                host, attempts=retry.get('ATTEMPTS', 5), deadline=retry.get('DEADLINE', 600),
+                wait_max=retry.get('WAIT_MAX', 30),
+                budget=RetryBudget(retry.get('BUDGET', 50), retry.get('BUDGET_RATIO', 0.2)),
+                breaker=CircuitBreaker(host, threshold=retry.get('BREAKER_THRESHOLD', 5), reset=retry.get('BREAKER_RESET', 60))
+            )
+        return cls._hosts[host]
+
+    @classmethod
+    def breakers(cls):
+        return {host: policy.breaker.asdict() for host, policy in cls._hosts.items()}
+
+    def retry_(self, e: BaseException):
+        if not retryable(e):
+            return False
+        if not self.budget.withdraw():
+            Logger.logger.warning(f'Retry budget for {self.host} exhausted, giving up: {e}')
+            return False
+        return True
+
+    def record(self, e: Optional[BaseException] = None):
+        if e is None:
+            self.budget.deposit()
+            self.breaker.success()
+        elif hostdown(e):
+            self.breaker.failure()
+        elif not isinstance(e, CircuitOpen):
+            # The host answered, whatever the request outcome
+            self.breaker.success()
+
+    def log(self, state):
+        Logger.logger.warning(f'Retrying {self.host} (attempt {state.attempt_number + 1}/{self.attempts}) in '
+                              f'{state.next_action.sleep:.1f}s after: {state.outcome.exception()!r}')
+
+    def retrying(self, deadline: float, retrying=Retrying):
+        return retrying(stop=stop_after_attempt(self.attempts) | stop_after_delay(deadline),
+                        wait=wait_random_exponential(multiplier=self.wait_min, max=self.wait_max),
+                        retry=retry_if_exception(self.retry_), before_sleep=self.log, reraise=True)
+
+    async def call_(self, fn, *args, deadline: Optional[float] = None, **kwargs):
+        deadline = self.deadline if deadline is None else deadline
+        probe, inflight, timeout = False, False, None
+        try:
+            async with asyncio.timeout(deadline) as timeout:
+                async for attempt in self.retrying(deadline, retrying=AsyncRetrying):
+                    with attempt:
+                        probe = self.breaker.allow()
+                        try:
+                            inflight = True
+                            result = await fn(*args, **kwargs)
+                        except Exception as e:
+                            probe = inflight = False
+                            self.record(e)
+                            raise
+                        probe = inflight = False
+                        self.record()
+                        return result
+        except TimeoutError as e:
+            if timeout is None or not timeout.expired():
+                raise
+            # The host did not answer within the deadline: a failure, of the probe too. Expired during a backoff
+            # sleep, the failed attempt has been recorded already
+            if inflight:
+                probe = False
+                self.breaker.failure()
+            raise DeadlineExceeded(f'{self.host} call exceeded its {deadline}s deadline') from e
+        finally:
+            # Cancelled (gather, client gone) while probing
+            if probe:
+                self.breaker.release()
+
+    def call(self, fn, *args, deadline: Optional[float] = None, **kwargs):
+        deadline = self.deadline if deadline is None else deadline
+        probe = False
+        try:
+            for attempt in self.retrying(deadline):
+                with attempt:
+                    probe = self.breaker.allow()
+                    try:
+                        result = fn(*args, **kwargs)
+                    except Exception as e:
+                        probe = False
+                        self.record(e)
+                        raise
+                    probe = False
+                    self.record()
+                    return result
+        finally:
+            if probe:
+                self.breaker.release()
+
+    def __init__(self, host: str, attempts: int = 5, deadline: float = 600, wait_min: float = 1, wait_max: float = 30,
+                 budget: RetryBudget = None, breaker: CircuitBreaker = None):
+        self.host = host
+        self.attempts = attempts
+        self.deadline = deadline
+        self.wait_min = wait_min
+        self.wait_max = wait_max
+        self.budget = budget if budget else RetryBudget()
+        self.breaker = breaker if breaker else CircuitBreaker(host)
@@ -0,0 +1,98 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+BINARY = pa.binary(16)
+DTYPE = pd.ArrowDtype(BINARY)
+
+_NIBBLES = np.full(256, 0xFF, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _NIBBLES[_c] = _i
+for _i, _c in enumerate(b'ABCDEF'):
+    _NIBBLES[_c] = _i + 10
+
+_HEXDIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+# Positions of the hex digits in the canonical 8-4-4-4-12 representation
+_CANONICAL = np.array([_ for _ in range(36) if _ not in (8, 13, 18, 23)])
+
+
+def _fixed(chunk: pa.Array):
+    # (n, width) uint8 view of a null-free string/binary array whose values share one width, None otherwise
+    if chunk.null_count or not (pa.types.is_string(chunk.type) or pa.types.is_binary(chunk.type) or
+                                pa.types.is_large_string(chunk.type) or pa.types.is_large_binary(chunk.type)):
+        return None
+
+    n = len(chunk)
+    otype = np.int64 if (pa.types.is_large_string(chunk.type) or pa.types.is_large_binary(chunk.type)) else np.int32
+    _, offsets, data = chunk.buffers()
+    offsets = np.frombuffer(offsets, dtype=otype)[chunk.offset:chunk.offset + n + 1]
+    width = int(offsets[1] - offsets[0]) if n else 36
+    if width not in (32, 36) or np.any(np.diff(offsets) != width):
+        return None
+
+    raw = np.frombuffer(data, dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(n, width)
+    return raw[:, _CANONICAL] if width == 36 else raw
+
+
+def _binary(chunk: pa.Array) -> pa.Array:
+    if chunk.type == BINARY:
+        return chunk
+
+    hexchars = _fixed(chunk)
+    if hexchars is not None:
+        nibbles = _NIBBLES[hexchars]
+        if not (nibbles == 0xFF).any():
+            packed = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+            return pa.FixedSizeBinaryArray.from_buffers(BINARY, len(chunk), [None, pa.py_buffer(packed.tobytes())])
+
+    # Nulls, UUID objects or non-canonical representations
+    return pa.array([None if _ is None else (_ if isinstance(_, uuid.UUID) else uuid.UUID(str(_))).bytes
+                     for _ in chunk.to_pylist()], type=BINARY)
+
+
+def tobinary(values: pa.Array | pa.ChunkedArray) -> pa.ChunkedArray:
+    """UUID strings (or UUID objects) to a fixed-width 16-byte binary Arrow column"""
+    if isinstance(values, pa.Array):
+        values = pa.chunked_array([values])
+    return pa.chunked_array([_binary(_) for _ in values.chunks], type=BINARY)
+
+
+def frombinary(values: pd.Series) -> pa.ChunkedArray:
+    if isinstance(values.dtype, pd.ArrowDtype) and values.dtype.pyarrow_dtype == BINARY:
+        return pa.chunked_array(values.array._pa_array)
+    return tobinary(pa.array(values.astype(object).tolist()))
+
+
+def isbinary(values: pd.Series):
+    return isinstance(values.dtype, pd.ArrowDtype) and values.dtype.pyarrow_dtype == BINARY
+
+
+def tostr(values: pd.Series) -> pd.Series:
+    """Canonical 8-4-4-4-12 strings of a 16-byte binary UUID column"""
+    chunked = frombinary(values)
+    out = np.full((len(values), 36), ord('-'), dtype=np.uint8)
+    offset = 0
+    for chunk in chunked.chunks:
+        n = len(chunk)
+        raw = np.frombuffer(chunk.buffers()[1], dtype=np.uint8)[chunk.offset * 16:(chunk.offset + n) * 16].reshape(n, 16)
+        out[offset:offset + n, _CANONICAL[0::2]] = _HEXDIGITS[raw >> 4]
+        out[offset:offset + n, _CANONICAL[1::2]] = _HEXDIGITS[raw & 0x0F]
+        offset += n
+
+    strs = out.view('S36').reshape(-1).astype(str)
+    if chunked.null_count:
+        strs = strs.astype(object)
+        strs[chunked.is_null().to_numpy(zero_copy_only=False)] = None
+    return pd.Series(strs, index=values.index, name=values.name, dtype=object)
+
+
+def touuid(values: pd.Series) -> pd.Series:
+    """`uuid.UUID` objects of a 16-byte binary UUID column, built on demand"""
+    return pd.Series([None if _ is None else uuid.UUID(bytes=_) for _ in frombinary(values).to_pylist()],
+                     index=values.index, name=values.name, dtype=object)
+
+
+def types_mapper(dtype: pa.DataType):
+    return DTYPE if dtype == BINARY else None
@@ -1,25 +1,105 @@
 import asyncio
 import os, sys
-import magic
 import uuid
 import io
-import apyio
+import tempfile
 import orjson
+import functools
+import inspect
 from contextlib import nullcontext
 from enum import Enum, IntEnum
-from tqdm import tqdm
-from tqdm.asyncio import tqdm as asynctqdm
-import ormsgpack
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from tenacity import AsyncRetrying
-from typing import Union
+from typing import List, Union
 from furl import furl
-import pandas as pd
 
-from . import _asyncu
-
-from iapi import Logger, cfg
+from . import _asyncu, _uuids
+from ._retry import RetryPolicy
+from ._ratelimit import RateLimiter
+
+from .config import Logger, cfg
+
+
+def readparquet(source, columns: List[str] = None, row_groups: List[int] = None, memory_map=False, uuids=False):
+    """Parquet to DataFrame, the `id` column is kept as 16-byte binary UUIDs unless `uuids` asks for `uuid.UUID` objects"""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(source, memory_map=memory_map)
+    table = pf.read_row_groups(row_groups, columns=columns) if row_groups is not None else pf.read(columns=columns)
+    if 'id' in table.column_names:
+        table = table.set_column(table.column_names.index('id'), 'id', _uuids.tobinary(table['id']))
+    df = table.to_pandas(split_blocks=True, self_destruct=True, types_mapper=_uuids.types_mapper)
+    if uuids and 'id' in df:
+        df['id'] = _uuids.touuid(df['id'])
+    return df
+
+
+def retrying(fn):
+    """Run the API call under the retry policy of the client host, a `deadline` keyword overrides the policy deadline"""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, deadline: float = None, **kwargs):
+            return await self.policy.call_(fn, self, *args, deadline=deadline, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(self, *args, deadline: float = None, **kwargs):
+            return self.policy.call(fn, self, *args, deadline=deadline, **kwargs)
+    return wrapper
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """Connection pool shared by all the API clients of an origin within one event loop
+
+    Each `APIClientASYNC` keeps its own `httpx.AsyncClient` (base url, headers, params) on top of a refcounted
+    transport, so conn objects living in the same process reuse the open (TLS) connections. The pool is sized
+    by the POOL section of the API in conf.yaml.
+    """
+    _shared = dict()
+
+    @classmethod
+    def acquire(cls, uri: Union[str, furl], pool: dict = None):
+        loop = asyncio.get_running_loop()
+        uri = furl(uri)
+        key = (id(loop), uri.scheme, uri.host, uri.port, tuple(sorted((pool or {}).items())))
+        shared = cls._shared.get(key)
+        if shared is None or shared.closed or shared.loop is not loop:
+            shared = cls._shared[key] = cls(key, loop, pool=pool)
+        shared.refs += 1
+        return shared
+
+    @staticmethod
+    def http2(pool: dict):
+        if not pool.get('HTTP2', False):
+            return False
+        try:
+            import h2
+        except ImportError:
+            Logger.logger.warning('HTTP/2 requested but the h2 package is not installed, falling back to HTTP/1.1')
+            return False
+        return True
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        # Called once by every client sharing the transport, the pool closes with the last one
+        self.refs -= 1
+        if self.refs > 0 or self.closed:
+            return
+        self.closed = True
+        if self._shared.get(self.key) is self:
+            del self._shared[self.key]
+        await self.transport.aclose()
+
+    def __init__(self, key, loop: asyncio.AbstractEventLoop, pool: dict = None):
+        pool = pool or dict()
+        limits = httpx.Limits(max_connections=pool.get('MAX_CONNECTIONS', 100),
+                              max_keepalive_connections=pool.get('MAX_KEEPALIVE', 20),
+                              keepalive_expiry=pool.get('KEEPALIVE_EXPIRY', 5.0))
+        self.key = key
+        self.loop = loop
+        self.refs = 0
+        self.closed = False
+        self.transport = httpx.AsyncHTTPTransport(retries=3, verify=False, http2=self.http2(pool), limits=limits)
 
 
 class ReturnType(IntEnum):
@@ -31,24 +111,34 @@ class ReturnType(IntEnum):
 
 class APIClientASYNC(_asyncu.AsyncCTXClass):
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=60),
-           retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, Exception)))
-    async def df(self, endpoint, headers=None, params=None, data=None, json=None, post=False, files=None):
+    @retrying
+    async def df(self, endpoint, headers=None, params=None, data=None, json=None, post=False, files=None,
+                 columns: List[str] = None, row_groups: List[int] = None, uuids=False):
         resp = None
         content_type = None
+        spooled = None
         try:
-            async with apyio.BytesIO() as bf:
-                _client = await self.client()
+            _client = await self.client()
 
-                async with (_client.stream('GET', endpoint, headers=headers, params=params) if post is False else
-                            _client.stream('POST', endpoint, headers=headers, params=params, data=data, json=json, files=files)
-                ) as r:
-                    if r.status_code in (422,):
-                        r.raise_for_status()
-                    headers_ = dict(r.headers.raw)
-                    total = int(headers_[b"content-length"])
-                    content_type = headers_[b"content-type"].decode('utf-8')
-                    isocstream = bool(content_type == 'application/octet-stream')
+            await self.limiter.acquire_(endpoint)
+            async with (_client.stream('GET', endpoint, headers=headers, params=params) if post is False else
+                        _client.stream('POST', endpoint, headers=headers, params=params, data=data, json=json, files=files)
+            ) as r:
+                self.limiter.feedback(endpoint, r.status_code, r.headers)
+                if r.status_code >= 400:
+                    await r.aread()
+                    r.raise_for_status()
+                headers_ = dict(r.headers.raw)
+                total = int(headers_.get(b"content-length", 0))
+                content_type = headers_[b"content-type"].decode('utf-8')
+                isocstream = bool(content_type == 'application/octet-stream')
+                if isocstream and self.spool is not None and total > self.spool:
+                    spooled = tempfile.NamedTemporaryFile(prefix='ionoapi_', suffix='.parquet', dir=self.spooldir, delete=False)
+
+                if isocstream and self.verbose:
+                    from tqdm.asyncio import tqdm as asynctqdm
+
+                with (spooled if spooled else io.BytesIO()) as bf:
                     with asynctqdm(total=total, unit_scale=True, unit_divisor=1024, unit="B") if (isocstream and self.verbose) else nullcontext() as p:
                         num_bytes_downloaded = r.num_bytes_downloaded
                         async for chunk in r.aiter_bytes():
@@ -56,15 +146,17 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
                             if p:
                                 p.update(r.num_bytes_downloaded - num_bytes_downloaded)
                             num_bytes_downloaded = r.num_bytes_downloaded
-                await bf.seek(0)
-                if isocstream:
-                    resp = pd.read_parquet(bf._stream, engine='pyarrow')
-                else:
-                    resp = await bf.getvalue()
 
-            if isocstream:
-                resp['id'] = resp['id'].apply(lambda _: uuid.UUID(_))
-            else:
+                    if spooled:
+                        bf.flush()
+                        resp = readparquet(spooled.name, columns=columns, row_groups=row_groups, memory_map=True, uuids=uuids)
+                    elif isocstream:
+                        bf.seek(0)
+                        resp = readparquet(bf, columns=columns, row_groups=row_groups, uuids=uuids)
+                    else:
+                        resp = bf.getvalue()
+
+            if not isocstream:
                 resp = orjson.loads(resp.decode('utf-8'))
 
         except httpx.ConnectError as e:
@@ -76,16 +168,21 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
         except httpx.ReadTimeout as e:
             Logger.logger.critical(f'Upon request Read Timeout: {e}')
             raise e
-        except httpx.HTTPStatusError as e:
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
             raise e
         except Exception as e:
             Logger.logger.error(f'Unable to complete API request {e}')
             raise httpx.RequestError(e.__str__())
+        finally:
+            if spooled:
+                try:
+                    os.unlink(spooled.name)
+                except OSError:
+                    pass
 
         return resp
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=60),
-           retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout)))
+    @retrying
     async def get(self, endpoint, headers=None, params=None, rtype: ReturnType=None, pydmodel=None):
         resp = None
         msgpack_ = rtype and ReturnType.msgpack==rtype
@@ -93,7 +190,9 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
             headers = headers | {"accept": "application/x-msgpack"} if headers else {"accept": "application/x-msgpack"}
         try:
             _client = await self.client()
+            await self.limiter.acquire_(endpoint)
             r = await _client.get(endpoint, headers=headers, params=params)
+            self.limiter.feedback(endpoint, r.status_code, r.headers)
             r.raise_for_status()
             if rtype is None:
                 try:
@@ -105,6 +204,8 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
                     rtype = ReturnType.content
 
             if msgpack_:
+                import ormsgpack
+
                 content = ormsgpack.unpackb(r.content)
             else:
                 content = r.content
@@ -135,7 +236,7 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
         except httpx.ReadTimeout as e:
             Logger.logger.critical(f'Upon request Read Timeout: {e}')
             raise e
-        except httpx.HTTPStatusError as e:
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
             raise e
         except Exception as e:
             import traceback
@@ -145,15 +246,17 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
 
         return resp
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=60),
-           retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, Exception)))
+    @property
+    def breaker(self):
+        return self.policy.breaker
+
     async def client(self):
         if not self._client:
             try:
-                transport = httpx.AsyncHTTPTransport(retries=3, verify=False)
+                transport = SharedTransport.acquire(self.uri, pool=self.pool)
                 timeout = httpx.Timeout(self._timeout, read=self._timeout)
                 self._client = httpx.AsyncClient(transport=transport, base_url=self.uri.url, verify=False,
-                        headers=self._headers, params=self._params, timeout=timeout)
+                        headers=self._headers, params=self._params, timeout=timeout, auth=self.auth)
             except httpx.ConnectError as e:
                 Logger.logger.critical(f'API Client Connection Error: {e}')
                 raise e
@@ -169,9 +272,17 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
 
         return self._client
 
-    def __init__(self, uri: Union[str, furl], headers=None, params=None, timeout=120, loop: _asyncu.Loop = None, verbose=False, _logprefix=None):
+    def __init__(self, uri: Union[str, furl], headers=None, params=None, timeout=120, loop: _asyncu.Loop = None, verbose=False, _logprefix=None,
+                 spool: int = None, spooldir: str = None, pool: dict = None, retry: dict = None, ratelimit: dict = None,
+                 auth: httpx.Auth = None):
         super().__init__(loop=loop, _logprefix=_logprefix)
         self.uri = uri
+        self.auth = auth
+        self.pool = pool
+        self.policy = RetryPolicy.host(uri, retry)
+        self.limiter = RateLimiter.host(uri, ratelimit)
+        self.spool = spool
+        self.spooldir = spooldir
         self._client = None
         self._headers = headers
         self._params = params
@@ -213,18 +324,26 @@ class APIClientASYNC(_asyncu.AsyncCTXClass):
 
 class APIClient(object):
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=60),
-           retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout)))
-    def df(self, endpoint, headers=None, params=None):
+    @retrying
+    def df(self, endpoint, headers=None, params=None, columns: List[str] = None, row_groups: List[int] = None,
+           uuids=False):
         resp = None
         content_type = None
         try:
             with io.BytesIO() as bf:
+                self.limiter.acquire(endpoint)
                 with self.client.stream('GET', endpoint, headers=headers, params=params) as r:
+                    self.limiter.feedback(endpoint, r.status_code, r.headers)
+                    if r.status_code >= 400:
+                        r.read()
+                        r.raise_for_status()
                     headers_ = dict(r.headers.raw)
                     total = int(headers_[b"content-length"])
                     content_type = headers_[b"content-type"].decode('utf-8')
                     isocstream = bool(content_type=='application/octet-stream')
+                    if isocstream and self.verbose:
+                        from tqdm import tqdm
+
                     with tqdm(total=total, unit_scale=True, unit_divisor=1024, unit="B") if (isocstream and self.verbose) else nullcontext() as p:
                         num_bytes_downloaded = r.num_bytes_downloaded
                         for chunk in r.iter_bytes():
@@ -234,13 +353,11 @@ class APIClient(object):
                             num_bytes_downloaded = r.num_bytes_downloaded
                 bf.seek(0)
                 if isocstream:
-                    resp = pd.read_parquet(bf, engine='pyarrow')
+                    resp = readparquet(bf, columns=columns, row_groups=row_groups, uuids=uuids)
                 else:
                     resp = bf.getvalue()
 
-            if isocstream:
-                resp['id'] = resp['id'].apply(lambda _: uuid.UUID(_))
-            else:
+            if not isocstream:
                 resp = orjson.loads(resp.decode('utf-8'))
 
         except httpx.ConnectError as e:
@@ -252,21 +369,24 @@ class APIClient(object):
         except httpx.ReadTimeout as e:
             Logger.logger.critical(f'Upon request Read Timeout: {e}')
             raise e
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            raise e
         except Exception as e:
             Logger.logger.error(f'C Unable to complete API request {e}')
             raise httpx.RequestError(e.__str__())
 
         return resp
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=60),
-           retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout)))
+    @retrying
     def get(self, endpoint, headers=None, params=None, rtype: ReturnType=None, pydmodel=None):
         resp = None
         msgpack_ = rtype and ReturnType.msgpack==rtype
         if msgpack_:
             headers = headers | {"accept": "application/x-msgpack"} if headers else {"accept": "application/x-msgpack"}
         try:
+            self.limiter.acquire(endpoint)
             r = self.client.get(endpoint, headers=headers, params=params)
+            self.limiter.feedback(endpoint, r.status_code, r.headers)
             r.raise_for_status()
             if rtype is None:
                 try:
@@ -278,6 +398,8 @@ class APIClient(object):
                     rtype = ReturnType.content
 
             if msgpack_:
+                import ormsgpack
+
                 content = ormsgpack.unpackb(r.content)
             else:
                 content = r.content
@@ -302,6 +424,8 @@ class APIClient(object):
         except httpx.ConnectTimeout as e:
             Logger.logger.critical(f'Upon request Connection Timeout: {e}')
             raise e
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            raise e
         except Exception as e:
             Logger.logger.error(f'D Unable to complete API request {e}')
             raise httpx.RequestError(e.__str__())
@@ -309,15 +433,17 @@ class APIClient(object):
         return resp
 
     @property
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=60),
-           retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout)))
+    def breaker(self):
+        return self.policy.breaker
+
+    @property
     def client(self):
         if not self._client:
             try:
                 transport = httpx.HTTPTransport(retries=3)
                 timeout = httpx.Timeout(self._timeout, read=self._timeout)
                 self._client = httpx.Client(transport=transport, base_url=self.uri.url, verify=False,
-                    headers=self._headers, params=self._params, timeout=timeout)
+                    headers=self._headers, params=self._params, timeout=timeout, auth=self.auth)
             except httpx.ConnectError as e:
                 Logger.logger.critical(f'API Client Connection Error: {e}')
                 raise e
@@ -330,8 +456,12 @@ class APIClient(object):
 
         return self._client
 
-    def __init__(self, uri: Union[str, furl], headers=None, params=None, timeout=30, verbose=False, _logprefix=None):
+    def __init__(self, uri: Union[str, furl], headers=None, params=None, timeout=30, verbose=False, _logprefix=None,
+                 retry: dict = None, ratelimit: dict = None, auth: httpx.Auth = None):
         self.uri = uri
+        self.auth = auth
+        self.policy = RetryPolicy.host(uri, retry)
+        self.limiter = RateLimiter.host(uri, ratelimit)
 
         self._client = None
         self._headers = headers
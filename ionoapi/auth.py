@@ -0,0 +1,159 @@
+import os
+import json
+import base64
+import fcntl
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+from datetime import datetime, timedelta, UTC
+
+import ciso8601
+import httpx
+
+from .config import Logger, cfg
+
+
+def expiration(resp: dict, token: str) -> datetime:
+    """Token expiration (naive UTC) from `expires_at`, `expires_in` or the JWT `exp` claim"""
+    if resp.get('expires_at'):
+        expires = ciso8601.parse_datetime(resp['expires_at'])
+        return expires.astimezone(UTC).replace(tzinfo=None) if expires.tzinfo else expires
+    now = datetime.now(UTC).replace(tzinfo=None)
+    if resp.get('expires_in'):
+        return now + timedelta(seconds=float(resp['expires_in']))
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return datetime.fromtimestamp(claims['exp'], UTC).replace(tzinfo=None)
+    except Exception:
+        Logger.logger.warning('Unable to determine the token expiration, assuming 5 minutes')
+        return now + timedelta(minutes=5)
+
+
+class JWTAuth(httpx.Auth):
+    """Bearer JWT authentication for the httpx based API clients
+
+    The token is obtained with HTTP Basic credentials from `auth_url` (as `helpers.HeaderAuthenticationJWT` does)
+    and cached on disk next to its expiration, so that all the processes of the user share it: a refresh holds an
+    exclusive lock on the cache and first re-reads it, in case another process refreshed meanwhile. Tokens expiring
+    within `ahead` seconds are still used while a background refresh runs; a 401 forces a refresh and one replay.
+    """
+
+    def __init__(self, auth_url: str, username: str, password: str, path: str | Path = None, ahead: float = 300,
+                 parameter: str = 'Authorization', scheme: Optional[str] = 'Bearer', verify=False):
+        self.auth_url = str(auth_url)
+        self.username = username
+        self.password = password
+        self.ahead = timedelta(seconds=ahead)
+        self.parameter = parameter
+        self.scheme = scheme
+        self.verify = verify
+
+        key = hashlib.sha1(f'{self.auth_url}|{username}'.encode('utf-8')).hexdigest()[:12]
+        self.path = Path(path if path else cfg['CACHE']['AUTH']).joinpath(f'{key}.json')
+        self._token = None
+        self._expires = None
+        self._lock = threading.Lock()
+        self._refreshing = None
+
+    @property
+    def fresh(self):
+        now = datetime.now(UTC).replace(tzinfo=None)
+        return self._token is not None and now < self._expires - self.ahead
+
+    @property
+    def valid(self):
+        return self._token is not None and datetime.now(UTC).replace(tzinfo=None) < self._expires - timedelta(seconds=5)
+
+    def read(self):
+        try:
+            data = json.loads(self.path.read_text())
+            self._token, self._expires = data['token'], ciso8601.parse_datetime(data['expires_at'])
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            Logger.logger.warning(f'Discarding unreadable token cache {self.path}: {e}')
+
+    def write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        tmppath = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        fd = os.open(tmppath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(auth_url=self.auth_url, username=self.username, token=self._token,
+                           expires_at=self._expires.isoformat()), f)
+        os.replace(tmppath, self.path)
+
+    def fetch(self) -> Tuple[str, datetime]:
+        r = httpx.get(self.auth_url, auth=(self.username, self.password), verify=self.verify, timeout=30)
+        r.raise_for_status()
+        resp = r.json()
+        return resp['access_token'], expiration(resp, resp['access_token'])
+
+    def refresh(self, stale: Optional[str] = None):
+        """Refresh the token across processes, `stale` forces a new token unless another process already replaced it"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+            with open(self.path.with_suffix('.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self.read()
+                    if self.fresh and self._token != stale:
+                        return self._token
+                    self._token, self._expires = self.fetch()
+                    self.write()
+                    Logger.logger.info(f'Refreshed API token for {self.username}, expires at {self._expires.isoformat()}')
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return self._token
+
+    def token(self, stale: Optional[str] = None):
+        if self._token is None:
+            self.read()
+        if stale is None and self.valid:
+            return self._token
+        return self.refresh(stale=stale)
+
+    async def token_(self, stale: Optional[str] = None):
+        if self._token is None:
+            self.read()
+        if stale is None and self.valid:
+            if not self.fresh and (self._refreshing is None or self._refreshing.done()):
+                # About to expire, keep using it while refreshing in the background
+                self._refreshing = asyncio.create_task(asyncio.to_thread(self.refresh))
+                self._refreshing.add_done_callback(self.refreshed)
+            return self._token
+        return await asyncio.to_thread(self.refresh, stale)
+
+    @staticmethod
+    def refreshed(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            Logger.logger.warning(f'Background token refresh failed: {task.exception()}')
+
+    def authorize(self, request: httpx.Request, token: str):
+        request.headers[self.parameter] = f'{self.scheme} {token}' if self.scheme else token
+
+    def sync_auth_flow(self, request: httpx.Request):
+        token = self.token()
+        self.authorize(request, token)
+        response = yield request
+        if response.status_code == 401:
+            self.authorize(request, self.token(stale=token))
+            yield request
+
+    async def async_auth_flow(self, request: httpx.Request):
+        token = await self.token_()
+        self.authorize(request, token)
+        response = yield request
+        if response.status_code == 401:
+            self.authorize(request, await self.token_(stale=token))
+            yield request
+
+
+def jwtauth(api: dict) -> Optional[JWTAuth]:
+    """JWTAuth of an API section of conf.yaml, None when it has no AUTH URL or credentials"""
+    auth = api.get('AUTH') or dict()
+    if not (auth.get('URL') and api.get('USER') and api.get('PASS')):
+        return None
+    return JWTAuth(auth['URL'], api['USER'], api['PASS'], ahead=auth.get('REFRESH_AHEAD', 300))
@@ -0,0 +1,128 @@
+import os
+import json
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, UTC
+
+import portion as P
+import pandas as pd
+
+from .config import Logger, cfg
+
+
+class Availability(object):
+    """Per-station index of the UTC days with products, built from `Iono.istations_` and saved to CACHE:AVAILABILITY
+
+    `checked` holds the days already asked for and `covered[station]` those the station had products in. Days are
+    asked for once, only when they ended more than `ttl` ago (records of recent days may still be ingested), so
+    that every day of the index is final and a refresh requests the days not yet checked only.
+    """
+
+    @staticmethod
+    def dumps(interval: P.Interval):
+        return P.to_data(interval, conv=lambda v: v.isoformat())
+
+    @staticmethod
+    def loads(data):
+        return P.from_data(data, conv=lambda v: datetime.fromisoformat(v))
+
+    @staticmethod
+    def days(interval: P.Interval) -> List[datetime]:
+        days = []
+        for atomic in interval:
+            if atomic.empty:
+                continue
+            # An interval open at a midnight upper bound ends with the previous day
+            upper = pd.Timestamp(atomic.upper)
+            inclusive = 'left' if atomic.right == P.OPEN and upper == upper.floor('D') else 'both'
+            days.extend(pd.date_range(pd.Timestamp(atomic.lower).floor('D'), upper, freq='D',
+                                      inclusive=inclusive).to_pydatetime())
+        return sorted(set(days))
+
+    @staticmethod
+    def day(day: datetime) -> P.Interval:
+        return P.closedopen(day, day + timedelta(days=1))
+
+    def read(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            self.checked = self.loads(data['checked'])
+            self.covered = {station: self.loads(_) for station, _ in data['covered'].items()}
+        except Exception as e:
+            Logger.logger.warning(f'Discarding unreadable availability index {self.path}: {e}')
+            self.checked, self.covered = P.empty(), dict()
+
+    def write(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmppath = self.path.with_suffix(f'.{os.getpid()}.tmp')
+            tmppath.write_text(json.dumps(dict(
+                checked=self.dumps(self.checked),
+                covered={station: self.dumps(interval) for station, interval in sorted(self.covered.items())}
+            )))
+            os.replace(tmppath, self.path)
+        except Exception as e:
+            Logger.logger.warning(f'Unable to save the availability index {self.path}: {e}')
+
+    def final(self, now: Optional[datetime] = None) -> P.Interval:
+        # Days ended more than `ttl` ago
+        now = now if now else datetime.now(UTC).replace(tzinfo=None)
+        return P.closedopen(-P.inf, pd.Timestamp(now - self.ttl).floor('D').to_pydatetime())
+
+    def unchecked(self, interval: P.Interval, now: Optional[datetime] = None) -> List[datetime]:
+        return self.days((interval & self.final(now=now)) - self.checked)
+
+    async def refresh_(self, api, interval: P.Interval, concurrency: int = 4, now: Optional[datetime] = None) -> int:
+        """Asks for the final days of `interval` not checked yet, one request per day, returns the number of days"""
+        from . import criono
+
+        days = self.unchecked(interval, now=now)
+        if not days:
+            return 0
+
+        semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+
+        async def stations_(day):
+            async with semaphore:
+                return await criono.Iono(start=day, end=day + timedelta(days=1), bounds='[)',
+                                         products=self.products).istations_(api, validate=False)
+
+        results = await asyncio.gather(*(stations_(_) for _ in days), return_exceptions=True)
+        for day, result in zip(days, results):
+            if isinstance(result, BaseException):
+                Logger.logger.warning(f'Unable to retrieve the stations with products on {day.date().isoformat()}: {result}')
+                continue
+            for station in {_['code'] for _ in result or []}:
+                self.covered[station] = self.covered.get(station, P.empty()) | self.day(day)
+            self.checked |= self.day(day)
+
+        self.write()
+        return len(days)
+
+    def empty(self, station: str) -> P.Interval:
+        """Checked days without any product of `station`"""
+        return self.checked - self.covered.get(station, P.empty())
+
+    def restrict(self, requested: Dict[str, P.Interval]) -> Tuple[Dict[str, P.Interval], Dict[str, P.Interval]]:
+        """(requested intervals without the days known to be empty, the days left out) per station"""
+        trimmed, gaps = dict(), dict()
+        for station, interval in requested.items():
+            empty = self.empty(station)
+            trimmed[station] = interval - empty
+            if not (interval & empty).empty:
+                gaps[station] = interval & empty
+        return trimmed, gaps
+
+    def __init__(self, path: str | Path = None, products: Optional[List[str]] = None, ttl: Optional[timedelta] = None):
+        path = path if path else cfg['CACHE'].get('AVAILABILITY')
+        self.path = Path(path) if path else None
+        self.products = products
+        self.ttl = ttl if ttl is not None else pd.Timedelta(cfg['CACHE']['SAO_TTL']).to_pytimedelta()
+        self.checked = P.empty()
+        self.covered = dict()
+        self.read()
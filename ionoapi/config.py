@@ -0,0 +1,122 @@
+import os
+import logging
+import logging.handlers
+
+import yaml
+from furl import furl
+
+
+def join(loader, node):
+    seq = loader.construct_sequence(node)
+    return ''.join([str(i) for i in seq])
+
+
+# libyaml's loader when available, ~10x faster than the pure Python one
+Loader = getattr(yaml, 'CLoader', yaml.Loader)
+yaml.add_constructor('!join', join)
+yaml.add_constructor('!join', join, Loader=Loader)
+# conf.yaml and the relative paths it holds are resolved against the directory of iapi.py
+F = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'iapi.py')
+
+
+class Configuration(object):
+    CFG = dict()
+
+    @classmethod
+    def normpath(cls, extpath, basepath=F):
+        if basepath is None:
+            return None
+        elif os.path.isabs(extpath):
+            return extpath
+        elif os.path.isfile(basepath):
+            return str(os.path.normpath(os.path.join(os.path.dirname(basepath), extpath)))
+        else:
+            return str(os.path.normpath(os.path.join(basepath, extpath)))
+
+    @classmethod
+    def parseCFG(cls):
+        cls.CFG['DATA_PATH'] = cls.normpath(cls.CFG['DATA_PATH'], F)
+        cls.CFG['ETC_PATH'] = cls.normpath(cls.CFG['ETC_PATH'], F)
+        cls.CFG['LOG_PATH'] = cls.normpath(cls.CFG['LOG_PATH'], F)
+
+        cls.CFG['CACHE_PATH'] = cls.normpath(cls.CFG['CACHE_PATH'], F)
+
+        for rk in ('STATIONS',):
+            for k, v in cls.CFG[rk].items():
+                cls.CFG[rk][k] = cls.normpath(v, F)
+
+        for k in ('SAO', 'GRIDS', 'AUTH', 'STATIONS', 'AVAILABILITY'):
+            if cls.CFG['CACHE'].get(k):
+                cls.CFG['CACHE'][k] = cls.normpath(cls.CFG['CACHE'][k], F)
+
+        for api in (['TECHTIDEAPI', 'ISTREAMAPI']):
+            cls.CFG[api]['BASE'] = furl(cls.CFG[api]['BASE'])
+            cls.CFG[api]['BASE_API'] = furl(cls.CFG[api]['BASE_API'])
+
+    def __init__(self):
+        _CFG = self.normpath('./conf.yaml')
+        with open(_CFG) as f:
+            Configuration.CFG = yaml.load(f, Loader=Loader)
+
+        self.parseCFG()
+
+
+_cfobj = Configuration()
+cfg = _cfobj.CFG
+
+
+class Logger_:
+
+    class __Logger:
+        @property
+        def logger(self):
+            if not self._logger:
+                self.setLogger()
+            return self._logger
+
+        def setLogger(self, ):
+            # create logger
+            logger = logging.getLogger(cfg['App'])
+            logger.setLevel(getattr(logging, cfg['LOGGING'].get('STDOUT','DEBUG')))
+
+            fh = None
+            if self.path:
+                # create file handler which log even debug messages
+                fh = logging.handlers.TimedRotatingFileHandler(self.path, when='midnight', interval=1,
+                                                               backupCount=52 * 5, encoding=None, delay=0)
+                fh.setLevel(getattr(logging, cfg['LOGGING'].get('FILE','INFO')))
+
+            # create RQ handler with a higher log level
+            ch = logging.StreamHandler()
+            ch.setLevel(getattr(logging, cfg['LOGGING'].get('STREAM','DEBUG')))
+
+            # create formatter and add it to the handlers
+            formatter = logging.Formatter(fmt='%(levelname)s: %(message)s - %(asctime)s', datefmt='%H:%M:%S')
+            if self.path:
+                fh.setFormatter(formatter)
+                logger.addHandler(fh)
+
+            ch.setFormatter(formatter)
+            logger.addHandler(ch)
+            self._logger = logger
+
+        def __init__(self, logpath=None):
+            self._logger = None
+            self.path = logpath
+
+        def __str__(self):
+            return repr(self)
+
+    instance = None
+
+    def __init__(self, logpath=None):
+        if (not Logger_.instance) or (logpath and not Logger_.instance.path):
+            Logger_.instance = Logger_.__Logger(logpath=logpath)
+        else:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+
+Logger = Logger_()
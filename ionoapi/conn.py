@@ -0,0 +1,915 @@
+import os
+import re
+import json
+import asyncio
+from io import StringIO
+from pathlib import Path
+from datetime import datetime, timedelta, UTC
+from typing import List, Optional, Tuple
+
+import ciso8601
+
+# numpy, pandas, xarray, portion and the API clients are imported where they are used, so that each sub-command
+# only loads what it needs, see bench/startup.py
+from . import _asyncu
+from .config import Logger, cfg
+
+_BARGS = re.compile(r'^(?P<lower>[(\[])(?P<upper>[)\]])$')
+
+class IApiConn(_asyncu.AsyncCTXClass):
+
+    def stop(self):
+        if not self._ownapis or self.loop.is_closed() or self._shutdown.is_set():
+            return
+
+        self._shutdown.set()
+
+        try:
+            self.loop.run_until_complete(asyncio.sleep(1))
+        except:
+            try:
+                self._shutdown.clear()
+            except:
+                pass
+        finally:
+            self.disconnect()
+
+    def disconnect(self):
+        try:
+            for iapi in self.apis.values():
+                iapi.close()
+        except:
+            pass
+
+    def connect(self):
+        from . import api, auth
+
+        try:
+            istreamapi = api.APIClientASYNC(uri=cfg['ISTREAMAPI']['BASE_API'], loop=self.loop, spool=cfg['ISTREAMAPI'].get('SPOOL'),
+                                            pool=cfg['ISTREAMAPI'].get('POOL'), retry=cfg['ISTREAMAPI'].get('RETRY'),
+                                            ratelimit=cfg['ISTREAMAPI'].get('RATELIMIT'), auth=auth.jwtauth(cfg['ISTREAMAPI']))
+        except Exception as e:
+            Logger.logger.error(f'Unable to initialize Ionostream API Client: {e}')
+            exit(0)
+
+        try:
+            ttideapi = api.APIClientASYNC(uri=cfg['TECHTIDEAPI']['BASE_API'], loop=self.loop, pool=cfg['TECHTIDEAPI'].get('POOL'),
+                                          retry=cfg['TECHTIDEAPI'].get('RETRY'), ratelimit=cfg['TECHTIDEAPI'].get('RATELIMIT'),
+                                          auth=auth.jwtauth(cfg['TECHTIDEAPI']))
+        except Exception as e:
+            Logger.logger.error(f'Unable to initialize TechTIDE API Client: {e}')
+            exit(0)
+
+        self.apis['istreamapi'] = istreamapi
+        self.apis['ttideapi'] = ttideapi
+
+        self._connected = True
+
+    def __init__(self, loop: _asyncu.Loop = None, apis: dict = None):
+        # Conns given a (running) loop and the API clients of another conn share them and leave them open
+        super().__init__(loop=loop)
+
+        self._shutdown = asyncio.Event()
+        self._connected = False
+        self._ownapis = apis is None
+        self.apis = dict()
+        if apis is None:
+            self.connect()
+        else:
+            self.apis.update(apis)
+            self._connected = True
+
+    def __del__(self):
+        try:
+            self.stop()
+        except:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+class ISAOConn(IApiConn):
+    ICHARS = ['foF2', 'mufD', 'fminF', 'qf', 'qe', 'phF2lyr', 'foF2p', 'b0IRI', 'b1IRI']
+
+    def export(self, data, exppath, columns=None, overwrite=False):
+        from . import writers
+
+        if exppath.exists():
+            exppath.unlink(missing_ok=True)
+        with writers.writer(self.format, exppath, columns=columns) as writer:
+            for i in range(0, max(data.shape[0], 1), self.batchsize):
+                writer.write(data.iloc[i:i + self.batchsize])
+
+    def windows(self, start: Optional[datetime] = None, end: Optional[datetime] = None, bounds='[]'):
+        import pandas as pd
+
+        start = self.start if start is None else start
+        end = self.end if end is None else end
+        if self.window is None:
+            return [(start, end, bounds)]
+
+        step = pd.Timedelta(self.window)
+        edges = pd.date_range(pd.Timestamp(start).floor(step) + step, end, freq=step, inclusive='left')
+        edges = [start] + [_ for _ in edges.to_pydatetime().tolist() if start < _ < end] + [end]
+        n = len(edges) - 1
+        return [(s, e, (bounds[0] if i == 0 else '[') + (bounds[1] if i == n - 1 else ')'))
+                for i, (s, e) in enumerate(zip(edges[:-1], edges[1:]))]
+
+    def plan(self, intervals: dict):
+        import portion as P
+
+        shared = dict()
+        for station, interval in intervals.items():
+            if not interval.empty:
+                shared.setdefault(P.to_string(interval), (interval, []))[1].append(station)
+
+        jobs = []
+        for interval, stations in shared.values():
+            groups = [stations[i:i + self.group] for i in range(0, len(stations), self.group)] if self.group else [stations]
+            for atomic in interval:
+                bounds = ('[' if atomic.left == P.CLOSED else '(') + (']' if atomic.right == P.CLOSED else ')')
+                jobs.extend((*w, g) for w in self.windows(atomic.lower, atomic.upper, bounds) for g in groups)
+        return jobs
+
+    async def gather_(self, fetch_, jobs: list, what: str = 'records'):
+        # (job, frame) of the jobs fetched successfully, failures are recorded per station in self.failed
+        dfs = await asyncio.gather(*(fetch_(*j) for j in jobs), return_exceptions=True)
+
+        self.failed = dict()
+        fetched = []
+        for (start, end, bounds, stations), df in zip(jobs, dfs):
+            if isinstance(df, BaseException):
+                for station in stations:
+                    self.failed.setdefault(station, []).append((start, end))
+                    Logger.logger.error(f'Unable to retrieve {station} {what} {bounds[0]}{start.isoformat()}, {end.isoformat()}{bounds[1]}: {df}')
+                continue
+            fetched.append(((start, end, bounds, stations), df))
+
+        if jobs and len(self.failed) and not fetched:
+            raise RuntimeError(f'All {len(jobs)} requests failed')
+        return fetched
+
+    async def available_(self, requested: dict, verbose=False):
+        # Requested intervals without the days the availability index knows to be empty for the station
+        import portion as P
+        from . import availability
+
+        if not self.availability:
+            return requested
+
+        index = availability.Availability()
+        try:
+            days = await index.refresh_(self.apis['istreamapi'], P.Interval(*requested.values()), concurrency=self.concurrency)
+            if verbose and days:
+                Logger.logger.info(f'Availability index refreshed with {days} days')
+        except Exception as e:
+            Logger.logger.warning(f'Unable to refresh the availability index, requesting all the stations: {e}')
+            return requested
+
+        trimmed, gaps = index.restrict(requested)
+        for station, gap in gaps.items():
+            Logger.logger.info(f'Skipping {station}, no products {P.to_string(gap, conv=lambda v: v.isoformat())}')
+        return trimmed
+
+    async def coverage_(self, verbose=False):
+        import portion as P
+        from . import availability
+
+        index = availability.Availability()
+        interval = P.closed(self.start, self.end)
+        try:
+            days = await index.refresh_(self.apis['istreamapi'], interval, concurrency=self.concurrency)
+            if verbose:
+                Logger.logger.info(f'Availability index refreshed with {days} days --> {index.path}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to refresh the availability index: {e}')
+            exit(0)
+
+        conv = lambda v: v.isoformat()
+        unknown = interval - index.checked
+        for station in self.stations:
+            covered, gaps = interval & index.covered.get(station, P.empty()), interval & index.empty(station)
+            Logger.logger.info(f'{station}: {len(index.days(covered))} days with products, '
+                               f'gaps: {P.to_string(gaps, conv=conv) if not gaps.empty else "none"}')
+        if not unknown.empty:
+            Logger.logger.info(f'Not indexed yet (within {index.ttl} of now): {P.to_string(unknown, conv=conv)}')
+
+    def coverage(self, verbose=False):
+        self.loop.run_until_complete(self.coverage_(verbose=verbose))
+
+    async def fetchSAO_(self, characteristics: List[str], verbose=False, requested: Optional[dict] = None):
+        import pandas as pd
+        import portion as P
+        from . import criono
+
+        if requested is None:
+            requested = {station: P.closed(self.start, self.end) for station in self.stations}
+        requested = await self.available_(requested, verbose=verbose)
+        intervals = dict(requested)
+
+        cache = None
+        if self.cache:
+            from . import saocache
+            cache = saocache.SAOCache(characteristics=characteristics, ttl=self.cachettl)
+            # Taken before the requests: the records of the fetched intervals are trusted up to it at most
+            fetched = datetime.now(UTC).replace(tzinfo=None)
+            intervals = {station: cache.missing(station, interval, now=fetched) for station, interval in intervals.items()}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_(start, end, bounds, stations):
+            async with semaphore:
+                dfO = await criono.Iono(
+                    start=start, end=end, bounds=bounds, stations=stations
+                ).df_(
+                    self.apis['istreamapi'], characteristics=characteristics,
+                    order_attrs=['timestamp', 'station'], order_by=['asc', ]
+                )
+            if verbose and len(jobs) > 1:
+                Logger.logger.info(f'Retrieved {dfO.shape[0]} remote records {bounds[0]}{start.isoformat()}, {end.isoformat()}{bounds[1]} {stations}')
+            return dfO
+
+        jobs = self.plan(intervals)
+        frames = []
+        for (start, end, bounds, stations), dfO in await self.gather_(fetch_, jobs, 'records'):
+            frames.append(dfO)
+            if cache is not None:
+                interval = P.Interval.from_atomic(P.CLOSED if bounds[0] == '[' else P.OPEN, start, end, P.CLOSED if bounds[1] == ']' else P.OPEN)
+                for station in stations:
+                    try:
+                        cache.store(station, dfO[dfO['station'] == station], interval, fetched, now=fetched)
+                    except Exception as e:
+                        Logger.logger.warning(f'Unable to cache {station} records: {e}')
+
+        if cache is not None:
+            cached = [cache.load(station, requested[station] - interval) for station, interval in intervals.items()]
+            cached = [_ for _ in cached if _ is not None]
+            if verbose:
+                Logger.logger.info(f'Loaded {sum(_.shape[0] for _ in cached)} cached records, requested {len(jobs)} missing intervals')
+            frames.extend(cached)
+
+        if len(frames) == 1:
+            return frames[0]
+        if not frames:
+            return pd.DataFrame(columns=['id', 'timestamp', 'station'] + list(characteristics))
+
+        return pd.concat(frames, ignore_index=True).sort_values(['timestamp', 'station'], kind='stable', ignore_index=True)
+
+    async def fetchJoined_(self, characteristics: List[str], verbose=False):
+        import pandas as pd
+        import portion as P
+        from . import criono
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_(start, end, bounds, stations):
+            async with semaphore:
+                dfJ = await criono.Iono(
+                    start=start, end=end, bounds=bounds, stations=stations
+                ).joindf_(self.apis['istreamapi'], characteristics=characteristics, products=self.products)
+            if verbose and len(jobs) > 1:
+                Logger.logger.info(f'Retrieved {dfJ.shape[0]} remote joined records {bounds[0]}{start.isoformat()}, {end.isoformat()}{bounds[1]} {stations}')
+            return dfJ
+
+        requested = await self.available_({station: P.closed(self.start, self.end) for station in self.stations}, verbose=verbose)
+        jobs = self.plan(requested)
+        frames = [dfJ for _, dfJ in await self.gather_(fetch_, jobs, f'{"/".join(self.products)} records')]
+        if not frames:
+            return pd.DataFrame(columns=['id', 'timestamp', 'station'] + list(characteristics))
+
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True).sort_values(
+            ['timestamp', 'station'], kind='stable', ignore_index=True)
+
+    async def querySAO_(self, verbose=False):
+        import pandas as pd
+
+        try:
+            # Gather REMOTE Ionostream Datasets
+            # SAO characteristics, or joined with the observations/profiles of the same records
+            dfO = await (self.fetchJoined_(self.ICHARS, verbose=verbose) if self.joined else
+                         self.fetchSAO_(self.ICHARS, verbose=verbose))
+            if verbose:
+                Logger.logger.info(f'Retrieved {dfO.shape[0]} remote records')
+            if self.failed:
+                Logger.logger.warning(f'Exporting partial results, failed stations: {", ".join(sorted(self.failed))}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to retrieve remote Ionospheric characteristics query results: {e}')
+            exit(0)
+
+        assert isinstance(dfO, pd.DataFrame), AssertionError('Ionospheric characteristics query results is not a valid type')
+
+        suffix = ''
+        if self.aggregate:
+            from . import resample
+
+            try:
+                # Per station `resolution` buckets, or one (time x station) matrix per characteristic
+                if self.wide:
+                    dfO = resample.wide(dfO, self.resolution, how=self.aggregate, start=self.start, end=self.end,
+                                        stations=self.stations)
+                else:
+                    dfO = resample.resample(dfO, self.resolution, how=self.aggregate)
+                if verbose:
+                    Logger.logger.info(f'Resampled to {dfO.shape[0]} rows of {self.aggregate} every {self.resolution}')
+            except Exception as e:
+                Logger.logger.error(f'Unable to resample Ionospheric characteristics query results: {e}')
+                exit(0)
+            minutes = int(self.resolution.total_seconds() // 60)
+            suffix = f'_{self.aggregate}{minutes}m' + ('_wide' if self.wide else '')
+
+        expfile = f'{"ionjoin" if self.joined else "ionchar"}_{self.start.strftime("%Y%m%dT%H%M")}_{self.end.strftime("%Y%m%dT%H%M")}{suffix}.{self.format}'
+        exppath_ = self.exppath.joinpath(expfile)
+
+        try:
+            self.export(dfO, exppath_)
+            Logger.logger.info(f'Successfully exported Ionospheric characteristics query results --> {exppath_}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to export Ionospheric characteristics query results: {e}')
+            exit(0)
+
+
+    @property
+    def joined(self):
+        return self.products is not None and list(self.products) != ['sao']
+
+    def querySAO(self, verbose=False):
+        self.loop.run_until_complete(self.querySAO_(verbose=verbose))
+
+    async def fetchEdens_(self, verbose=False):
+        import pandas as pd
+        import portion as P
+        from . import criono
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_(start, end, bounds, stations):
+            async with semaphore:
+                dfE = await criono.Iono(
+                    start=start, end=end, bounds=bounds, stations=stations
+                ).edensdf_(self.apis['istreamapi'], order_attrs=['timestamp', 'station'], order_by=['asc', ])
+            if verbose and len(jobs) > 1:
+                Logger.logger.info(f'Retrieved {dfE.shape[0]} remote profile rows {bounds[0]}{start.isoformat()}, {end.isoformat()}{bounds[1]} {stations}')
+            return dfE
+
+        requested = await self.available_({station: P.closed(self.start, self.end) for station in self.stations}, verbose=verbose)
+        jobs = self.plan(requested)
+        frames = [dfE for _, dfE in await self.gather_(fetch_, jobs, 'profiles')]
+        if not frames:
+            return pd.DataFrame(columns=['id', 'timestamp', 'station', 'trueHeight', 'electronDensity'])
+
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    async def queryEdens_(self, grid=None, verbose=False):
+        from . import profiles
+
+        try:
+            dfE = await self.fetchEdens_(verbose=verbose)
+            if self.failed:
+                Logger.logger.warning(f'Exporting partial results, failed stations: {", ".join(sorted(self.failed))}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to retrieve remote electron density profiles query results: {e}')
+            exit(0)
+
+        try:
+            # One row per profile: its peak, integrated content and height/density lists (on `grid` when given)
+            dfP = profiles.Profiles.fromframe(dfE).frame(grid=grid)
+            order = [_ for _ in ('timestamp', 'station') if _ in dfP]
+            if order:
+                dfP = dfP.sort_values(order, kind='stable', ignore_index=True)
+            if verbose:
+                Logger.logger.info(f'Decoded {dfP.shape[0]} profiles from {dfE.shape[0]} remote rows')
+        except Exception as e:
+            Logger.logger.error(f'Unable to decode electron density profiles: {e}')
+            exit(0)
+
+        expfile = f'edens_{self.start.strftime("%Y%m%dT%H%M")}_{self.end.strftime("%Y%m%dT%H%M")}.{self.format}'
+        exppath_ = self.exppath.joinpath(expfile)
+
+        try:
+            self.export(dfP, exppath_)
+            Logger.logger.info(f'Successfully exported electron density profiles query results --> {exppath_}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to export electron density profiles query results: {e}')
+            exit(0)
+
+    def queryEdens(self, grid=None, verbose=False):
+        self.loop.run_until_complete(self.queryEdens_(grid=grid, verbose=verbose))
+
+    def tick(self, now: datetime):
+        import pandas as pd
+
+        # Next poll: the upcoming `resolution` boundary, plus `lag` for the ionograms to be scaled and ingested
+        return (pd.Timestamp(now).floor(self.resolution) + self.resolution).to_pydatetime() + self.lag
+
+    async def follow_(self, writer, verbose=False):
+        import pandas as pd
+        import portion as P
+
+        self.lastseen = dict()
+        requested = {station: P.closed(self.start, self.end) for station in self.stations}
+        lookback = self.end - self.start
+
+        while True:
+            try:
+                dfO = await self.fetchSAO_(self.ICHARS, verbose=verbose, requested=requested)
+            except Exception as e:
+                Logger.logger.error(f'Unable to retrieve remote Ionospheric characteristics, retrying on next poll: {e}')
+                dfO = None
+
+            if dfO is not None and not dfO.empty:
+                # Windows of lagging stations may overlap records already exported
+                seen = dfO['station'].map(self.lastseen).astype('datetime64[us]').fillna(pd.Timestamp.min)
+                dfO = dfO[dfO['timestamp'] > seen]
+
+            if dfO is not None and not dfO.empty:
+                writer.write(dfO)
+                writer.flush()
+                for station, timestamp in dfO.groupby('station', sort=False)['timestamp'].max().items():
+                    self.lastseen[station] = timestamp.to_pydatetime()
+                Logger.logger.info(f'Exported {dfO.shape[0]} new records up to {dfO["timestamp"].max().isoformat()} --> {writer.path}')
+            elif verbose:
+                Logger.logger.info(f'No new records')
+
+            now = datetime.now(UTC).replace(tzinfo=None)
+            await asyncio.sleep(max(0., (self.tick(now) - now).total_seconds()))
+
+            end = datetime.now(UTC).replace(tzinfo=None)
+            requested = {
+                station: P.openclosed(max(self.lastseen[station], end - lookback), end) if station in self.lastseen
+                else P.closed(max(self.start, end - lookback), end)
+                for station in self.stations
+            }
+
+    def follow(self, verbose=False):
+        from . import writers
+
+        if self.format not in writers.STREAMING:
+            raise ValueError(f'Cannot follow into {self.format} files, available: {", ".join(writers.STREAMING)}')
+        expfile = f'ionchar_{self.start.strftime("%Y%m%dT%H%M")}_follow.{self.format}'
+        exppath_ = self.exppath.joinpath(expfile)
+        exppath_.unlink(missing_ok=True)
+
+        Logger.logger.info(f'Following Ionospheric characteristics every {self.resolution} (+{self.lag}) --> {exppath_}')
+        writer = writers.writer(self.format, exppath_)
+        try:
+            self.loop.run_until_complete(self.follow_(writer, verbose=verbose))
+        finally:
+            writer.close()
+            Logger.logger.info(f'Stopped following, {writer.rows} records exported --> {exppath_}')
+
+    def __init__(self, start: Optional[datetime]=None, end:Optional[datetime]=None, stations: List[str]=None,
+        resolution: str | None = '5m', exppath: str | Path=None, bounds='[]', attributes: List[str] = None,
+        restrict: Optional[timedelta] = None, order_attrs: List[str] = None, order_by: List[str] = None,
+        window: Optional[timedelta] = None, concurrency: int = 4, group: Optional[int] = None,
+        cache: bool = False, cachettl: Optional[timedelta] = None, format: str = 'csv', batchsize: int = 100000,
+        lag: timedelta = timedelta(seconds=30), products: List[str] = None, aggregate: Optional[str] = None,
+        wide: bool = False, availability: bool = False, loop: _asyncu.Loop = None, apis: dict = None):
+        import pandas as pd
+
+        _bmapper = {('lower', '['): 'inclusive', ('upper', ']'): 'inclusive', ('lower', '('): 'exclusive',
+                    ('upper', ')'): 'exclusive'}
+        try:
+            bounds_ = _BARGS.match(bounds).groupdict()
+            bounds_ = {k: _bmapper[(k, v)] for k, v in bounds_.items()}
+        except:
+            raise ValueError(f'Malformed bounds attribute: {bounds}')
+
+        _RESP = re.compile(r'^(?P<freqmul>\d+)(?P<freq>\w+)$')
+        try:
+            resolution_ = _RESP.match(resolution).groupdict()
+            resolution_['freqmul'] = int(resolution_['freqmul'])
+        except:
+            raise ValueError(f'Malformed resolution attribute: {resolution}')
+
+        end = ciso8601.parse_datetime(end) if isinstance(end, str) else (
+            end if end else datetime.now(UTC).replace(tzinfo=None))
+
+        start = ciso8601.parse_datetime(start) if isinstance(start, str) else (
+            start if start else end-timedelta(hours=2))
+
+
+        self.resolution = pd.Timedelta(resolution)
+
+        start = pd.Timestamp(start).floor(self.resolution)
+        end = pd.Timestamp(end).ceil(self.resolution)
+
+        start = start.to_pydatetime()
+        end = end.to_pydatetime()
+
+        if bounds_['lower'] == 'exclusive':
+            start += timedelta(milliseconds=1)
+
+        if bounds_['upper'] == 'exclusive':
+            end = end - timedelta(milliseconds=1)
+
+        if restrict is not None:
+            try:
+                assert (window if window is not None else end - start) <= restrict, AssertionError(f'Cannot request datasets for intervals more than {restrict}')
+            except AssertionError as e:
+                Logger.logger.error(f'{e}')
+                exit(0)
+
+        self.exppath=exppath
+
+        self.start = start
+        self.end = end
+        self.stations = stations if stations else sorted(set(cfg['ISTREAMAPI']['Enabled']))
+        self.restrict = restrict
+        self.window = window
+        self.concurrency = max(1, int(concurrency))
+        self.group = group
+        self.failed = dict()
+        self.cache = cache
+        self.cachettl = cachettl
+        self.format = format
+        self.batchsize = batchsize
+        self.lag = lag
+        self.products = products
+        self.aggregate = aggregate
+        self.wide = wide
+        self.availability = availability
+        self.lastseen = dict()
+
+        if order_attrs:
+            order_by = ["asc"] * len(order_attrs) if not order_by else order_by * len(order_attrs) if len(
+                order_by) == 1 else order_by
+        self.order_attrs = order_attrs
+        self.attributes = attributes
+        self.order_by = order_by
+
+        super().__init__(loop=loop, apis=apis)
+
+class IGridsConn(IApiConn):
+    XNCCoords = range(-10, 40 + 1, 1)
+    YNCCoords = range(80, 34 + (-1), -1)
+
+    XTADMCoords = range(-10, 40 + 1, 1)
+    YTADMCoords = range(72, 30 + (-1), -1)
+
+    @staticmethod
+    def ascii2pd(ascii):
+        import pandas as pd
+
+        data_ = re.sub(r'(?m)^(?:[\w#].*)?\n?', '', ascii)
+        df = pd.read_fwf(StringIO(data_), infer_nrows=51, header=None)
+        return df
+
+    @staticmethod
+    def flatten(data):
+        _ATTRS = ('foF2', 'hmF2')
+        if 'points' not in data:
+            return [dict(req_timestamp=data['req_timestamp'], name=None, lat=data['lat'], lon=data['lon'])
+                    | {k: data[k]['data'] for k in _ATTRS} | {f'{k}_timestamp': data[k]['timestamp'] for k in _ATTRS}]
+
+        if 'timestamp' not in data:
+            return [dict(req_timestamp=data['req_timestamp'], name=p['name'], lat=p['lat'], lon=p['lon'])
+                    | {k: p[k] for k in _ATTRS} | {f'{k}_timestamp': data[k]['timestamp'] for k in _ATTRS}
+                    for p in data['points']]
+
+        return [dict(req_timestamp=t, name=p['name'], lat=p['lat'], lon=p['lon'])
+                | {k: p[k][i] for k in _ATTRS} | {f'{k}_timestamp': data[k]['timestamp'][i] for k in _ATTRS}
+                for p in data['points'] for i, t in enumerate(data['timestamp'])]
+
+    def export(self, data, exppath, verbose=False):
+        from . import writers
+
+        if exppath.exists():
+            exppath.unlink(missing_ok=True)
+
+        if self.format != 'json':
+            with writers.writer(self.format, exppath) as writer:
+                writer.write(IGridsConn.flatten(data))
+            return
+
+        json_ = json.dumps(data, indent=4, default=str)
+        if verbose:
+            print(json_)
+        exppath.write_text(json_)
+
+    async def hmf2ascii2xr(self, hmf2ascii, hmf2nav):
+        import xarray as xr
+        from . import grids
+
+        hmf2xr = xr.DataArray(grids.decode(hmf2ascii, (len(IGridsConn.YTADMCoords), len(IGridsConn.XTADMCoords))), dims=("y", "x"),
+            coords={"y": IGridsConn.YTADMCoords, "x": IGridsConn.XTADMCoords},
+            attrs={
+                'name': 'hmF2', "long_name": 'hmF2 grid', "units": 'Km', 'timestamp': hmf2nav['timestamp'].isoformat(),
+                "description": 'hmf2 (TAD2D Algorithm)'
+            }
+        )
+        return hmf2xr
+
+    async def fof2ascii2xr(self, fof2ascii, fof2nav):
+        import xarray as xr
+        from . import grids
+
+        fof2xr = xr.DataArray(grids.decode(fof2ascii, (len(IGridsConn.YNCCoords), len(IGridsConn.XNCCoords))), dims=("y", "x"),
+            coords={"y": IGridsConn.YNCCoords, "x": IGridsConn.XNCCoords},
+            attrs={
+                'name': 'foF2', "long_name": 'foF2 grid', "units": 'MHz', 'timestamp': fof2nav['timestamp'].isoformat(),
+                "description": 'foF2 (DIASNC Algorithm)'
+            }
+        )
+        return fof2xr
+
+    async def grid_(self, qobj, nav):
+        if self.memo is not None:
+            return await self.memo.get_(('grid', nav['uuid']), lambda: self.decodegrid_(qobj, nav))
+        return await self.decodegrid_(qobj, nav)
+
+    async def decodegrid_(self, qobj, nav):
+        grid = self.store.get(nav['uuid']) if self.store is not None else None
+        if grid is not None:
+            return grid
+
+        ascii = await qobj.data_(self.apis['ttideapi'], nav)
+        assert ascii is not None, AssertionError(f'404 <NODATA> for product timestamp: {nav["timestamp"]}')
+        grid = await (self.fof2ascii2xr if nav['type'] == 'fof2' else self.hmf2ascii2xr)(ascii, nav)
+
+        if self.store is not None:
+            try:
+                grid = self.store.put(nav['uuid'], grid)
+            except Exception as e:
+                Logger.logger.warning(f'Unable to store Modelled Grid {nav["uuid"]}: {e}')
+        return grid
+
+    def respond(self, fof2xrds, hmf2xrds):
+        import numpy as np
+        from . import grids
+
+        lat = np.array([_[1] for _ in self.points], dtype=np.float64)
+        lon = np.array([_[2] for _ in self.points], dtype=np.float64)
+        fof2v = grids.nearest(fof2xrds, lat, lon)
+        hmf2v = grids.nearest(hmf2xrds, lat, lon)
+        if len(self.points) == 1:
+            return dict(
+                req_timestamp=self.timestamp.isoformat() if self.timestamp is not None else 'null',
+                lat=self.lat, lon=self.lon,
+                foF2=fof2xrds.attrs | {'data': grids.pyfloat(fof2v[0])},
+                hmF2=hmf2xrds.attrs | {'data': grids.pyfloat(hmf2v[0])}
+            )
+        return dict(
+            req_timestamp=self.timestamp.isoformat() if self.timestamp is not None else 'null',
+            foF2=dict(fof2xrds.attrs), hmF2=dict(hmf2xrds.attrs),
+            points=[dict(name=name, lat=plat, lon=plon, foF2=grids.pyfloat(fof2), hmF2=grids.pyfloat(hmf2))
+                    for (name, plat, plon), fof2, hmf2 in zip(self.points, fof2v, hmf2v)]
+        )
+
+    async def fetchGrid_(self):
+        from . import crttide
+
+        qobj = crttide.TTIDE(
+            timestamp=self.timestamp, lat=self.lat, lon=self.lon
+        )
+        try:
+            fof2nav, hmf2nav = await asyncio.gather(
+                qobj.nav_(self.apis['ttideapi'], type='fof2'), qobj.nav_(self.apis['ttideapi'], type='hmf2'))
+            assert (fof2nav['uuid'] and hmf2nav['uuid']), AssertionError(f'404 <NODATA> for requested timestamp: {self.timestamp}')
+        except Exception as e:
+            raise LookupError(f'Unable to retrieve Modelled Grid Metadata: {e}') from e
+
+        try:
+            fof2xrds, hmf2xrds = await asyncio.gather(self.grid_(qobj, fof2nav), self.grid_(qobj, hmf2nav))
+        except Exception as e:
+            raise LookupError(f'Unable to retrieve Modelled Grid Datasets: {e}') from e
+
+        try:
+            return self.respond(fof2xrds, hmf2xrds)
+        except Exception as e:
+            raise ValueError(f'Unable to process Modelled Grid Datasets: {e}') from e
+
+    async def queryGrid_(self, verbose=False):
+        try:
+            resp = await self.fetchGrid_()
+        except Exception as e:
+            Logger.logger.error(f'{e}')
+            exit(0)
+
+        expfile = f'grid_{self.timestamp.strftime("%Y%m%dT%H%M") if self.timestamp else "LAST"}_' + (
+            f'{int(self.lat):02d}_{int(self.lon):02d}.{self.format}' if len(self.points) == 1 else f'{len(self.points)}pts.{self.format}')
+        exppath_ = self.exppath.joinpath(expfile)
+
+        try:
+            self.export(resp, exppath_, verbose=verbose)
+            Logger.logger.info(f'Successfully exported Modelled Grid Datasets (foF2, hmF2) --> {exppath_}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to export Modelled Grid Datasets (foF2, hmF2): {e}')
+            exit(0)
+
+    def queryGrid(self, verbose=False):
+        self.loop.run_until_complete(self.queryGrid_(verbose=verbose))
+
+    async def poll_(self, verbose=False):
+        """Fetch the newest products (nav LAST) not in `self.latest` yet, True when any of them changed"""
+        from . import crttide
+
+        qobj = crttide.TTIDE(timestamp=None)
+        navs = await asyncio.gather(*(qobj.nav_(self.apis['ttideapi'], type=type) for type in ('fof2', 'hmf2')))
+        navs = [nav for nav in navs if nav['uuid'] and (nav['type'] not in self.latest or
+                                                        self.latest[nav['type']][0]['uuid'] != nav['uuid'])]
+        # Both products are downloaded and decoded as soon as they are published
+        grids_ = await asyncio.gather(*(self.grid_(crttide.TTIDE(timestamp=nav['timestamp']), nav) for nav in navs),
+                                      return_exceptions=True)
+
+        changed = False
+        for nav, grid in zip(navs, grids_):
+            if isinstance(grid, BaseException):
+                Logger.logger.error(f'Unable to retrieve Modelled Grid {nav["type"]} @ {nav["timestamp"]}: {grid}')
+                continue
+            self.latest[nav['type']] = (nav, grid)
+            changed = True
+            if verbose:
+                Logger.logger.info(f'New Modelled Grid {nav["type"]} @ {nav["timestamp"].isoformat()} ({nav["uuid"]})')
+        return changed
+
+    async def follow_(self, exppath, writer=None, verbose=False):
+        import pandas as pd
+
+        while True:
+            try:
+                changed = await self.poll_(verbose=verbose)
+            except Exception as e:
+                Logger.logger.error(f'Unable to retrieve Modelled Grid Metadata, retrying on next poll: {e}')
+                changed = False
+
+            if changed and len(self.latest) == 2:
+                resp = self.respond(self.latest['fof2'][1], self.latest['hmf2'][1])
+                try:
+                    if writer is None:
+                        tmppath = exppath.with_suffix(f'.{os.getpid()}.tmp')
+                        tmppath.write_text(json.dumps(resp, indent=4, default=str))
+                        os.replace(tmppath, exppath)
+                    else:
+                        updated = datetime.now(UTC).replace(tzinfo=None).isoformat()
+                        writer.write([dict(updated=updated) | _ for _ in IGridsConn.flatten(resp)])
+                        writer.flush()
+                    Logger.logger.info(f'Exported Modelled Grids foF2 @ {resp["foF2"]["timestamp"]}, hmF2 @ {resp["hmF2"]["timestamp"]} --> {exppath}')
+                except Exception as e:
+                    Logger.logger.error(f'Unable to export Modelled Grid Datasets (foF2, hmF2): {e}')
+
+            now = pd.Timestamp(datetime.now(UTC).replace(tzinfo=None))
+            await asyncio.sleep(max(0., ((now.floor(self.poll) + self.poll) - now).total_seconds()))
+
+    def follow(self, verbose=False):
+        from . import writers
+
+        if self.format != 'json' and self.format not in writers.STREAMING:
+            raise ValueError(f'Cannot follow into {self.format} files, available: json, {", ".join(writers.STREAMING)}')
+        points = f'{int(self.lat):02d}_{int(self.lon):02d}' if len(self.points) == 1 else f'{len(self.points)}pts'
+        if self.format == 'json':
+            # The latest values, replaced on every update
+            exppath_, writer = self.exppath.joinpath(f'grid_LAST_{points}.json'), None
+        else:
+            # The history of the values, appended on every update
+            started = datetime.now(UTC).replace(tzinfo=None).strftime("%Y%m%dT%H%M")
+            exppath_ = self.exppath.joinpath(f'grid_{started}_follow_{points}.{self.format}')
+            exppath_.unlink(missing_ok=True)
+            writer = writers.writer(self.format, exppath_)
+
+        Logger.logger.info(f'Following Modelled Grids (foF2, hmF2) every {self.poll} --> {exppath_}')
+        try:
+            self.loop.run_until_complete(self.follow_(exppath_, writer=writer, verbose=verbose))
+        finally:
+            if writer is not None:
+                writer.close()
+            Logger.logger.info(f'Stopped following Modelled Grids --> {exppath_}')
+
+    async def fetchSeries_(self, verbose=False):
+        import numpy as np
+        import pandas as pd
+        from . import crttide
+        from . import grids
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timestamps = pd.date_range(self.start, self.end, freq=self.resolution).to_pydatetime().tolist()
+
+        async def nav_(timestamp, type):
+            async with semaphore:
+                return await crttide.TTIDE(timestamp=timestamp).nav_(self.apis['ttideapi'], type=type)
+
+        async def grid_(nav):
+            async with semaphore:
+                return await self.grid_(crttide.TTIDE(timestamp=nav['timestamp']), nav)
+
+        try:
+            requests = [(t, type) for t in timestamps for type in ('fof2', 'hmf2')]
+            navs = await asyncio.gather(*(nav_(t, type) for t, type in requests), return_exceptions=True)
+            # Timestamps whose product lookup failed are left empty, as those of the failed grids below
+            failed = [(t, type, nav) for (t, type), nav in zip(requests, navs) if isinstance(nav, BaseException)]
+            for t, type, nav in failed:
+                Logger.logger.error(f'Unable to retrieve Modelled Grid {type} metadata @ {t.isoformat()}: {nav}')
+            if failed and len(failed) == len(requests):
+                raise RuntimeError(f'All {len(requests)} requests failed')
+            navs = [dict(uuid=None, timestamp=t, type=type) if isinstance(nav, BaseException) else nav
+                    for (t, type), nav in zip(requests, navs)]
+            navs = list(zip(navs[0::2], navs[1::2]))
+            products = {nav['uuid']: nav for pair in navs for nav in pair if nav['uuid']}
+            assert products, AssertionError(f'404 <NODATA> for requested period: {self.start} - {self.end}')
+            if verbose:
+                Logger.logger.info(f'Discovered {len(products)} Modelled Grid products for {len(timestamps)} timestamps')
+        except Exception as e:
+            raise LookupError(f'Unable to retrieve Modelled Grid Metadata: {e}') from e
+
+        grids_ = await asyncio.gather(*(grid_(nav) for nav in products.values()), return_exceptions=True)
+
+        try:
+            lat = np.array([_[1] for _ in self.points], dtype=np.float64)
+            lon = np.array([_[2] for _ in self.points], dtype=np.float64)
+
+            values, attrs = dict(), dict()
+            for (pubid, nav), grid in zip(products.items(), grids_):
+                if isinstance(grid, BaseException):
+                    Logger.logger.error(f'Unable to retrieve Modelled Grid {nav["type"]} @ {nav["timestamp"]}: {grid}')
+                    continue
+                values[pubid] = grids.nearest(grid, lat, lon)
+                attrs.setdefault(nav['type'], {k: v for k, v in grid.attrs.items() if k != 'timestamp'})
+            assert values, AssertionError('No Modelled Grid Datasets retrieved')
+
+            series = dict()
+            for i, type in enumerate(('fof2', 'hmf2')):
+                data = np.full((len(timestamps), len(self.points)), np.nan, dtype=np.float32)
+                ptimestamps = []
+                for j, pair in enumerate(navs):
+                    found = pair[i]['uuid'] in values
+                    if found:
+                        data[j] = values[pair[i]['uuid']]
+                    ptimestamps.append(pair[i]['timestamp'].isoformat() if found else None)
+                series[type] = (data, ptimestamps)
+
+            resp = dict(
+                start=self.start.isoformat(), end=self.end.isoformat(), step=self.resolution.isoformat(),
+                timestamp=[t.isoformat() for t in timestamps],
+                foF2=attrs.get('fof2', {}) | {'timestamp': series['fof2'][1]},
+                hmF2=attrs.get('hmf2', {}) | {'timestamp': series['hmf2'][1]},
+                points=[dict(name=name, lat=plat, lon=plon,
+                             foF2=[None if np.isnan(v) else grids.pyfloat(v) for v in series['fof2'][0][:, j]],
+                             hmF2=[None if np.isnan(v) else grids.pyfloat(v) for v in series['hmf2'][0][:, j]])
+                        for j, (name, plat, plon) in enumerate(self.points)]
+            )
+        except Exception as e:
+            raise ValueError(f'Unable to process Modelled Grid Datasets: {e}') from e
+
+        return resp
+
+    async def querySeries_(self, verbose=False):
+        try:
+            resp = await self.fetchSeries_(verbose=verbose)
+        except Exception as e:
+            Logger.logger.error(f'{e}')
+            exit(0)
+
+        expfile = f'gridts_{self.start.strftime("%Y%m%dT%H%M")}_{self.end.strftime("%Y%m%dT%H%M")}_' + (
+            f'{int(self.lat):02d}_{int(self.lon):02d}.{self.format}' if len(self.points) == 1 else f'{len(self.points)}pts.{self.format}')
+        exppath_ = self.exppath.joinpath(expfile)
+
+        try:
+            self.export(resp, exppath_, verbose=verbose)
+            Logger.logger.info(f'Successfully exported Modelled Grid Time-Series (foF2, hmF2) --> {exppath_}')
+        except Exception as e:
+            Logger.logger.error(f'Unable to export Modelled Grid Time-Series (foF2, hmF2): {e}')
+            exit(0)
+
+    def querySeries(self, verbose=False):
+        self.loop.run_until_complete(self.querySeries_(verbose=verbose))
+
+    def __init__(self, timestamp: Optional[datetime] = None, lat: float = None, lon: float = None,
+                 resolution: str | None = '5m', exppath: str | Path = None, store: bool = True,
+                 points: List[Tuple[Optional[str], float, float]] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, concurrency: int = 4, format: str = 'json',
+                 poll: timedelta = timedelta(minutes=1), loop: _asyncu.Loop = None, apis: dict = None,
+                 memo=None):
+        import pandas as pd
+
+        _RESP = re.compile(r'^(?P<freqmul>\d+)(?P<freq>\w+)$')
+        try:
+            resolution_ = _RESP.match(resolution).groupdict()
+            resolution_['freqmul'] = int(resolution_['freqmul'])
+        except:
+            raise ValueError(f'Malformed resolution attribute: {resolution}')
+
+        timestamp = ciso8601.parse_datetime(timestamp) if isinstance(timestamp, str) else timestamp
+
+        self.resolution = pd.Timedelta(resolution)
+
+        self.exppath = exppath
+
+        self.timestamp = timestamp
+        self.start = ciso8601.parse_datetime(start) if isinstance(start, str) else start
+        self.end = ciso8601.parse_datetime(end) if isinstance(end, str) else end
+        self.concurrency = max(1, int(concurrency))
+        self.format = format
+        self.points = points if points else [(None, lat, lon)]
+        self.lat, self.lon = self.points[0][1:]
+        self.poll = pd.Timedelta(poll)
+        self.latest = dict()
+
+        self.store = None
+        if store and cfg['CACHE'].get('GRIDS'):
+            from . import grids
+            self.store = grids.GridStore()
+        self.memo = memo
+
+        super().__init__(loop=loop, apis=apis)
@@ -1,61 +1,155 @@
 import re
+import asyncio
 from typing import Literal, Optional, List, Tuple
 from datetime import datetime, timedelta, UTC
 
 import json
 import ciso8601
 import pandas as pd
-import sqlalchemy as sa
-import sqlalchemy.exc
-from sqlalchemy.dialects import postgresql
 
-from iapi import Logger, cfg
+from .config import Logger, cfg
 
-from . import schemas
+from . import _uuids
 from .api import APIClient, APIClientASYNC, ReturnType
 
 
 _BARGS = re.compile(r'^(?P<lower>[(\[])(?P<upper>[)\]])$')
 
+PRODUCTS = ('sao', 'obs', 'edens')
+
 
 class Iono(object):
 
     async def edensdf_(self, api: APIClientASYNC, characteristics: List[str] | Tuple[str] = None, ids: pd.DataFrame = None,
-        order_attrs: Optional[List[str]] | None = None, order_by: Optional[List[str]] | None = None):
+        order_attrs: Optional[List[str]] | None = None, order_by: Optional[List[str]] | None = None,
+        columns: Optional[List[str]] = None, row_groups: Optional[List[int]] = None, uuids=False,
+        chunksize: Optional[int] = None, concurrency: Optional[int] = None, partial=False):
+        """Electron density profiles, of the records in `ids` when given
+
+        Large `ids` frames are uploaded in chunks of `chunksize` ids (ISTREAMAPI:EDENS:CHUNK), at most `concurrency`
+        requests at a time, so that a failure or timeout costs (and retries) a single chunk. The results are merged in
+        the requested order. With `partial`, the results of the successful chunks are returned and the ids of the
+        failed ones are kept in `self.failedids`, otherwise the first failure is raised.
+        """
         order_attrs = ['timestamp', 'station'] if order_attrs is None else order_attrs
         order_by = ['asc', ] if order_by is None else order_by
-        if ids is not None:
-            ids = ids.to_parquet(engine='pyarrow', index=False)
-            ids = [('ids', ids)]
-
-        return await api.df('/idb/edensdf', post=True,
-            params=dict(
-                start=self.start, end=self.end, stations=self.stations, characteristics=characteristics,
-                order_attrs=order_attrs, order_by=order_by
-            ),
-            files=ids
-        )
+        params = dict(start=self.start, end=self.end, stations=self.stations, characteristics=characteristics,
+                      order_attrs=order_attrs, order_by=order_by)
+        self.failedids = None
+
+        async def fetch_(chunk: Optional[pd.DataFrame]):
+            files = None
+            if chunk is not None:
+                if 'id' in chunk and _uuids.isbinary(chunk['id']):
+                    chunk = chunk.assign(id=_uuids.tostr(chunk['id']))
+                files = [('ids', chunk.to_parquet(engine='pyarrow', index=False))]
+            return await api.df('/idb/edensdf', post=True, params=params, files=files, columns=columns,
+                                row_groups=row_groups, uuids=uuids)
+
+        chunksize = chunksize if chunksize else cfg['ISTREAMAPI'].get('EDENS', {}).get('CHUNK', 5000)
+        if ids is None or ids.shape[0] <= chunksize:
+            return await fetch_(ids)
+
+        concurrency = concurrency if concurrency else cfg['ISTREAMAPI'].get('EDENS', {}).get('CONCURRENCY', 4)
+        semaphore = asyncio.Semaphore(concurrency)
+        chunks = [ids.iloc[i:i + chunksize] for i in range(0, ids.shape[0], chunksize)]
+
+        async def chunk_(chunk):
+            async with semaphore:
+                return await fetch_(chunk)
+
+        dfs = await asyncio.gather(*(chunk_(_) for _ in chunks), return_exceptions=True)
+        failed = [(i, _) for i, _ in enumerate(dfs) if isinstance(_, BaseException)]
+        for i, e in failed:
+            Logger.logger.error(f'Unable to retrieve the profiles of ids chunk {i + 1}/{len(chunks)} ({chunks[i].shape[0]} ids): {e}')
+        if failed and (not partial or len(failed) == len(chunks)):
+            raise failed[0][1]
+        if failed:
+            self.failedids = pd.concat([chunks[i] for i, _ in failed], ignore_index=True)
+
+        df = pd.concat([_ for _ in dfs if not isinstance(_, BaseException)], ignore_index=True)
+        # Each chunk is ordered, the merged chunks are ordered again (stable, the chunks keep the order of `ids` on ties)
+        attrs = [_ for _ in order_attrs if _ in df]
+        if attrs:
+            ascending = [(order_by[0] if len(order_by) == 1 else order_by[order_attrs.index(_)]).lower() == 'asc' for _ in attrs]
+            df = df.sort_values(attrs, ascending=ascending, kind='stable', ignore_index=True)
+        return df
 
     async def obsdf_(self, api: APIClientASYNC, charcheckna: List[str] | Tuple[str] = None,
-        order_attrs: Optional[List[str]] | None = None, order_by: Optional[List[str]] | None = None):
+        order_attrs: Optional[List[str]] | None = None, order_by: Optional[List[str]] | None = None,
+        columns: Optional[List[str]] = None, row_groups: Optional[List[int]] = None, uuids=False):
         order_attrs = ['timestamp', 'station'] if order_attrs is None else order_attrs
         order_by = ['asc', ] if order_by is None else order_by
         return await api.df('/idb/obsdf', params=dict(
-            start=self.start, end=self.end, stations=self.stations, charcheckna=charcheckna, order_attrs=order_attrs, order_by=order_by)
+            start=self.start, end=self.end, stations=self.stations, charcheckna=charcheckna, order_attrs=order_attrs, order_by=order_by),
+            columns=columns, row_groups=row_groups, uuids=uuids
         )
 
     async def df_(self, api: APIClientASYNC, characteristics: List[str] | Tuple[str] = None,
-                  order_attrs: Optional[List[str]] | None = None, order_by: Optional[List[str]] | None = None):
+                  order_attrs: Optional[List[str]] | None = None, order_by: Optional[List[str]] | None = None,
+                  columns: Optional[List[str]] = None, row_groups: Optional[List[int]] = None, uuids=False):
         order_attrs = ['station', 'timestamp'] if order_attrs is None else order_attrs
         order_by = ['asc', ] if order_by is None else order_by
         return await api.df('/idb/saodf', params=dict(start=self.start, end=self.end, stations=self.stations,
-                                characteristics=characteristics, order_attrs=order_attrs, order_by=order_by))
-
+                                characteristics=characteristics, order_attrs=order_attrs, order_by=order_by),
+                            columns=columns, row_groups=row_groups, uuids=uuids)
+
+
+    async def joindf_(self, api: APIClientASYNC, characteristics: List[str] | Tuple[str] = None,
+                      charcheckna: List[str] | Tuple[str] = None, products: List[str] | Tuple[str] = PRODUCTS, uuids=False):
+        """saodf, obsdf and edensdf (the `products`) of the same period and stations, requested concurrently and joined
+
+        Frames are joined (outer) on the record `id`, or on timestamp/station when one of them has no ids, into one
+        frame ordered by (timestamp, station). Profiles are summarized per record (hmax, nmax, content, see
+        `profiles.Profiles`), other columns found in several products get the product name as suffix.
+        """
+        unknown = set(products) - set(PRODUCTS)
+        if unknown or not products:
+            raise ValueError(f'Unsupported products: {", ".join(sorted(unknown))}, available: {", ".join(PRODUCTS)}')
+
+        requests = dict(
+            sao=lambda: self.df_(api, characteristics=characteristics, order_attrs=['timestamp', 'station'], uuids=uuids),
+            obs=lambda: self.obsdf_(api, charcheckna=charcheckna, uuids=uuids),
+            edens=lambda: self.edensdf_(api, uuids=uuids),
+        )
+        dfs = dict(zip(products, await asyncio.gather(*(requests[_]() for _ in products))))
+        if 'edens' in dfs:
+            dfs['edens'] = self.edenssummary(dfs['edens'])
+
+        df = None
+        for product, right in dfs.items():
+            if df is None:
+                df = right
+                continue
+            keys = ['id'] if 'id' in df and 'id' in right else [_ for _ in ('timestamp', 'station') if _ in df and _ in right]
+            if not keys:
+                raise ValueError(f'No common id or timestamp/station columns to join {product}')
+            df = df.merge(right, how='outer', on=keys, suffixes=('', f'_{product}'))
+            # Timestamp/station of the records found in `right` only
+            for k in ('timestamp', 'station'):
+                if f'{k}_{product}' in df:
+                    df[k] = df[k].fillna(df.pop(f'{k}_{product}'))
+
+        order = [_ for _ in ('timestamp', 'station') if _ in df]
+        return df.sort_values(order, kind='stable', ignore_index=True) if order else df
+
+    @staticmethod
+    def edenssummary(df: pd.DataFrame) -> pd.DataFrame:
+        # One row per profile of an edensdf frame: its id/timestamp/station, hmax, nmax and integrated content
+        from . import profiles
+
+        if df.empty:
+            return pd.DataFrame(columns=['id', 'timestamp', 'station', 'hmax', 'nmax', 'content'])
+        return profiles.Profiles.fromframe(df).frame().drop(columns=['height', 'density'])
+
+    async def istations_(self, api: APIClientASYNC, validate=True):
+        # validate=False: the raw station dicts, without importing schemas (pyproj/shapely/geoalchemy2)
+        if validate:
+            from . import schemas
 
-    async def istations_(self, api: APIClientASYNC):
         return await api.get('idb/istations', params=dict(start=self.start, end=self.end,
             products=['SAO',] if self.products is None else self.products),
-            rtype=ReturnType.msgpack, pydmodel=schemas.StationDBO)
+            rtype=ReturnType.msgpack, pydmodel=schemas.StationDBO if validate else None)
 
     def __init__(self, start: datetime = None, end: datetime = None,
                  products: Optional[List[str]] = None, stations: Optional[List[str]] = None,
@@ -6,14 +6,9 @@ from datetime import datetime, timedelta, UTC
 
 import json
 import ciso8601
-import pandas as pd
-import sqlalchemy as sa
-import sqlalchemy.exc
-from sqlalchemy.dialects import postgresql
 
-from iapi import Logger, cfg
+from .config import Logger, cfg
 
-from . import schemas
 from .api import APIClient, APIClientASYNC, ReturnType
 
 
@@ -30,7 +25,7 @@ class TTIDE(object):
             resp = await api.get(uri, params=None, rtype=ReturnType.ascii)
             return resp
         except httpx.HTTPStatusError:
-            Logger.logger.critical(f'No {urimapper_[type]} datasets available @ {self.timestamp}')
+            Logger.logger.critical(f'No {urimapper_[navmeta["type"]]} datasets available @ {self.timestamp}')
             return None
 
 
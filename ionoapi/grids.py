@@ -0,0 +1,132 @@
+import os
+import csv
+import json
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+
+from .config import Logger, cfg
+
+
+def pyfloat(v):
+    # Shortest decimal representation of the float32 value, as written in the ASCII products
+    return float(str(np.float32(v)))
+
+
+def decode(ascii: str, shape: Tuple[int, int]) -> np.ndarray:
+    """Decode a DIASNC/TAD2D ASCII grid into a float32 array of `shape` (rows, columns)
+
+    Header lines (starting with a word character or '#') and blank lines are skipped, as in `IGridsConn.ascii2pd`.
+    """
+    ny, nx = shape
+    rows = [line for line in ascii.splitlines() if line.strip() and not (line[0] == '#' or line[0] == '_' or line[0].isalnum())]
+    if len(rows) != ny:
+        raise ValueError(f'Malformed grid: {len(rows)} data rows, expected {ny}')
+
+    tokens = ' '.join(rows).split()
+    if len(tokens) == ny * nx:
+        return np.fromiter(map(float, tokens), dtype=np.float32, count=ny * nx).reshape(shape)
+
+    # Touching or blank fixed-width fields
+    import pandas as pd
+    from io import StringIO
+
+    values = pd.read_fwf(StringIO('\n'.join(rows)), infer_nrows=ny, header=None).values
+    if values.shape != shape:
+        raise ValueError(f'Malformed grid: shape {values.shape}, expected {shape}')
+    out = np.empty(shape, dtype=np.float32)
+    out[:] = values
+    return out
+
+
+def nearest(grid: xr.DataArray, lat, lon):
+    """Values of the nearest grid cells to all (lat, lon) points, ties resolved as `DataArray.sel(method='nearest')`"""
+    idx = []
+    for dim, v in (('y', lat), ('x', lon)):
+        coords = np.asarray(grid.coords[dim].values)
+        order = np.argsort(-coords, kind='stable')
+        dist = np.abs(coords[order][None, :] - np.asarray(v, dtype=np.float64).reshape(-1)[:, None])
+        idx.append(order[dist.argmin(axis=1)])
+    return np.asarray(grid.values)[idx[0], idx[1]]
+
+
+def readpoints(path: str | Path) -> List[Tuple[Optional[str], float, float]]:
+    """(name, lat, lon) points from a GeoJSON file of Point features or a CSV file of LAT, LON[, NAME] rows"""
+    path = Path(path)
+    if path.suffix.lower() in ('.json', '.geojson'):
+        geoj = json.loads(path.read_text())
+        features = geoj['features'] if geoj.get('type') == 'FeatureCollection' else [geoj]
+        points = []
+        for feature in features:
+            geometry = feature.get('geometry', feature)
+            properties = feature.get('properties') or {}
+            assert geometry['type'] == 'Point', AssertionError(f'Unsupported geometry type: {geometry["type"]}')
+            lon, lat = geometry['coordinates'][:2]
+            points.append((properties.get('name', properties.get('code')), float(lat), float(lon)))
+        return points
+
+    with open(path, newline='') as f:
+        rows = [_ for _ in csv.reader(f) if _ and not _[0].lstrip().startswith('#')]
+    header = [_.strip().lower() for _ in rows[0]]
+    if 'lat' in header and 'lon' in header:
+        ilat, ilon = header.index('lat'), header.index('lon')
+        iname = header.index('name') if 'name' in header else header.index('code') if 'code' in header else None
+        rows = rows[1:]
+    else:
+        ilat, ilon, iname = 0, 1, 2
+    return [(row[iname].strip() if iname is not None and len(row) > iname else None, float(row[ilat]), float(row[ilon]))
+            for row in rows]
+
+
+class GridStore(object):
+    """Content-addressed store of decoded grids, keyed by the product pubid.
+
+    A product never changes once published, so each grid is decoded once, saved as a float32 `.npy`
+    array next to a `.json` file holding its coordinates and attributes, and memory-mapped afterwards.
+    """
+
+    def paths(self, pubid: uuid.UUID | str):
+        pubid = str(pubid)
+        root = self.path.joinpath(pubid[:2])
+        return root.joinpath(f'{pubid}.npy'), root.joinpath(f'{pubid}.json')
+
+    def __contains__(self, pubid):
+        return all(_.exists() for _ in self.paths(pubid))
+
+    def get(self, pubid: uuid.UUID | str):
+        npypath, metapath = self.paths(pubid)
+        try:
+            meta = json.loads(metapath.read_text())
+            data = np.load(npypath, mmap_mode='r', allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            Logger.logger.warning(f'Discarding unreadable stored grid {pubid}: {e}')
+            return None
+
+        return xr.DataArray(data, dims=tuple(meta['dims']), coords={k: np.asarray(v) for k, v in meta['coords'].items()},
+                            attrs=meta['attrs'])
+
+    def put(self, pubid: uuid.UUID | str, grid: xr.DataArray):
+        npypath, metapath = self.paths(pubid)
+        npypath.parent.mkdir(parents=True, exist_ok=True)
+
+        tmppath = npypath.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmppath, 'wb') as f:
+            np.save(f, np.ascontiguousarray(grid.values, dtype=np.float32), allow_pickle=False)
+        os.replace(tmppath, npypath)
+
+        tmppath = metapath.with_suffix(f'.{os.getpid()}.tmp')
+        tmppath.write_text(json.dumps(dict(
+            pubid=str(pubid), dims=list(grid.dims), coords={k: grid.coords[k].values.tolist() for k in grid.dims},
+            attrs=grid.attrs
+        ), default=str))
+        os.replace(tmppath, metapath)
+
+        return self.get(pubid)
+
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path if path else cfg['CACHE']['GRIDS'])
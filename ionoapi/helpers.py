@@ -1,4 +1,5 @@
 import time
+import inspect
 from functools import wraps
 from datetime import datetime, timedelta, timezone
 import ciso8601
@@ -13,6 +14,13 @@ from apiclient.request_strategies import Response, RequestsResponse, BaseRequest
 from apiclient.authentication_methods import BaseAuthenticationMethod, NoAuthentication
 from apiclient.exceptions import UnexpectedError
 from apiclient.retrying import retry_if_api_request_error
+from urllib3.exceptions import InsecureRequestWarning
+from urllib3 import disable_warnings
+
+from ._ratelimit import TokenBucket, RateLimiter, retryafter
+
+# requests are made with verify=False, see iapi.py
+disable_warnings(InsecureRequestWarning)
 
 
 
@@ -31,17 +39,26 @@ def urljoin(*args, base):
     return url
 
 
+def limiter(api):
+    # One request per `_MIN_REQINTRVL` seconds on average, bursts of `_MAX_REQBURST` (default: 1)
+    if getattr(api, '_LIMITER', None) is None:
+        api._LIMITER = TokenBucket(1. / api._MIN_REQINTRVL if api._MIN_REQINTRVL else 1000.,
+                                   burst=getattr(api, '_MAX_REQBURST', 1), name=type(api).__name__)
+    return api._LIMITER
+
+
 def endpoint(*iargs, base):
     def decorator(f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            api = args[0]
-            now = datetime.utcnow()
-            if api._NEXT_REQUEST and now < api._NEXT_REQUEST:
-                time.sleep((api._NEXT_REQUEST - now).total_seconds())
-            res = f(*args, **kwargs, url = urljoin(*iargs, base=base))
-            api._NEXT_REQUEST = datetime.utcnow() + timedelta(seconds=api._MIN_REQINTRVL)
-            return res
+        if inspect.iscoroutinefunction(f):
+            @wraps(f)
+            async def wrapper(*args, **kwargs):
+                await limiter(args[0]).acquire_()
+                return await f(*args, **kwargs, url = urljoin(*iargs, base=base))
+        else:
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                limiter(args[0]).acquire()
+                return f(*args, **kwargs, url = urljoin(*iargs, base=base))
         return wrapper
     return decorator
 
@@ -153,7 +170,11 @@ class RequestStrategyU(RequestStrategy_):
             auth = client.get_authentication_method()
             auth.perform_initial_auth(client)
         elif exc.status_code==429:
-            time.sleep(0.1)
+            # Slow down the host (and the client endpoints) instead of a fixed sleep, the retry waits for a token
+            headers = response.get_original().headers
+            RateLimiter.host(response.get_requested_url()).feedback('', 429, headers)
+            if getattr(client, '_LIMITER', None) is not None:
+                client._LIMITER.throttle(retryafter(headers))
         raise exc
 
     def __init__(self, *args, **kwargs):
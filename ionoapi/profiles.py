@@ -0,0 +1,186 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Column names of the heights and electron densities in `Iono.edensdf_` frames (`schemas.TFEGroup` names first)
+HEIGHTS = ('trueHeight', 'height', 'th', 'alt')
+DENSITIES = ('electronDensity', 'edens', 'eldens', 'ne', 'density')
+
+
+def column(df: pd.DataFrame, candidates: Sequence[str], what: str) -> str:
+    lower = {str(_).lower(): _ for _ in df.columns}
+    for name in candidates:
+        if name.lower() in lower:
+            return lower[name.lower()]
+    raise ValueError(f'No {what} column in {list(df.columns)}, expected one of {", ".join(candidates)}')
+
+
+def islist(values) -> bool:
+    # Frame column of per-record lists rather than one value per row
+    if isinstance(values.dtype, pd.ArrowDtype):
+        return pa.types.is_list(values.dtype.pyarrow_dtype) or pa.types.is_large_list(values.dtype.pyarrow_dtype)
+    if values.dtype != object:
+        return False
+    first = values.first_valid_index()
+    return first is not None and isinstance(values[first], (list, tuple, np.ndarray))
+
+
+class Profiles(object):
+    """Electron density profiles in ragged (offsets + values) form
+
+    The heights and densities of all the profiles are two flat float64 arrays, profile `i` spanning
+    `offsets[i]:offsets[i + 1]` sorted by height, with its id/timestamp/station in row `i` of `meta`. Interpolation to
+    a height grid, peaks and integrated contents are computed over all the profiles at once, without Python loops.
+    """
+
+    @classmethod
+    def fromarrow(cls, height: pa.Array | pa.ChunkedArray, density: pa.Array | pa.ChunkedArray,
+                  meta: Optional[pd.DataFrame] = None):
+        """Profiles of list columns (a height and a density list per profile, null lists are empty profiles)"""
+        height, density = [_.combine_chunks() if isinstance(_, pa.ChunkedArray) else _ for _ in (height, density)]
+        lengths = pc.list_value_length(height).fill_null(0).to_numpy(zero_copy_only=False)
+        if not np.array_equal(lengths, pc.list_value_length(density).fill_null(0).to_numpy(zero_copy_only=False)):
+            raise ValueError('Height and density lists of different lengths')
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = [pc.list_flatten(_).cast(pa.float64()).fill_null(np.nan).to_numpy(zero_copy_only=False) for _ in (height, density)]
+        return cls(offsets, *values, meta=meta)
+
+    @classmethod
+    def fromframe(cls, df: pd.DataFrame, key: str = 'id', height: Optional[str] = None, density: Optional[str] = None):
+        """Profiles of an `Iono.edensdf_` frame, one row per (profile `key`, height) or one row of lists per profile"""
+        height = height if height else column(df, HEIGHTS, 'height')
+        density = density if density else column(df, DENSITIES, 'electron density')
+        others = [_ for _ in df.columns if _ not in (height, density)]
+
+        if islist(df[height]):
+            return cls.fromarrow(pa.array(df[height], from_pandas=True), pa.array(df[density], from_pandas=True),
+                                 meta=df[others].reset_index(drop=True))
+
+        # Rows of the same profile gathered in their order of appearance
+        codes, _ = pd.factorize(df[key], sort=False, use_na_sentinel=False)
+        order = np.argsort(codes, kind='stable')
+        lengths = np.bincount(codes, minlength=codes.max() + 1 if codes.size else 0)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        meta = df[others].iloc[order[offsets[:-1]]].reset_index(drop=True)
+        return cls(offsets, df[height].to_numpy(dtype=np.float64, na_value=np.nan)[order],
+                   df[density].to_numpy(dtype=np.float64, na_value=np.nan)[order], meta=meta)
+
+    @classmethod
+    def fromsao(cls, table: pa.Table):
+        """Profiles of the true height profiles of a `saobatch` table"""
+        meta = pd.DataFrame({'timestamp': table['timestamp'].to_numpy(),
+                             'station': table['system.ursicode'].cast(pa.string()).to_numpy(zero_copy_only=False)})
+        return cls.fromarrow(table['trueheightProf.trueHeight'], table['trueheightProf.electronDensity'], meta=meta)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def interpolate(self, grid) -> np.ndarray:
+        """(profiles, heights) densities linearly interpolated at the `grid` heights, NaN outside of each profile"""
+        grid = np.asarray(grid, dtype=np.float64).reshape(-1)
+        n, g = len(self), grid.size
+        out = np.full((n, g), np.nan)
+        if not (self.height.size and g):
+            return out
+
+        # Profile index and height in one sorted key, so that one searchsorted locates all the grid heights
+        h0 = min(self.height.min(), grid.min())
+        span = max(self.height.max(), grid.max()) - h0 + 1.
+        key = self.index * span + (self.height - h0)
+        query = (np.arange(n)[:, None] * span + (grid[None, :] - h0)).reshape(-1)
+        hi = np.searchsorted(key, query, side='right')
+        lo = hi - 1
+        start, end = np.repeat(self.offsets[:-1], g), np.repeat(self.offsets[1:], g)
+        inside = (lo >= start) & ((hi < end) | (key[np.maximum(lo, 0)] == query))
+
+        lo, hi = lo[inside], np.minimum(hi[inside], end[inside] - 1)
+        h = np.tile(grid, n)[inside]
+        dh = self.height[hi] - self.height[lo]
+        w = np.divide(h - self.height[lo], dh, out=np.zeros_like(dh), where=dh > 0)
+        out.reshape(-1)[inside] = self.density[lo] + w * (self.density[hi] - self.density[lo])
+        return out
+
+    def peak(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(height, density) of the maximum density of each profile (the lowest on ties), NaN for empty profiles"""
+        n = len(self)
+        hmax, nmax = np.full(n, np.nan), np.full(n, np.nan)
+        lengths = self.lengths
+        nonempty = lengths > 0
+        if not nonempty.any():
+            return hmax, nmax
+
+        density = np.where(np.isnan(self.density), -np.inf, self.density)
+        peaks = np.maximum.reduceat(density, self.offsets[:-1][nonempty])
+        pos = np.flatnonzero(density == np.repeat(peaks, lengths[nonempty]))
+        profiles, first = np.unique(self.index[pos], return_index=True)
+        hmax[profiles], nmax[profiles] = self.height[pos[first]], self.density[pos[first]]
+        # Profiles without any density
+        missing = np.flatnonzero(nonempty)[np.isneginf(peaks)]
+        hmax[missing] = np.nan
+        return hmax, nmax
+
+    def content(self) -> np.ndarray:
+        """Integrated density of each profile over its heights (trapezoidal), in density units x height units
+
+        With densities in m^-3 and heights in km, multiply by 1e3 / 1e16 for TEC units. NaN for empty profiles.
+        """
+        same = self.index[1:] == self.index[:-1]
+        area = 0.5 * (self.density[1:] + self.density[:-1]) * np.diff(self.height)
+        content = np.bincount(self.index[1:][same], weights=area[same], minlength=len(self))
+        content[self.lengths == 0] = np.nan
+        return content
+
+    def toarrow(self, grid=None) -> Tuple[pa.Array, pa.Array]:
+        """(height, density) list<float32> columns, the profiles interpolated on `grid` when given"""
+        if grid is None:
+            offsets = pa.array(self.offsets.astype(np.int32))
+            return (pa.ListArray.from_arrays(offsets, pa.array(self.height, type=pa.float32())),
+                    pa.ListArray.from_arrays(offsets, pa.array(self.density, type=pa.float32(), from_pandas=True)))
+
+        grid = np.asarray(grid, dtype=np.float64).reshape(-1)
+        offsets = pa.array(np.arange(len(self) + 1, dtype=np.int32) * grid.size)
+        return (pa.ListArray.from_arrays(offsets, pa.array(np.tile(grid, len(self)), type=pa.float32())),
+                pa.ListArray.from_arrays(offsets, pa.array(self.interpolate(grid).reshape(-1), type=pa.float32(),
+                                                           from_pandas=True)))
+
+    def frame(self, grid=None) -> pd.DataFrame:
+        """One row per profile: `meta`, its peak (hmax, nmax), integrated content and its height/density lists"""
+        hmax, nmax = self.peak()
+        height, density = self.toarrow(grid=grid)
+        return self.meta.assign(
+            hmax=hmax, nmax=nmax, content=self.content(),
+            height=pd.arrays.ArrowExtensionArray(height), density=pd.arrays.ArrowExtensionArray(density)
+        )
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        s = slice(self.offsets[i], self.offsets[i + 1])
+        return self.height[s], self.density[s]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __init__(self, offsets: np.ndarray, height: np.ndarray, density: np.ndarray, meta: Optional[pd.DataFrame] = None):
+        offsets = np.asarray(offsets, dtype=np.int64)
+        index = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        height, density = np.asarray(height, dtype=np.float64), np.asarray(density, dtype=np.float64)
+
+        # Values without a height are dropped
+        keep = ~np.isnan(height)
+        if not keep.all():
+            index, height, density = index[keep], height[keep], density[keep]
+            offsets = np.zeros_like(offsets)
+            np.cumsum(np.bincount(index, minlength=len(offsets) - 1), out=offsets[1:])
+
+        # Heights in ascending order within each profile
+        if height.size and not np.all((np.diff(height) >= 0) | (index[1:] != index[:-1])):
+            order = np.lexsort((height, index))
+            height, density = height[order], density[order]
+
+        self.offsets, self.index, self.height, self.density = offsets, index, height, density
+        self.meta = meta if meta is not None else pd.DataFrame(index=pd.RangeIndex(len(self)))
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+AGGREGATIONS = ('mean', 'median', 'last', 'count')
+
+
+def characteristics(df: pd.DataFrame) -> List[str]:
+    # Numeric columns of a records frame, other than its keys
+    return [_ for _ in df.columns if _ not in ('id', 'timestamp', 'station') and pd.api.types.is_numeric_dtype(df[_])]
+
+
+def resample(df: pd.DataFrame, resolution: timedelta | str, how: str = 'mean',
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Records aggregated per station into `resolution` buckets, labelled by their start (floor of the timestamps)
+
+    `how` is one of AGGREGATIONS, NaN values are skipped (count: non-NaN values, last: the last non-NaN value by
+    timestamp). One row per station and bucket holding records, ordered by (timestamp, station).
+    """
+    if how not in AGGREGATIONS:
+        raise ValueError(f'Unsupported aggregation: {how}, available: {", ".join(AGGREGATIONS)}')
+    columns = characteristics(df) if columns is None else list(columns)
+    if df.empty:
+        return pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[us]'), 'station': pd.Series(dtype=object),
+                             **{_: pd.Series(dtype='int64' if how == 'count' else 'float64') for _ in columns}})
+
+    df = df.sort_values('timestamp', kind='stable') if how == 'last' else df
+    timestamp = pd.to_datetime(df['timestamp']).dt.floor(pd.Timedelta(resolution))
+    grouped = df[columns].groupby([timestamp, df['station']], sort=True, observed=True)
+    return getattr(grouped, how)().reset_index()
+
+
+def wide(df: pd.DataFrame, resolution: timedelta | str, how: str = 'mean', columns: Optional[List[str]] = None,
+         start: Optional[datetime] = None, end: Optional[datetime] = None, stations: Optional[List[str]] = None) -> pd.DataFrame:
+    """Resampled records as one (timestamp x station) matrix per characteristic, side by side
+
+    Rows are every `resolution` bucket from `start` to `end` (default: those of the records), columns are
+    `<characteristic>_<station>` for the `stations` (default: those of the records), empty cells are NaN (0 for count).
+    """
+    columns = characteristics(df) if columns is None else list(columns)
+    resolution = pd.Timedelta(resolution)
+    dfR = resample(df, resolution, how=how, columns=columns)
+
+    stations = sorted(dfR['station'].unique()) if stations is None else list(stations)
+    start = pd.Timestamp(start).floor(resolution) if start is not None else dfR['timestamp'].min()
+    end = pd.Timestamp(end) if end is not None else dfR['timestamp'].max()
+    times = pd.date_range(start, end, freq=resolution) if not (pd.isna(start) or pd.isna(end)) else pd.DatetimeIndex([])
+
+    # Matrix cells of the resampled rows, rows outside of [start, end] or of other stations are left out
+    t = ((dfR['timestamp'] - start) // resolution).to_numpy() if len(times) else np.zeros(0, dtype=np.int64)
+    s = pd.Index(stations).get_indexer(dfR['station'])
+    keep = (t >= 0) & (t < len(times)) & (s >= 0)
+    t, s = t[keep], s[keep]
+
+    matrices = {'timestamp': times}
+    for column in columns:
+        matrix = np.zeros((len(times), len(stations)), dtype=np.int64) if how == 'count' else \
+            np.full((len(times), len(stations)), np.nan)
+        matrix[t, s] = dfR[column].to_numpy()[keep]
+        matrices.update({f'{column}_{station}': matrix[:, j] for j, station in enumerate(stations)})
+    return pd.DataFrame(matrices)
@@ -0,0 +1,218 @@
+from itertools import chain, islice
+from typing import Iterable, Iterator, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Fields of the `schemas.SAO` parts, in the order of their positional data, with their column kinds:
+# f4/f8 floats, i4 ints, hex (`Hex`, base 16) ints, bool (`Bool`), str (dictionary encoded)
+GEOCONST = [('gyrofrequency', 'f4'), ('dipAngle', 'f4'), ('lat', 'f8'), ('lon', 'f8'), ('ssn', 'f4')]
+# (field, key of the record's system dict)
+SYSTEM = [('sounder', 'sounder'), ('stationid', 'stationid'), ('ursicode', 'ursicode'), ('name', 'NAME'),
+          ('artist', 'ARTIST'), ('nhVer', 'NH'), ('adepVer', 'ADEP'), ('operMsg', 'opermsg')]
+# Sounding header layouts per version (the first token): index of their first field after the timestamp and fields
+SOUNDINGS = {
+    'FF': (8, [('rcvstation', 'str'), ('transtation', 'str'), ('dpsSched', 'hex'), ('dpsProg', 'hex'),
+               ('startFreq', 'i4'), ('coarseFreq', 'i4'), ('stopFreq', 'i4'), ('dpsFineFreqStep', 'i4'),
+               ('multiplexingDSBL', 'bool'), ('ndpsSmallSteps', 'hex'), ('dpsPhaseCode', 'hex'), ('altANT1Setup', 'i4'),
+               ('dpsANT1Opts', 'hex'), ('totalFFTSamplesPOW', 'i4'), ('dpsRadioSilentMode', 'i4'),
+               ('pulseRepRate', 'i4'), ('rangeStart', 'i4'), ('dpsRangeIncr', 'str'), ('numRages', 'i4'),
+               ('scanDelay', 'i4'), ('dpsBaseGain', 'hex'), ('dpsFreqSearchEnabled', 'bool'), ('dpsOpMode', 'i4'),
+               ('artistEnabled', 'bool'), ('dpsDataFmt', 'i4'), ('onlinePrinterSel', 'i4'), ('ionoThreshFTP', 'i4'),
+               ('highInterference', 'i4')]),
+    'FE': (9, [('programSet', 'i4'), ('programType', 'str'), ('journal', 'str'), ('nominalFreq', 'i4'),
+               ('outputCtrl', 'str'), ('startFreq', 'i4'), ('incrFreq', 'hex'), ('stopFreq', 'i4'),
+               ('testOutput', 'str'), ('stationid', 'str'), ('phaseCode', 'hex'), ('ant1Azimuth', 'hex'),
+               ('ant1Scan', 'hex'), ('ant1OptionDoppler', 'hex'), ('numSamples', 'i4'), ('repRate', 'hex'),
+               ('pulseWidthCode', 'hex'), ('timeCtrl', 'hex'), ('freqCorrection', 'hex'), ('gainCorrection', 'hex'),
+               ('rangeIncr', 'hex'), ('rangeStart', 'hex'), ('freqSearch', 'hex'), ('nominalGain', 'hex'),
+               ('spare', 'i4')]),
+    'AA': (8, []),
+}
+SCALED = ['foF2', 'foF1', 'mD', 'mufD', 'fmin', 'foEs', 'fminF', 'fminE', 'foE', 'fxI', 'hF', 'hF2', 'hE', 'hEs', 'zmE',
+          'yE', 'qf', 'qe', 'downF', 'downE', 'downEs', 'ff', 'fe', 'd', 'fMUF', 'hfMUF', 'delta_foF2', 'foEp', 'fhF',
+          'fhF2', 'foF1p', 'phF2lyr', 'phF1lyr', 'zhalfNm', 'foF2p', 'fminEs', 'yF2', 'yF1', 'tec', 'scHgtF2pk', 'b0IRI',
+          'b1IRI', 'd1IRI', 'foEa', 'hEa', 'foP', 'hP', 'fbEs', 'typeEs']
+LISTS = [('analysisFlags', 'i4'), ('dopplerTrans', 'f4'), ('medAmplF', 'i4'), ('medAmplE', 'i4'), ('medAmplEs', 'i4'),
+         ('trueHeightsCoefF2', 'f4'), ('trueHeightsCoefF1', 'f4'), ('trueHeightsCoefE', 'f4'),
+         ('quasiParabSegm', 'f4'), ('editFlagsChar', 'i4'), ('valleyDescrWDUM', 'f4'), ('qualifLTR', 'str'),
+         ('descrLTR', 'str'), ('editFlgTraceProf', 'i4')]
+# Layer traces: (field, key of the record's group dict, kind) of VTHADFGroup, VHADFGroup and TFEGroup
+_VTHADF = [('virtualHeight', 'VH', 'f4'), ('trueHeight', 'TH', 'f4'), ('amplitude', 'AMPL', 'i4'),
+           ('dopplerNumber', 'DN', 'i4'), ('frequency', 'FREQ', 'f4')]
+_VHADF = [_ for _ in _VTHADF if _[1] != 'TH']
+_TFE = [('trueHeight', 'TH', 'f4'), ('frequency', 'FREQ', 'f4'), ('electronDensity', 'ELDENS', 'f4')]
+LAYERS = [('f2layerO', _VTHADF), ('f1layerO', _VTHADF), ('elayerO', _VTHADF), ('f2layerX', _VHADF),
+          ('f1layerX', _VHADF), ('elayerX', _VHADF), ('eslayerO', _VHADF), ('eauroralayerO', _VHADF),
+          ('trueheightProf', _TFE)]
+
+_TYPES = {'f4': pa.float32(), 'f8': pa.float64(), 'i4': pa.int32(), 'hex': pa.int64(), 'bool': pa.bool_(),
+          'str': pa.dictionary(pa.int32(), pa.string())}
+
+
+def _sounding():
+    fields = {'version': 'str'}
+    for _, layout in SOUNDINGS.values():
+        for name, kind in layout:
+            fields.setdefault(name, kind)
+    return list(fields.items())
+
+
+SOUNDING = _sounding()
+
+SCHEMA = pa.schema(
+    [pa.field('timestamp', pa.timestamp('us'))] +
+    [pa.field(f'system.{name}', _TYPES['str']) for name, _ in SYSTEM] +
+    [pa.field(f'geoConst.{name}', _TYPES[kind]) for name, kind in GEOCONST] +
+    [pa.field(f'sounding.{name}', _TYPES[kind]) for name, kind in SOUNDING] +
+    [pa.field(f'scaled.{name}', pa.float32()) for name in SCALED] +
+    [pa.field(name, pa.list_(_TYPES[kind] if kind != 'str' else pa.string())) for name, kind in LISTS] +
+    [pa.field(f'{group}.{name}', pa.list_(_TYPES[kind])) for group, fields in LAYERS for name, _, kind in fields]
+)
+
+
+def _convert(values: list, kind: str) -> pa.Array:
+    if kind == 'str':
+        return pa.array([None if v is None else str(v).strip() for v in values], type=pa.string()).dictionary_encode()
+    if kind == 'hex':
+        return pa.array([None if v is None else int(v, 16) for v in values], type=pa.int64())
+    if kind == 'bool':
+        return pc.not_equal(_convert(values, 'i4'), 0)
+    try:
+        # Numbers (msgpack/JSON), None as nulls
+        return pa.array(values, type=_TYPES[kind])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Numeric strings, as the pydantic fields coerce them
+        return pc.utf8_trim_whitespace(pa.array([None if v is None else str(v) for v in values], type=pa.string())).cast(_TYPES[kind])
+
+
+def _column(values: list, kind: str, name: str, offset: int) -> pa.Array:
+    try:
+        return _convert(values, kind)
+    except (ValueError, TypeError, pa.ArrowException) as e:
+        for i, v in enumerate(values):
+            try:
+                _convert([v], kind)
+            except (ValueError, TypeError, pa.ArrowException):
+                raise ValueError(f'Invalid SAO record {offset + i}, {name}: {v!r}') from e
+        raise
+
+
+def _ragged(values: list, kind: str, name: str, offset: int) -> pa.Array:
+    # list<kind> column of per record lists (None when absent)
+    type = pa.list_(pa.string() if kind == 'str' else _TYPES[kind])
+    if kind in ('f4', 'f8', 'i4', 'str'):
+        try:
+            return pa.array(values, type=type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+    # Values to be coerced: one flat values array and the offsets
+    lengths = np.fromiter((0 if v is None else len(v) for v in values), dtype=np.int32, count=len(values))
+    offsets = np.zeros(len(values) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = list(chain.from_iterable(v for v in values if v is not None))
+    if kind == 'str':
+        flat = pa.array([None if v is None else str(v) for v in flat], type=pa.string())
+    else:
+        flat = _column(flat, kind, name, offset)
+    mask = pa.array(np.fromiter((v is None for v in values), dtype=bool, count=len(values)))
+    return pa.ListArray.from_arrays(pa.array(offsets), flat, mask=mask if mask.true_count else None)
+
+
+def _timestamps(year, month, day, hour, minute, second) -> np.ndarray:
+    # datetime64[us] of the sounding header date/time tokens (the day of year token is not used, as in `schemas`)
+    t = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1).astype('timedelta64[M]')
+    t = t.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+    return t.astype('datetime64[us]') + (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')
+
+
+def _decode(records: List[dict], offset: int = 0) -> pa.RecordBatch:
+    n = len(records)
+    columns = dict()
+
+    soundings = [r['sounding'] for r in records]
+    header = dict()
+    fields = {name: [None] * n for name, _ in SOUNDING}
+    for i, data in enumerate(soundings):
+        try:
+            start, layout = SOUNDINGS[data[0]]
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f'Invalid SAO record {offset + i}, unsupported sounding header: {data[:1]!r}')
+        fields['version'][i] = data[0]
+        for j, (name, _) in enumerate(layout[:len(data) - start]):
+            fields[name][i] = data[start + j]
+    for k, name in zip((1, 3, 4, 5, 6, 7), ('year', 'month', 'day', 'hour', 'minute', 'second')):
+        header[name] = _column([_[k] for _ in soundings], 'i4', f'sounding.{name}', offset).to_numpy(zero_copy_only=False)
+    columns['timestamp'] = pa.array(_timestamps(**{k: v.astype(np.int64) for k, v in header.items()}))
+
+    systems = [r.get('system') or dict() for r in records]
+    for name, key in SYSTEM:
+        columns[f'system.{name}'] = _column([_.get(key) for _ in systems], 'str', f'system.{name}', offset)
+
+    geoconsts = [r.get('geoConst') or [] for r in records]
+    for j, (name, kind) in enumerate(GEOCONST):
+        columns[f'geoConst.{name}'] = _column([_[j] if j < len(_) else None for _ in geoconsts], kind, f'geoConst.{name}', offset)
+
+    for name, kind in SOUNDING:
+        columns[f'sounding.{name}'] = _column(fields[name], kind, f'sounding.{name}', offset)
+
+    # Scaled characteristics: the positional lists scattered into a (records, characteristics) matrix
+    scaled = _ragged([r.get('scaled') for r in records], 'f4', 'scaled', offset)
+    lengths = pc.list_value_length(scaled).fill_null(0).to_numpy(zero_copy_only=False)
+    flat = pc.list_flatten(scaled)
+    rows = np.repeat(np.arange(n), lengths)
+    cols = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    keep = cols < len(SCALED)
+    values = np.zeros((n, len(SCALED)), dtype=np.float32)
+    valid = np.zeros((n, len(SCALED)), dtype=bool)
+    values[rows[keep], cols[keep]] = flat.to_numpy(zero_copy_only=False)[keep]
+    valid[rows[keep], cols[keep]] = flat.is_valid().to_numpy(zero_copy_only=False)[keep]
+    for j, name in enumerate(SCALED):
+        columns[f'scaled.{name}'] = pa.array(values[:, j], mask=~valid[:, j])
+
+    # Lists and layer traces, null columns for those absent from all the records
+    present = set().union(*records)
+    for name, kind in LISTS:
+        columns[name] = _ragged([r.get(name) for r in records], kind, name, offset) if name in present else None
+
+    for group, layout in LAYERS:
+        groups = [r.get(group) for r in records] if group in present else []
+        keys = set().union(*(_ for _ in groups if _ is not None))
+        for name, key, kind in layout:
+            columns[f'{group}.{name}'] = _ragged([None if _ is None else _.get(key) for _ in groups], kind,
+                                                 f'{group}.{name}', offset) if key in keys else None
+
+    return pa.RecordBatch.from_arrays([pa.nulls(n, type=_.type) if columns[_.name] is None else columns[_.name]
+                                       for _ in SCHEMA], schema=SCHEMA)
+
+
+def batches(records: Iterable[dict], size: int = 50000) -> Iterator[pa.RecordBatch]:
+    """Decode SAO records into RecordBatches of at most `size` rows of `SCHEMA`, for streaming very large inputs"""
+    records, offset = iter(records), 0
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield _decode(chunk, offset)
+        offset += len(chunk)
+
+
+def decode(records: Iterable[dict], size: int = 50000) -> pa.Table:
+    """Decode SAO records (dicts with the input of `schemas.SAO`) into a struct-of-arrays table of `SCHEMA`
+
+    Columns are named after the `SAO` fields, dotted for those of its parts: float32 `scaled.*` characteristics,
+    int32/int64 (`Hex`) and bool (`Bool`) sounding header fields, dictionary encoded strings, and list columns for the
+    layer traces and the other lists (null when absent). No model objects are built and values are not validated as
+    the pydantic fields do: malformed values raise a ValueError, missing ones are null. `validate` checks one record.
+    """
+    return pa.Table.from_batches(list(batches(records, size=size)), schema=SCHEMA)
+
+
+def validate(record: dict):
+    """Pydantic `schemas.SAO` of a single record, its positional parts parsed by their models"""
+    from . import schemas
+
+    return schemas.SAO(**{**record, 'geoConst': schemas.GeophysicalConst(record['geoConst']),
+                          'sounding': schemas.Sounding(record['sounding']), 'scaled': schemas.ScaledIono(record['scaled'])})
@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Optional
+from datetime import datetime, timedelta, UTC
+
+import ciso8601
+import portion as P
+import pandas as pd
+
+from .config import Logger, cfg
+
+from .api import readparquet
+
+
+def within(ts: pd.Series, interval: P.Interval):
+    mask = pd.Series(False, index=ts.index)
+    for atomic in interval:
+        if atomic.empty:
+            continue
+        lower = (ts >= atomic.lower) if atomic.left == P.CLOSED else (ts > atomic.lower)
+        upper = (ts <= atomic.upper) if atomic.right == P.CLOSED else (ts < atomic.upper)
+        mask |= lower & upper
+    return mask
+
+
+class SAOCache(object):
+    """On-disk Parquet cache of Ionostream SAO characteristics, one file per station and UTC day.
+
+    Each station keeps a coverage index of the intervals already fetched. Intervals fetched less than
+    `ttl` ago are trusted up to their fetch time; older ones only up to `fetched - ttl`, since recent SAO
+    records may still be ingested or re-scaled server side.
+    """
+
+    def trusted(self, interval: P.Interval, fetched: Optional[datetime], now: datetime):
+        # Never beyond the fetch time, nor beyond `fetched - ttl` once `ttl` has elapsed
+        if fetched is None:
+            return interval
+        return interval & P.closed(-P.inf, fetched if now - fetched < self.ttl else fetched - self.ttl)
+
+    @staticmethod
+    def dumps(interval: P.Interval):
+        return P.to_data(interval, conv=lambda v: v.isoformat())
+
+    @staticmethod
+    def loads(data):
+        return P.from_data([tuple(_) for _ in data], conv=ciso8601.parse_datetime)
+
+    @staticmethod
+    def days(interval: P.Interval):
+        if interval.empty:
+            return []
+        return pd.date_range(pd.Timestamp(interval.lower).floor('D'), pd.Timestamp(interval.upper).floor('D'), freq='D')
+
+    @staticmethod
+    def write(data: pd.DataFrame, path: Path):
+        tmppath = path.with_suffix(f'.{os.getpid()}.tmp')
+        data.to_parquet(tmppath, engine='pyarrow', index=False)
+        os.replace(tmppath, path)
+
+    def dayfile(self, station: str, day: pd.Timestamp):
+        return self.path.joinpath(station, f'{day.strftime("%Y%m%d")}.parquet')
+
+    def coverage(self, station: str):
+        path = self.path.joinpath(station, 'coverage.json')
+        try:
+            return [(self.loads(e['interval']), ciso8601.parse_datetime(e['fetched']) if e['fetched'] else None)
+                    for e in json.loads(path.read_text())]
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            Logger.logger.warning(f'Discarding unreadable SAO cache coverage {path}: {e}')
+            return []
+
+    def covered(self, station: str, now: Optional[datetime] = None):
+        now = now if now else datetime.now(UTC).replace(tzinfo=None)
+        covered = P.empty()
+        for interval, fetched in self.coverage(station):
+            covered |= self.trusted(interval, fetched, now)
+        return covered
+
+    def missing(self, station: str, interval: P.Interval, now: Optional[datetime] = None):
+        return interval - self.covered(station, now=now)
+
+    def load(self, station: str, interval: P.Interval):
+        frames = []
+        for day in self.days(interval):
+            path = self.dayfile(station, day)
+            if not path.exists():
+                continue
+            df = readparquet(path)
+            frames.append(df[within(df['timestamp'], interval)])
+
+        frames = [_ for _ in frames if not _.empty]
+        if not frames:
+            return None
+
+        return pd.concat(frames, ignore_index=True)
+
+    def store(self, station: str, data: pd.DataFrame, interval: P.Interval, fetched: datetime,
+              now: Optional[datetime] = None):
+        self.path.joinpath(station).mkdir(parents=True, exist_ok=True)
+
+        days = data['timestamp'].dt.floor('D')
+        for day in self.days(interval):
+            path = self.dayfile(station, day)
+            new = data[days == day]
+            if path.exists():
+                old = readparquet(path)
+                new = pd.concat([old[~within(old['timestamp'], interval)], new], ignore_index=True)
+            if new.empty:
+                path.unlink(missing_ok=True)
+                continue
+            self.write(new.sort_values('timestamp', kind='stable', ignore_index=True), path)
+
+        self.compact(station, self.coverage(station) + [(interval, fetched)], now=now)
+
+    def compact(self, station: str, entries: list, now: Optional[datetime] = None):
+        now = now if now else datetime.now(UTC).replace(tzinfo=None)
+        final, recent = P.empty(), dict()
+        for interval, fetched in entries:
+            interval = self.trusted(interval, fetched, now)
+            if fetched is None or now - fetched >= self.ttl:
+                final |= interval
+            elif not interval.empty:
+                recent[fetched] = recent.get(fetched, P.empty()) | interval
+
+        entries = ([(final, None)] if not final.empty else []) + [(interval, fetched) for fetched, interval in recent.items()]
+        path = self.path.joinpath(station, 'coverage.json')
+        tmppath = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmppath.write_text(json.dumps([
+            dict(interval=self.dumps(interval), fetched=fetched.isoformat() if fetched else None) for interval, fetched in entries
+        ]))
+        os.replace(tmppath, path)
+
+    def __init__(self, path: str | Path = None, characteristics: List[str] = None, ttl: Optional[timedelta] = None):
+        key = hashlib.sha1(','.join(sorted(characteristics or [])).encode('utf-8')).hexdigest()[:12]
+        self.path = Path(path if path else cfg['CACHE']['SAO']).joinpath(key)
+        self.ttl = ttl if ttl is not None else pd.Timedelta(cfg['CACHE']['SAO_TTL']).to_pytimedelta()
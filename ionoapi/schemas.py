@@ -11,7 +11,7 @@ from geoalchemy2 import shape
 from geoalchemy2.elements import WKTElement, WKBElement
 from ._fields import Hex,Bool
 
-from iapi import Logger, cfg
+from .config import Logger, cfg
 
 APPUUID = uuid_mod.UUID(cfg['UUID'])
 _PROJ4326_3857 = pyproj.Transformer.from_crs(pyproj.CRS('EPSG:4326'), pyproj.CRS('EPSG:3857'), always_xy=True).transform
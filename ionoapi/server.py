@@ -0,0 +1,306 @@
+import io
+import re
+import time
+import asyncio
+from datetime import datetime, timedelta, UTC
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import ciso8601
+import orjson
+import pandas as pd
+import portion as P
+
+from .conn import IApiConn, ISAOConn, IGridsConn
+from .config import Logger, cfg
+from . import _uuids, writers
+from ._lru import LRUCache
+from ._retry import RetryPolicy, CircuitOpen
+
+_SIZE = re.compile(r'^\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[KMG]?)i?B?\s*$', re.IGNORECASE)
+
+CONTENT_TYPES = {
+    'json': 'application/json', 'ndjson': 'application/x-ndjson', 'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def parsesize(size: str | int) -> int:
+    """Bytes of a size such as 268435456, 256MB or 1G"""
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = _SIZE.match(str(size))
+    if match is None:
+        raise ValueError(f'Malformed size: {size}')
+    return int(float(match['value']) * 1024 ** ' KMG'.index(match['unit'].upper() or ' '))
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or dict()
+
+
+class IServer(object):
+    """Local HTTP service answering `ionos` and `igrid` queries from one warm process
+
+    All the requests share the event loop and the pooled API clients of a single `IApiConn`, and an LRU cache
+    (bounded by size) of the decoded grids, keyed by their pubid, and of the SAO records, per station and aligned
+    `window`. Windows not complete yet expire on the next poll boundary, recent ones after CACHE:SAO_TTL, and
+    concurrent requests of the same missing windows or grids wait for a single upstream fetch.
+
+        GET /ionos?start=<ISO8601|null>&end=<ISO8601|null>&stations=AT138,RO041&format=json
+        GET /igrid?timestamp=<ISO8601|null>&lat=38&lon=23.5  (or points=38,23.5;45,18 or stations=AT138,RO041)
+        GET /igrid?start=<ISO8601>&end=<ISO8601>&step=15m&lat=38&lon=23.5
+        GET /health
+    """
+
+    @staticmethod
+    def encode(data, format: str) -> bytes:
+        if isinstance(data, dict) and format == 'json':
+            return orjson.dumps(data, default=writers.tojson, option=orjson.OPT_SERIALIZE_NUMPY)
+
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame.from_records(IGridsConn.flatten(data))
+        if format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            buffer = io.BytesIO()
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), buffer, compression='zstd')
+            return buffer.getvalue()
+
+        binary = [k for k in frame.columns if _uuids.isbinary(frame[k])]
+        if binary:
+            frame = frame.assign(**{k: _uuids.tostr(frame[k]) for k in binary})
+        if format == 'csv':
+            return frame.to_csv(sep=' ', na_rep='None', index=False).encode('utf-8')
+        records = frame.to_dict('records')
+        if format == 'ndjson':
+            option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY
+            return b''.join(orjson.dumps(record, default=writers.tojson, option=option) for record in records)
+        return orjson.dumps(records, default=writers.tojson, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    @staticmethod
+    def timestamp(value: Optional[str]) -> Optional[datetime]:
+        if value is None or value.lower() in ('', 'null'):
+            return None
+        value = ciso8601.parse_datetime(value)
+        return value.astimezone(UTC).replace(tzinfo=None) if value.tzinfo else value
+
+    @staticmethod
+    def format(params: dict) -> str:
+        format = params.get('format', 'json')
+        if format not in CONTENT_TYPES:
+            raise ValueError(f'Unsupported format: {format}, available: {", ".join(CONTENT_TYPES)}')
+        return format
+
+    def points(self, params: dict) -> List[Tuple[Optional[str], float, float]]:
+        if params.get('stations'):
+            if self._stations is None:
+                from ionoapi import stations
+                self._stations = stations.Stations()
+            points = [(code, self._stations[code].lat, self._stations[code].lon) for code in params['stations'].split(',')]
+        elif params.get('points'):
+            points = [(None, *map(float, _.split(','))) for _ in params['points'].split(';') if _]
+        else:
+            points = [(None, float(params['lat']), float(params['lon']))]
+
+        for _, lat, lon in points:
+            assert -10 <= lon <= 40 and 34 <= lat <= 72, AssertionError(
+                f'Ensure LAT:{lat}, LON:{lon}, are in-bounds -> LAT:{{34N - 72N}}, LON:{{10W - 40E}}')
+        return points
+
+    def ttl(self, window: datetime, now: datetime, conn: ISAOConn) -> Optional[float]:
+        # Incomplete windows until the next poll boundary, recent ones (late ingestions) for CACHE:SAO_TTL
+        if window + self.window + conn.lag > now:
+            return max(1., (conn.tick(now) - now).total_seconds())
+        if now - (window + self.window) < self.saottl:
+            return self.saottl.total_seconds()
+        return None
+
+    async def sao_(self, conn: ISAOConn) -> Tuple[pd.DataFrame, List[str]]:
+        now = datetime.now(UTC).replace(tzinfo=None)
+        windows = pd.date_range(pd.Timestamp(conn.start).floor(self.window), conn.end, freq=self.window).to_pydatetime().tolist()
+
+        frames = {(station, w): self.memo.get(('sao', station, w)) for station in conn.stations for w in windows}
+        missing = [k for k, v in frames.items() if v is None]
+        waiting = {k: self.inflight[k] for k in missing if k in self.inflight}
+        mine = {k: self.inflight.setdefault(k, self.loop.create_future()) for k in missing if k not in waiting}
+
+        try:
+            if mine:
+                requested = dict()
+                for station, w in mine:
+                    requested[station] = requested.get(station, P.empty()) | P.closedopen(w, w + self.window)
+
+                try:
+                    dfO = await conn.fetchSAO_(ISAOConn.ICHARS, requested=requested)
+                except Exception as e:
+                    for future in mine.values():
+                        future.set_exception(e)
+                        future.exception()
+                    raise
+
+                groups = dict()
+                if not dfO.empty:
+                    groups = {(station, w.to_pydatetime()): g for (station, w), g in
+                              dfO.groupby(['station', pd.to_datetime(dfO['timestamp']).dt.floor(self.window)], sort=False)}
+                for (station, w), future in mine.items():
+                    if any(s < w + self.window and e >= w for s, e in conn.failed.get(station, ())):
+                        future.set_result(None)
+                        continue
+                    frame = groups.get((station, w), dfO.iloc[0:0]).reset_index(drop=True)
+                    frames[(station, w)] = self.memo.put(('sao', station, w), frame, ttl=self.ttl(w, now, conn))
+                    future.set_result(frame)
+        finally:
+            for k, future in mine.items():
+                self.inflight.pop(k, None)
+                if not future.done():
+                    future.cancel()
+
+        for k, future in waiting.items():
+            try:
+                frames[k] = await asyncio.shield(future)
+            except Exception:
+                frames[k] = None
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                frames[k] = None
+
+        failed = sorted({station for (station, _), v in frames.items() if v is None})
+        found = [v for v in frames.values() if v is not None and not v.empty]
+        if not found:
+            return pd.DataFrame(columns=['id', 'timestamp', 'station'] + ISAOConn.ICHARS), failed
+
+        dfO = pd.concat(found, ignore_index=True)
+        dfO = dfO[(dfO['timestamp'] >= conn.start) & (dfO['timestamp'] <= conn.end)]
+        return dfO.sort_values(['timestamp', 'station'], kind='stable', ignore_index=True), failed
+
+    async def ionos_(self, params: dict):
+        try:
+            format = self.format(params)
+            start, end = self.timestamp(params.get('start')), self.timestamp(params.get('end'))
+            enabled = sorted(set(cfg['ISTREAMAPI']['Enabled']))
+            stations = sorted(set(params['stations'].split(','))) if params.get('stations') else enabled
+            assert set(stations) <= set(enabled), AssertionError(f'Unknown stations: {", ".join(sorted(set(stations) - set(enabled)))}')
+            conn = ISAOConn(start=start, end=end, stations=stations, concurrency=self.concurrency,
+                            group=self.group, loop=self.conn.loop_, apis=self.conn.apis)
+            assert conn.end - conn.start <= self.restrict, AssertionError(f'Cannot request datasets for intervals more than {self.restrict}')
+        except Exception as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'Malformed ionos query: {e}')
+
+        dfO, failed = await self.sao_(conn)
+        headers = {'X-Failed-Stations': ','.join(failed)} if failed else dict()
+        return HTTPStatus.OK, format, self.encode(dfO, format), headers
+
+    async def igrid_(self, params: dict):
+        try:
+            format = self.format(params)
+            start, end = self.timestamp(params.get('start')), self.timestamp(params.get('end'))
+            assert (start is None) == (end is None), AssertionError('Both start and end are required for a time-series')
+            assert start is None or start <= end, AssertionError(f'START:{start} is after END:{end}')
+            conn = IGridsConn(timestamp=self.timestamp(params.get('timestamp')), points=self.points(params),
+                              start=start, end=end, resolution=params.get('step', '5m'), concurrency=self.concurrency,
+                              format=format, loop=self.conn.loop_, apis=self.conn.apis, memo=self.memo)
+        except Exception as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'Malformed igrid query: {e}')
+
+        resp = await (conn.fetchSeries_() if start is not None else conn.fetchGrid_())
+        return HTTPStatus.OK, format, self.encode(resp, format), dict()
+
+    async def health_(self, params: dict):
+        resp = dict(uptime=round(time.monotonic() - self.started, 3), cache=self.memo.stats(), inflight=len(self.inflight),
+                    breakers=RetryPolicy.breakers())
+        return HTTPStatus.OK, 'json', self.encode(resp, 'json'), dict()
+
+    async def dispatch_(self, method: str, target: str):
+        url = urlsplit(target)
+        route = self.routes.get(url.path.rstrip('/') or '/')
+        try:
+            if route is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f'Unknown path: {url.path}, available: {", ".join(self.routes)}')
+            if method != 'GET':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f'Unsupported method: {method}', {'Allow': 'GET'})
+            return await route({k: v[-1] for k, v in parse_qs(url.query).items()})
+        except HTTPError as e:
+            status, message, headers = e.status, str(e), e.headers
+        except CircuitOpen as e:
+            status, message, headers = HTTPStatus.SERVICE_UNAVAILABLE, str(e), {'Retry-After': f'{e.retry_after:.0f}'}
+        except Exception as e:
+            status, message, headers = HTTPStatus.NOT_FOUND if '<NODATA>' in str(e) else HTTPStatus.BAD_GATEWAY, str(e), dict()
+            Logger.logger.error(f'Unable to answer {target}: {e}')
+        return status, 'json', self.encode(dict(error=message), 'json'), headers
+
+    async def handle_(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout(self.idle):
+                        line = await reader.readline()
+                        if not line:
+                            break
+                        method, target, version = line.decode('latin-1').split()
+                        headers = dict()
+                        while (header := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                            k, _, v = header.decode('latin-1').partition(':')
+                            headers[k.strip().lower()] = v.strip()
+                        if int(headers.get('content-length', 0)):
+                            await reader.readexactly(int(headers['content-length']))
+                except (TimeoutError, asyncio.IncompleteReadError):
+                    break
+                except ValueError:
+                    writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    break
+
+                started = time.monotonic()
+                status, format, body, extra = await self.dispatch_(method, target)
+                connection = headers.get('connection', '').lower()
+                keepalive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+
+                head = [f'HTTP/1.1 {status.value} {status.phrase}', f'Content-Type: {CONTENT_TYPES[format]}',
+                        f'Content-Length: {len(body)}', f'Connection: {"keep-alive" if keepalive else "close"}']
+                head.extend(f'{k}: {v}' for k, v in extra.items())
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if self.verbose:
+                    Logger.logger.info(f'{method} {target} {status.value} {len(body)}B {time.monotonic() - started:.3f}s')
+                if not keepalive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_(self):
+        server = await asyncio.start_server(self.handle_, self.host, self.port)
+        Logger.logger.info(f'Serving ionos/igrid queries on http://{self.host}:{self.port} '
+                           f'(cache: {self.memo.maxsize / 1024 ** 2:.0f}MB)')
+        async with server:
+            await server.serve_forever()
+
+    def serve(self):
+        self.loop.run_until_complete(self.serve_())
+
+    def __init__(self, conn: IApiConn, host: str = '127.0.0.1', port: int = 8080, cachesize: str | int = '256MB',
+                 window: timedelta = timedelta(hours=1), concurrency: int = 4, group: Optional[int] = None,
+                 restrict: timedelta = timedelta(days=10), idle: float = 60, verbose=False):
+        self.conn = conn
+        self.loop = conn.loop
+        self.host = host
+        self.port = port
+        self.memo = LRUCache(parsesize(cachesize))
+        self.window = pd.Timedelta(window).to_pytimedelta()
+        self.saottl = pd.Timedelta(cfg['CACHE']['SAO_TTL']).to_pytimedelta()
+        self.concurrency = concurrency
+        self.group = group
+        self.restrict = restrict
+        self.idle = idle
+        self.verbose = verbose
+        self.inflight = dict()
+        self.started = time.monotonic()
+        self._stations = None
+        self.routes = {'/ionos': self.ionos_, '/igrid': self.igrid_, '/health': self.health_}
@@ -1,13 +1,103 @@
-from iapi import cfg
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .config import Logger, cfg
+
+_LISTS = (('EU_STATIONS', 'iono'), ('GLOBAL_STATIONS', 'iono'), ('GLOBAL_GNSS_STATIONS', 'gnss'))
+# EPSG:3857 sphere radius and mean Earth radius (IUGG), meters
+_R3857 = 6378137.0
+_REARTH = 6371008.8
+
+
+def mercator(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    """EPSG:4326 -> EPSG:3857 (x, y) meters of arrays of points, the closed form of the pyproj transform of `schemas`"""
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    with np.errstate(divide='ignore'):
+        return _R3857 * lon, _R3857 * np.log(np.tan(np.pi / 4 + lat / 2))
+
+
+def unitvectors(lat, lon) -> np.ndarray:
+    # Points on the unit sphere: nearest by chord length is nearest by great-circle distance
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class BruteTree(object):
+    """Vectorized exhaustive search with the `query` interface of scipy's cKDTree, for a few hundred points"""
+
+    def query(self, x, k=1):
+        x = np.asarray(x, dtype=np.float64)
+        single = x.ndim == 1
+        x = x.reshape(-1, self.data.shape[1])
+        k_ = min(k, self.data.shape[0])
+
+        chord = np.sqrt(np.clip(2. - 2. * x @ self.data.T, 0., None))
+        idx = np.argpartition(chord, k_ - 1, axis=1)[:, :k_] if k_ < self.data.shape[0] else np.broadcast_to(
+            np.arange(k_), (x.shape[0], k_))
+        dist = np.take_along_axis(chord, idx, axis=1)
+        order = np.argsort(dist, axis=1, kind='stable')
+        dist, idx = np.take_along_axis(dist, order, axis=1), np.take_along_axis(idx, order, axis=1)
+        if k > k_:
+            dist = np.pad(dist, ((0, 0), (0, k - k_)), constant_values=np.inf)
+            idx = np.pad(idx, ((0, 0), (0, k - k_)), constant_values=self.data.shape[0])
+        if k == 1:
+            dist, idx = dist[:, 0], idx[:, 0]
+        return (dist[0], idx[0]) if single else (dist, idx)
+
+    def __init__(self, data: np.ndarray):
+        self.data = np.asarray(data, dtype=np.float64)
+
+
+class Station(NamedTuple):
+    """Station list entry, with the coordinates normalized as `schemas.StationSerial` does (lon in -180, 180)"""
+    code: str
+    lat: float
+    lon: float
+    type: str = None
+
+    @classmethod
+    def parse(cls, code, lat, lon, type=None):
+        lon = float(lon)
+        return cls(code, round(float(lat), 12), round(lon - 360.0 if lon > 180.0 else lon, 12), type)
 
-from . import schemas
 
 class Stations(object):
+    """Registry of the stations of the STATIONS lists in conf.yaml
+
+    Codes, types and coordinates are held in arrays, saved to CACHE:STATIONS (.npz) and parsed again only when one of
+    the lists changes. `nearest` answers k-nearest station queries for points or batches of points through a KD-tree
+    of the stations on the unit sphere (scipy's cKDTree when installed), distances are great-circle kilometers.
+    """
 
     def store(self):
         raise NotImplementedError
 
-    def parse(self,path, stype = None):
+    def serials(self):
+        # pydantic models with the station geometries, schemas imports pyproj/shapely/geoalchemy2 hence on demand only
+        from . import schemas
+
+        return [schemas.StationSerial(**station._asdict()) for station in self.stations]
+
+    @property
+    def signature(self) -> np.ndarray:
+        # Changes with any of the station lists
+        stats = [os.stat(path) for path in self.paths]
+        return np.array([f'{path}:{st.st_mtime_ns}:{st.st_size}' for path, st in zip(self.paths, stats)])
+
+    @property
+    def stations(self):
+        return [Station(*_) for _ in zip(self.codes.tolist(), self.lat.tolist(), self.lon.tolist(), self.types.tolist())]
+
+    @property
+    def mercator(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._mercator is None:
+            self._mercator = mercator(self.lat, self.lon)
+        return self._mercator
+
+    def parse(self, path, stype=None):
         with open(path, 'r') as f:
             for line in f:
                 line = line.strip()
@@ -15,12 +105,95 @@ class Stations(object):
                     continue
                 args = {k:v for k,v in zip(['code','lat','lon'],[r.strip() for r in line.split()])}
                 args['type'] = stype
-                sstation = schemas.StationSerial(**args)
-                self.stations.append(sstation)
+                yield Station.parse(**args)
+
+    def read(self, signature: np.ndarray):
+        if self.path is None:
+            return False
+        try:
+            with np.load(self.path, allow_pickle=False) as npz:
+                if not np.array_equal(npz['signature'], signature):
+                    return False
+                self.codes, self.types, self.lat, self.lon = npz['codes'], npz['types'], npz['lat'], npz['lon']
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            Logger.logger.warning(f'Discarding unreadable station registry {self.path}: {e}')
+            return False
+
+    def write(self, signature: np.ndarray):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmppath = self.path.with_suffix(f'.{os.getpid()}.tmp.npz')
+            np.savez(tmppath, signature=signature, codes=self.codes, types=self.types, lat=self.lat, lon=self.lon)
+            os.replace(tmppath, self.path)
+        except Exception as e:
+            Logger.logger.warning(f'Unable to save the station registry {self.path}: {e}')
 
-    def __init__(self):
+    def get(self, code: str, default=None) -> Optional[Station]:
+        if self._index is None:
+            self._index = {code: i for i, code in enumerate(self.codes.tolist())}
+        i = self._index.get(code)
+        if i is None:
+            return default
+        return Station(str(self.codes[i]), float(self.lat[i]), float(self.lon[i]), str(self.types[i]))
+
+    def tree(self, type: Optional[str] = None):
+        """KD-tree of the stations (of `type`, iono or gnss) and the registry indices of its points"""
+        if type not in self._trees:
+            idx = np.arange(self.codes.size) if type is None else np.flatnonzero(self.types == type)
+            if not idx.size:
+                raise ValueError(f'No stations of type: {type}')
+            try:
+                from scipy.spatial import cKDTree as KDTree
+            except ImportError:
+                KDTree = BruteTree
+            self._trees[type] = (KDTree(unitvectors(self.lat[idx], self.lon[idx])), idx)
+        return self._trees[type]
+
+    def nearest(self, lat, lon, k: int = 1, type: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(great-circle km, codes) of the `k` nearest stations to the points, shaped as `cKDTree.query` results"""
+        tree, idx = self.tree(type)
+        chord, i = tree.query(unitvectors(lat, lon), k=k)
+        found = i < idx.size
+        codes = np.where(found, self.codes[idx[np.where(found, i, 0)]], '')
+        return 2. * np.arcsin(np.clip(np.asarray(chord) / 2., 0., 1.)) * _REARTH / 1e3, codes
+
+    def __getitem__(self, code: str) -> Station:
+        station = self.get(code)
+        if station is None:
+            raise KeyError(code)
+        return station
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+    def __len__(self):
+        return self.codes.size
+
+    def __init__(self, path: str | Path = None):
         cfgstations = cfg['STATIONS']
-        self.stations = []
+        self.paths = [cfgstations[key] for key, _ in _LISTS]
+        path = path if path else cfg['CACHE'].get('STATIONS')
+        self.path = Path(path) if path else None
+        self._index = None
+        self._mercator = None
+        self._trees = dict()
+
+        signature = self.signature
+        if self.read(signature):
+            return
 
-        for key,stype in zip(('EU_STATIONS','GLOBAL_STATIONS','GLOBAL_GNSS_STATIONS'),('iono','iono','gnss')):
-            self.parse(cfgstations[key], stype = stype)
\ No newline at end of file
+        stations = dict()
+        for (_, stype), path in zip(_LISTS, self.paths):
+            for station in self.parse(path, stype=stype):
+                stations.setdefault(station.code, station)
+        stations = list(stations.values())
+        self.codes = np.array([_.code for _ in stations], dtype=str)
+        self.types = np.array([_.type for _ in stations], dtype=str)
+        self.lat = np.array([_.lat for _ in stations], dtype=np.float64)
+        self.lon = np.array([_.lon for _ in stations], dtype=np.float64)
+        self.write(signature)
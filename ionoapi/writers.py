@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List
+
+import orjson
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def tojson(v):
+    if hasattr(v, 'isoformat'):
+        return v.isoformat()
+    return str(v)
+
+
+class Writer(object):
+    """Streaming export writer, batches (DataFrames or lists of records) are written as they come"""
+    suffix = None
+    # Written batches are readable before `close`, as --follow requires
+    streaming = True
+
+    @staticmethod
+    def frame(batch):
+        import pandas as pd
+
+        return batch if isinstance(batch, pd.DataFrame) else pd.DataFrame.from_records(list(batch))
+
+    def open(self):
+        raise NotImplementedError
+
+    def write_(self, batch: pd.DataFrame):
+        raise NotImplementedError
+
+    def write(self, batch: pd.DataFrame | Iterable[dict]):
+        if self._f is None:
+            self.open()
+        batch = self.frame(batch)
+        if self.columns is not None:
+            batch = batch[self.columns]
+        self.write_(batch)
+        self.rows += batch.shape[0]
+
+    def flush(self):
+        if self._f is not None and hasattr(self._f, 'flush'):
+            self._f.flush()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __init__(self, path: str | Path, append=False, columns: List[str] = None):
+        self.path = Path(path)
+        self.append = append
+        self.columns = columns
+        self.rows = 0
+        self._f = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+
+class TextWriter(Writer):
+    """Writers of text formats, binary UUID columns are written in their canonical string form"""
+
+    def write(self, batch: pd.DataFrame | Iterable[dict]):
+        from . import _uuids
+
+        batch = self.frame(batch)
+        binary = [k for k in batch.columns if _uuids.isbinary(batch[k])]
+        if binary:
+            batch = batch.assign(**{k: _uuids.tostr(batch[k]) for k in binary})
+        super().write(batch)
+
+
+class CSVWriter(TextWriter):
+    suffix = 'csv'
+
+    def open(self):
+        self.header = not (self.append and self.path.exists() and self.path.stat().st_size > 0)
+        self._f = open(self.path, 'a' if self.append else 'w', newline='')
+
+    def write_(self, batch):
+        batch.to_csv(self._f, sep=' ', na_rep='None', header=self.header, index=False)
+        self.header = False
+
+
+class CSVZstWriter(CSVWriter):
+    suffix = 'csv.zst'
+
+    def open(self):
+        import zstandard
+
+        self.header = not (self.append and self.path.exists() and self.path.stat().st_size > 0)
+        # Appending adds a new zstd frame, which zstd decoders read as one concatenated stream
+        stream = zstandard.ZstdCompressor(level=self.level).stream_writer(open(self.path, 'ab' if self.append else 'wb'))
+        self._f = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    def __init__(self, path: str | Path, append=False, columns: List[str] = None, level=3):
+        super().__init__(path, append=append, columns=columns)
+        self.level = level
+
+
+class NDJSONWriter(TextWriter):
+    suffix = 'ndjson'
+
+    def open(self):
+        self._f = open(self.path, 'ab' if self.append else 'wb')
+
+    def write_(self, batch):
+        option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY
+        self._f.write(b''.join(orjson.dumps(record, default=tojson, option=option) for record in batch.to_dict('records')))
+
+
+class ParquetWriter(Writer):
+    suffix = 'parquet'
+    # The footer (Parquet metadata, Arrow IPC file index) is written on `close` only
+    streaming = False
+
+    def table(self, batch):
+        import pyarrow as pa
+
+        if self.schema is None:
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            self.schema = table.schema
+            return table
+        return pa.Table.from_pandas(batch, schema=self.schema, preserve_index=False)
+
+    def open(self):
+        if self.append and self.path.exists():
+            raise ValueError(f'Cannot append to an existing {self.suffix} file: {self.path}')
+
+    def write_(self, batch):
+        import pyarrow.parquet as pq
+
+        table = self.table(batch)
+        if self._f is None:
+            self._f = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+        self._f.write_table(table)
+
+    def __init__(self, path: str | Path, append=False, columns: List[str] = None):
+        super().__init__(path, append=append, columns=columns)
+        self.schema = None
+
+
+class ArrowWriter(ParquetWriter):
+    suffix = 'arrow'
+
+    def write_(self, batch):
+        import pyarrow as pa
+
+        table = self.table(batch)
+        if self._f is None:
+            self._f = pa.ipc.new_file(self.path, table.schema)
+        self._f.write_table(table)
+
+
+WRITERS = {_.suffix: _ for _ in (CSVWriter, CSVZstWriter, NDJSONWriter, ParquetWriter, ArrowWriter)}
+STREAMING = [suffix for suffix, cls in WRITERS.items() if cls.streaming]
+
+
+def writer(format: str, path: str | Path, **kwargs) -> Writer:
+    try:
+        return WRITERS[format](path, **kwargs)
+    except KeyError:
+        raise ValueError(f'Unsupported export format: {format}, available: {", ".join(WRITERS)}')
@@ -0,0 +1,41 @@
+import os, sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import portion as P
+
+from ionoapi.availability import Availability
+
+
+def index(tmp_path):
+    return Availability(path=tmp_path.joinpath('availability.json'), ttl=timedelta(hours=6))
+
+
+def test_days_open_upper(tmp_path):
+    a = index(tmp_path)
+    assert a.days(a.day(datetime(2025, 2, 3))) == [datetime(2025, 2, 3)]
+    assert a.days(P.closed(datetime(2025, 2, 3), datetime(2025, 2, 4))) == [datetime(2025, 2, 3), datetime(2025, 2, 4)]
+    assert a.days(P.closedopen(datetime(2025, 2, 3, 6), datetime(2025, 2, 4, 1))) == [datetime(2025, 2, 3), datetime(2025, 2, 4)]
+
+
+def test_unchecked_excludes_current_day(tmp_path):
+    a = index(tmp_path)
+    requested = P.closed(datetime(2025, 2, 8), datetime(2025, 2, 10, 12))
+    # The day of `now` is not final yet
+    assert a.unchecked(requested, now=datetime(2025, 2, 10, 12)) == [datetime(2025, 2, 8), datetime(2025, 2, 9)]
+    # Nor the previous one within `ttl` of its end
+    assert a.unchecked(requested, now=datetime(2025, 2, 10, 3)) == [datetime(2025, 2, 8)]
+
+    a.checked |= a.day(datetime(2025, 2, 8))
+    assert a.unchecked(requested, now=datetime(2025, 2, 10, 12)) == [datetime(2025, 2, 9)]
+
+
+def test_restrict(tmp_path):
+    a = index(tmp_path)
+    a.checked = P.closedopen(datetime(2025, 2, 1), datetime(2025, 2, 3))
+    a.covered = {'DB049': a.day(datetime(2025, 2, 1))}
+    requested = P.closed(datetime(2025, 2, 1), datetime(2025, 2, 4))
+    trimmed, gaps = a.restrict({'DB049': requested, 'AT138': requested})
+    assert gaps['DB049'] == a.day(datetime(2025, 2, 2))
+    assert trimmed['AT138'] == P.closed(datetime(2025, 2, 3), datetime(2025, 2, 4))
@@ -0,0 +1,59 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ionoapi.profiles import Profiles
+
+NAN = np.nan
+
+
+def long():
+    # a: heights out of order, b: only a row without height (empty), c: constant density
+    return pd.DataFrame({
+        'id': ['a', 'a', 'a', 'b', 'c', 'c', 'c'],
+        'trueHeight': [300., 100., 200., NAN, 150., NAN, 250.],
+        'electronDensity': [2., 1., 3., 5., 4., 9., 4.],
+    })
+
+
+def test_fromframe():
+    p = Profiles.fromframe(long())
+    assert len(p) == 3 and p.lengths.tolist() == [3, 0, 2]
+    assert p.meta['id'].tolist() == ['a', 'b', 'c']
+    assert p[0][0].tolist() == [100., 200., 300.] and p[0][1].tolist() == [1., 3., 2.]
+
+
+def test_interpolate():
+    out = Profiles.fromframe(long()).interpolate([100., 150., 250., 300., 350.])
+    np.testing.assert_allclose(out, [[1., 2., 2.5, 2., NAN],
+                                     [NAN, NAN, NAN, NAN, NAN],
+                                     [NAN, 4., 4., NAN, NAN]])
+
+
+def test_peak_content():
+    p = Profiles.fromframe(long())
+    hmax, nmax = p.peak()
+    # Ties: the lowest height
+    np.testing.assert_allclose(hmax, [200., NAN, 150.])
+    np.testing.assert_allclose(nmax, [3., NAN, 4.])
+    # Trapezoids: (1 + 3) / 2 * 100 + (3 + 2) / 2 * 100, 4 * 100
+    np.testing.assert_allclose(p.content(), [450., NAN, 400.])
+
+
+def test_lists_frame():
+    df = pd.DataFrame({'id': ['a', 'c'], 'height': [[300., 100., 200.], [150., 250.]],
+                       'density': [[2., 1., 3.], [4., 4.]]})
+    p = Profiles.fromframe(df)
+    assert p.lengths.tolist() == [3, 2]
+
+    dfP = p.frame(grid=[100., 200.])
+    assert dfP.columns.tolist() == ['id', 'hmax', 'nmax', 'content', 'height', 'density']
+    assert dfP['content'].tolist() == [450., 400.]
+    assert dfP['density'].tolist()[0] == [1., 3.]
+
+    height, density = p.toarrow()
+    assert height.type == pa.list_(pa.float32()) and height.to_pylist()[0] == [100., 200., 300.]
@@ -0,0 +1,50 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ionoapi import resample
+
+NAN = np.nan
+
+
+def records():
+    return pd.DataFrame({
+        'id': list('abcde'),
+        'timestamp': pd.to_datetime(['2025-02-01T00:15', '2025-02-01T00:00', '2025-02-01T00:05', '2025-02-01T00:10',
+                                     '2025-02-01T00:05']),
+        'station': ['A', 'A', 'A', 'A', 'B'],
+        'foF2': [5., 1., 3., NAN, 2.],
+    })
+
+
+@pytest.mark.parametrize('how, expected', [('mean', [2., 2., 5.]), ('median', [2., 2., 5.]), ('last', [3., 2., 5.]),
+                                           ('count', [2, 1, 1])])
+def test_resample(how, expected):
+    df = resample.resample(records(), '10min', how=how)
+    assert df['timestamp'].tolist() == [pd.Timestamp('2025-02-01T00:00')] * 2 + [pd.Timestamp('2025-02-01T00:10')]
+    assert df['station'].tolist() == ['A', 'B', 'A']
+    assert df['foF2'].tolist() == expected
+
+
+def test_resample_empty():
+    df = resample.resample(records().iloc[:0], '10min', how='count')
+    assert df.empty and df.columns.tolist() == ['timestamp', 'station', 'foF2'] and df['foF2'].dtype == 'int64'
+    with pytest.raises(ValueError):
+        resample.resample(records(), '10min', how='max')
+
+
+def test_wide():
+    df = resample.wide(records(), '10min', start=pd.Timestamp('2025-02-01T00:03'), end=pd.Timestamp('2025-02-01T00:20'),
+                       stations=['A', 'B', 'C'])
+    assert df.columns.tolist() == ['timestamp', 'foF2_A', 'foF2_B', 'foF2_C']
+    assert df['timestamp'].tolist() == list(pd.date_range('2025-02-01T00:00', '2025-02-01T00:20', freq='10min'))
+    np.testing.assert_allclose(df[['foF2_A', 'foF2_B', 'foF2_C']].to_numpy(),
+                               [[2., 2., NAN], [5., NAN, NAN], [NAN, NAN, NAN]])
+
+    counts = resample.wide(records(), '10min', how='count')
+    assert counts.columns.tolist() == ['timestamp', 'foF2_A', 'foF2_B']
+    assert counts['foF2_A'].tolist() == [2, 1] and counts['foF2_B'].tolist() == [1, 0]
@@ -0,0 +1,86 @@
+import os, sys
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_fixed
+
+from ionoapi._retry import CircuitBreaker, CircuitOpen, DeadlineExceeded, RetryPolicy
+
+
+def policy(deadline=0.2, reset=0.05):
+    return RetryPolicy('host:443', attempts=1, deadline=deadline, breaker=CircuitBreaker('host:443', threshold=1, reset=reset))
+
+
+async def down():
+    raise httpx.ConnectError('down')
+
+
+async def slow():
+    await asyncio.sleep(10)
+
+
+async def ok():
+    return 'ok'
+
+
+def halfopen(p):
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(p.call_(down))
+    time.sleep(p.breaker.reset)
+    assert p.breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_deadline_probe_reopens():
+    p = policy()
+    halfopen(p)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(p.call_(slow))
+    assert p.breaker.state == CircuitBreaker.OPEN and not p.breaker._probing
+
+    time.sleep(p.breaker.reset)
+    assert asyncio.run(p.call_(ok)) == 'ok'
+    assert p.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_released():
+    p = policy(deadline=10)
+    halfopen(p)
+
+    async def cancel():
+        task = asyncio.create_task(p.call_(slow))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert p.breaker.state == CircuitBreaker.HALF_OPEN and not p.breaker._probing
+    assert asyncio.run(p.call_(ok)) == 'ok'
+    assert p.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_fails_fast():
+    p = policy(reset=60)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(p.call_(down))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(p.call_(ok))
+
+
+def test_deadline_during_backoff_counted_once():
+    p = RetryPolicy('host:443', attempts=3, deadline=0.2, breaker=CircuitBreaker('host:443', threshold=5, reset=60))
+    # The deadline expires while sleeping before the second attempt
+    p.retrying = lambda deadline, retrying=None: AsyncRetrying(stop=stop_after_attempt(3), wait=wait_fixed(10),
+                                                               retry=retry_if_exception(p.retry_), reraise=True)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(p.call_(down))
+    assert p.breaker.failures == 1 and p.breaker.state == CircuitBreaker.CLOSED
+
+    # Expired during the call itself
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(p.call_(slow))
+    assert p.breaker.failures == 2
@@ -0,0 +1,39 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+import pytest
+
+from bench.sao_decode import check, synthetic
+from ionoapi import saobatch
+
+
+def test_decode_matches_validate():
+    # Both sounding layouts (FF, FE), ragged layer lists and missing scaled values
+    records = synthetic(8)
+    table = saobatch.decode(records)
+    assert table.num_rows == 8 and table.schema == saobatch.SCHEMA
+    check(table, records)
+
+
+def test_batches():
+    records = synthetic(5)
+    batches = list(saobatch.batches(records, size=2))
+    assert [_.num_rows for _ in batches] == [2, 2, 1]
+    assert pa.Table.from_batches(batches, schema=saobatch.SCHEMA).to_pylist() == saobatch.decode(records).to_pylist()
+
+
+def test_missing_groups():
+    record = synthetic(1)[0]
+    del record['elayerO'], record['qualifLTR']
+    row = saobatch.decode([record]).to_pylist()[0]
+    assert row['elayerO.virtualHeight'] is None and row['qualifLTR'] is None
+    assert row['f2layerO.virtualHeight'] == pytest.approx(record['f2layerO']['VH'])
+
+
+def test_invalid_record():
+    records = synthetic(3)
+    records[2]['sounding'] = ['XX'] + records[2]['sounding'][1:]
+    with pytest.raises(ValueError, match='record 2'):
+        saobatch.decode(records)
@@ -0,0 +1,90 @@
+import os, sys
+import json
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import portion as P
+import pyarrow as pa
+
+from ionoapi import _uuids
+from ionoapi.saocache import SAOCache
+
+NOW = datetime(2025, 2, 10, 12, 0)
+TTL = timedelta(hours=6)
+
+
+def cache(tmp_path):
+    return SAOCache(path=tmp_path, characteristics=['foF2'], ttl=TTL)
+
+
+def records(start, end, station='AT138'):
+    # As fetched: 16-byte binary ids
+    ts = pd.date_range(start, end, freq='5min')
+    ids = _uuids.tobinary(pa.array([str(uuid.uuid5(uuid.NAMESPACE_DNS, f'{station}{_}')) for _ in ts], type=pa.string()))
+    return pd.DataFrame({'id': pd.arrays.ArrowExtensionArray(ids), 'timestamp': ts, 'station': station,
+                         'foF2': range(len(ts))}).astype({'foF2': 'float64'})
+
+
+def test_store_load_missing(tmp_path):
+    c = cache(tmp_path)
+    interval = P.closed(datetime(2025, 2, 1, 22), datetime(2025, 2, 2, 2))
+    c.store('AT138', records(interval.lower, interval.upper), interval, NOW - timedelta(days=1), now=NOW)
+
+    # Days fetched long ago are final
+    assert c.missing('AT138', interval, now=NOW).empty
+    missing = c.missing('AT138', P.closed(datetime(2025, 2, 1, 20), datetime(2025, 2, 2, 3)), now=NOW)
+    assert missing == P.closedopen(datetime(2025, 2, 1, 20), datetime(2025, 2, 1, 22)) | \
+        P.openclosed(datetime(2025, 2, 2, 2), datetime(2025, 2, 2, 3))
+
+    # One file per day, the records of both days loaded back
+    assert sorted(_.name for _ in tmp_path.glob('*/AT138/*.parquet')) == ['20250201.parquet', '20250202.parquet']
+    df = c.load('AT138', interval)
+    assert df.shape[0] == 49 and df['timestamp'].is_monotonic_increasing
+    assert c.missing('DB049', interval, now=NOW) == interval
+
+
+def test_store_replaces_interval(tmp_path):
+    c = cache(tmp_path)
+    interval = P.closed(datetime(2025, 2, 1, 0), datetime(2025, 2, 1, 1))
+    c.store('AT138', records(interval.lower, interval.upper), interval, NOW - timedelta(days=1), now=NOW)
+    # Re-fetched without the records of the second half hour
+    half = P.closed(datetime(2025, 2, 1, 0, 30), datetime(2025, 2, 1, 1))
+    c.store('AT138', records(half.lower, half.lower), half, NOW - timedelta(days=1), now=NOW)
+    assert c.load('AT138', interval)['timestamp'].max() == pd.Timestamp(half.lower)
+
+
+def test_recent_edge(tmp_path):
+    c = cache(tmp_path)
+    # Requested up to an `end` ceiled past the fetch time
+    interval = P.closed(NOW - timedelta(hours=2), NOW + timedelta(minutes=4))
+    c.store('AT138', records(interval.lower, NOW), interval, NOW, now=NOW)
+
+    later = NOW + timedelta(minutes=5)
+    missing = c.missing('AT138', P.closed(later - timedelta(hours=2), later), now=later)
+    assert missing == P.openclosed(NOW, later)
+
+    # Once `ttl` has elapsed the fetch is trusted up to `fetched - ttl` only
+    missing = c.missing('AT138', interval, now=NOW + TTL)
+    assert missing == P.openclosed(NOW - TTL, interval.upper) & interval
+
+
+def test_compact(tmp_path):
+    c = cache(tmp_path)
+    old = P.closed(datetime(2025, 2, 9, 0), datetime(2025, 2, 9, 12))
+    young = P.closed(NOW - timedelta(hours=1), NOW + timedelta(hours=1))
+    c.store('AT138', records(old.lower, old.upper), old, datetime(2025, 2, 9, 12), now=NOW)
+    c.store('AT138', records(young.lower, NOW), young, NOW, now=NOW)
+
+    entries = json.loads(tmp_path.joinpath(c.path.name, 'AT138', 'coverage.json').read_text())
+    assert len(entries) == 2 and entries[0]['fetched'] is None
+    # The old fetch is kept up to `fetched - ttl`, the young one up to its fetch time
+    assert c.covered('AT138', now=NOW) == P.closed(old.lower, datetime(2025, 2, 9, 6)) | P.closed(young.lower, NOW)
+
+    # Compacted once `ttl` has elapsed: a single final entry
+    c.compact('AT138', c.coverage('AT138'), now=NOW + TTL)
+    assert [fetched for _, fetched in c.coverage('AT138')] == [None]
+    assert c.covered('AT138', now=NOW + TTL) == P.closed(old.lower, datetime(2025, 2, 9, 6)) | \
+        P.closed(young.lower, NOW - TTL) & young
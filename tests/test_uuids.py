@@ -0,0 +1,55 @@
+import os, sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ionoapi import _uuids, writers
+from ionoapi.api import readparquet
+
+UUIDS = [uuid.uuid5(uuid.NAMESPACE_DNS, f'record{_}') for _ in range(5)]
+
+
+def test_roundtrip():
+    strs = [str(_) for _ in UUIDS]
+    binary = _uuids.tobinary(pa.array(strs))
+    assert binary.type == _uuids.BINARY and binary.to_pylist() == [_.bytes for _ in UUIDS]
+
+    series = pd.Series(pd.arrays.ArrowExtensionArray(binary), name='id')
+    assert _uuids.isbinary(series)
+    assert _uuids.tostr(series).tolist() == strs
+    assert _uuids.touuid(series).tolist() == UUIDS
+
+
+def test_representations():
+    # Canonical fast path (36 and 32 hex digits, either case) and the per value fallback
+    for values in ([str(_) for _ in UUIDS], [_.hex for _ in UUIDS], [str(_).upper() for _ in UUIDS],
+                   [f'{{{_}}}' for _ in UUIDS], [_.urn for _ in UUIDS]):
+        assert _uuids.tobinary(pa.array(values)).to_pylist() == [_.bytes for _ in UUIDS]
+    # Binary values are kept as they are
+    assert _uuids.tobinary(_uuids.tobinary(pa.array([str(_) for _ in UUIDS])).chunk(0)).to_pylist() == [_.bytes for _ in UUIDS]
+
+    # Nulls, in a sliced chunk
+    binary = _uuids.tobinary(pa.array([str(UUIDS[0]), None, str(UUIDS[2])]).slice(1))
+    assert binary.to_pylist() == [None, UUIDS[2].bytes]
+    series = pd.Series(pd.arrays.ArrowExtensionArray(binary))
+    assert _uuids.tostr(series).tolist() == [None, str(UUIDS[2])]
+    assert _uuids.touuid(series).tolist() == [None, UUIDS[2]]
+
+
+def test_parquet_text(tmp_path):
+    path = tmp_path.joinpath('records.parquet')
+    pq.write_table(pa.table({'id': [str(_) for _ in UUIDS], 'foF2': [float(_) for _ in range(5)]}), path)
+
+    df = readparquet(path)
+    assert _uuids.isbinary(df['id']) and df['id'].tolist() == [_.bytes for _ in UUIDS]
+    assert readparquet(path, uuids=True)['id'].tolist() == UUIDS
+
+    # Text exports write the canonical strings
+    csvpath = tmp_path.joinpath('records.csv')
+    with writers.writer('csv', csvpath) as writer:
+        writer.write(df)
+    assert pd.read_csv(csvpath, sep=' ')['id'].tolist() == [str(_) for _ in UUIDS]
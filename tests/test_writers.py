@@ -0,0 +1,81 @@
+import os, sys
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from ionoapi import writers
+
+
+def frame():
+    return pd.DataFrame({
+        'id': ['a1', 'b2', 'c3', 'd4', 'e5'],
+        'timestamp': pd.date_range('2025-02-01T00:00', periods=5, freq='5min'),
+        'station': ['AT138', 'DB049', 'AT138', 'DB049', 'AT138'],
+        'foF2': [4.5, np.nan, 5.25, 6., 3.75],
+    })
+
+
+def read(format, path):
+    if format == 'csv':
+        return pd.read_csv(path, sep=' ', na_values='None', parse_dates=['timestamp'])
+    if format == 'csv.zst':
+        import zstandard
+
+        with zstandard.open(path, 'rt', newline='') as f:
+            return pd.read_csv(io.StringIO(f.read()), sep=' ', na_values='None', parse_dates=['timestamp'])
+    if format == 'ndjson':
+        df = pd.DataFrame([orjson.loads(_) for _ in path.read_bytes().splitlines()])
+        return df.assign(timestamp=pd.to_datetime(df['timestamp']), foF2=df['foF2'].astype('float64'))
+    if format == 'parquet':
+        return pq.read_table(path).to_pandas()
+    with pa.ipc.open_file(path) as reader:
+        return reader.read_all().to_pandas()
+
+
+@pytest.mark.parametrize('format', list(writers.WRITERS))
+def test_roundtrip(tmp_path, format):
+    df = frame()
+    path = tmp_path.joinpath(f'export.{format}')
+    with writers.writer(format, path) as writer:
+        # Batches as they come, DataFrames or records
+        writer.write(df.iloc[:2])
+        writer.write(df.iloc[2:].to_dict('records'))
+    assert writer.rows == 5
+
+    dfR = read(format, path)
+    assert dfR.columns.tolist() == df.columns.tolist()
+    pd.testing.assert_frame_equal(dfR, df, check_dtype=False)
+
+
+@pytest.mark.parametrize('format', writers.STREAMING)
+def test_append(tmp_path, format):
+    df = frame()
+    path = tmp_path.joinpath(f'export.{format}')
+    with writers.writer(format, path) as writer:
+        writer.write(df.iloc[:3])
+    # Appending writes the header of text formats once
+    with writers.writer(format, path, append=True) as writer:
+        writer.write(df.iloc[3:])
+    pd.testing.assert_frame_equal(read(format, path), df, check_dtype=False)
+
+
+def test_columns_formats(tmp_path):
+    path = tmp_path.joinpath('export.csv')
+    with writers.writer('csv', path, columns=['timestamp', 'foF2']) as writer:
+        writer.write(frame())
+    assert read('csv', path).columns.tolist() == ['timestamp', 'foF2']
+
+    with pytest.raises(ValueError):
+        writers.writer('xlsx', tmp_path.joinpath('export.xlsx'))
+    path = tmp_path.joinpath('export.parquet')
+    with writers.writer('parquet', path) as writer:
+        writer.write(frame())
+    with pytest.raises(ValueError):
+        writers.writer('parquet', path, append=True).write(frame())